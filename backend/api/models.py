@@ -24,6 +24,7 @@ class StreamRequest(BaseModel):
     """Validation for stream endpoint params."""
     channel: str = Field(..., min_length=1, max_length=100, pattern=r"^[a-zA-Z0-9_]+$")
     token: Optional[str] = Field(None, max_length=255)
+    coalesce_ms: int = Field(0, ge=0, le=1000, description="Merge messages published within this window into one write")
 
 class CosmeticsRequest(BaseModel):
     """Validation for 7TV cosmetics."""
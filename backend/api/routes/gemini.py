@@ -1,12 +1,12 @@
 import base64
 import logging
-import json
 import asyncio
-import re
-from typing import Any, Optional, List, Dict, AsyncGenerator
-from pydantic import BaseModel, Field
-from fastapi import APIRouter, HTTPException, Depends, status, Request
-from fastapi.responses import StreamingResponse
+from functools import partial
+from typing import Any, Optional, List, Dict, AsyncGenerator, AsyncIterator, Awaitable, Callable, Sequence, Tuple, Type, TypeVar, Union
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from fastapi import APIRouter, HTTPException, Depends, File, Form, Query, UploadFile, status, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, StreamingResponse
 from ...auth import get_api_key
 from google.genai import types  # type: ignore
 from google.genai.errors import APIError as GenaiAPIError  # type: ignore
@@ -22,27 +22,36 @@ from ...rate_limiter import limiter
 
 # Local imports
 from ...services.gemini_service import gemini_service
+from ...services.image_preprocessing import image_preprocessor
+from ...services.media_store import media_store
+from ...services.workload_pools import POOL_CPU, POOL_MEDIA
 from .knowledge import save_knowledge_entry
 from ...config import settings
+from ...services.audio_cache import AudioEntry, audio_cache
 from ...services.gemini_cache_service import gemini_cache_service
 from ...services.obs_context_service import OBSContextBuilder, OBSContextState
+from ...services.obs_sessions import OBSSession, obs_session_store
+from ...services.response_cache import response_cache
+from ...services.single_flight import request_key
+from ...services.stream_replay import ReplayStream, stream_replay_registry
+from ...services.telemetry import bind_route
+from ...services.video_cache import video_cache
+from ...services.video_operations import video_operation_tracker
+from ...utils.image_validation import decode_base64_image, validate_image_bytes
+from ...utils.uploads import audio_upload_type, read_image_upload, upload_size
+from ...utils.media import (
+    MediaPart, binary_media_type, binary_response, pcm16_to_wav, pcm_sample_rate, ranged_file_response, wav_header,
+)
+from ...utils.sse import coalesce_frames, dumps, sse_encoder
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(bind_route)])
 
 # --- Pydantic Models ---
-from ...models.validation import GeminiRequest, ImageGenerateRequest, SpeechGenerateRequest, VideoGenerateRequest, PROMPT_MAX_LENGTH, OBSActionResponse, OBSAction
+from ...models.validation import GeminiRequest, ImageBatchRequest, ImageGenerateRequest, SpeechGenerateRequest, VideoGenerateRequest, PROMPT_MAX_LENGTH, OBSActionResponse, OBSAction
 from pydantic import validator
 
-class SpeechGenerateRequest(BaseModel):
-    prompt: str = Field(..., min_length=1, max_length=5000)
-    model: str = Field("gemini-1.5-flash-tts-001", description="The model to use for speech generation.")
-    isMultiSpeaker: bool = Field(False)
-    voice: str = Field("Kore")
-    speaker1Voice: str = Field("Kore")
-    speaker2Voice: str = Field("Puck")
-
 def get_gemini_client():
     # Return the shared genai.Client instance; surface a 503 if initialization fails
     try:
@@ -54,41 +63,86 @@ def get_gemini_client():
             detail="Gemini service is not configured or available."
         )
 
+async def _shared_response(
+    route: str,
+    key_parts: Dict[str, Any],
+    factory: Callable[[], Awaitable[Any]],
+    dedupe: bool = False,
+    use_cache: bool = False,
+) -> Any:
+    """
+    Run `factory`, serving it from the response cache and/or sharing it with
+    identical in-flight requests when the caller opted in.
+    """
+    if not (dedupe or use_cache):
+        return await factory()
+
+    key = request_key(route=route, **key_parts)
+    cacheable = use_cache and response_cache.enabled_for(route)
+    if cacheable:
+        cached = response_cache.get(route, key)
+        if cached is not None:
+            return cached
+
+    result = await (gemini_service.single_flight.do(key, factory) if dedupe else factory())
+    if cacheable:
+        response_cache.set(key, result)
+    return result
+
 # --- Asynchronous Streaming Logic ---
-async def _async_stream_generator(response_iterator: any) -> AsyncGenerator[str, None]:
+async def _stream_events(response_iterator: AsyncIterator[Any]) -> AsyncGenerator[Tuple[str, Any], None]:
     """
-    Wraps a synchronous iterator from the Gemini SDK into an async generator,
-    preventing it from blocking the event loop.
+    Converts the chunk iterator returned by `GeminiService.open_stream` into
+    `(type, data)` stream events. Chunks come from the native async client, or
+    from the thread pool when the client has no async surface.
     """
-    loop = asyncio.get_event_loop()
     total_tokens = 0
     try:
-        while True:
-            # Run the blocking next() call in a thread
-            chunk = await loop.run_in_executor(None, next, response_iterator, None)
-            if chunk is None:
-                break
-
+        async for chunk in response_iterator:
             text = getattr(chunk, 'text', None)
             if text:
-                yield f"data: {json.dumps({'type': 'chunk', 'data': text})}\n\n"
+                yield 'chunk', text
 
             usage = getattr(chunk, 'usage_metadata', None)
             if usage:
                 total_tokens += getattr(usage, 'total_token_count', 0)
     except APIError as e:
         logger.error("Gemini API error during streaming: %s", e)
-        yield f"data: {json.dumps({'type': 'error', 'data': f'AI service error: {getattr(e, 'message', str(e))}'})}\n\n"
+        yield 'error', f"AI service error: {getattr(e, 'message', str(e))}"
     except Exception as e:
         logger.error("Unexpected error during streaming: %s", e, exc_info=True)
-        yield f"data: {json.dumps({'type': 'error', 'data': 'An unexpected error occurred during streaming.'})}\n\n"
+        yield 'error', 'An unexpected error occurred during streaming.'
     finally:
-        yield f"data: {json.dumps({'type': 'usage', 'data': {'total_tokens': total_tokens}})}\n\n"
+        # Closing the source releases the upstream response if we stop early
+        aclose = getattr(response_iterator, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+    # Not reached when the generation is cancelled
+    yield 'usage', {'total_tokens': total_tokens}
+
+def _replay_response(replay: ReplayStream, after_seq: int, coalesce_ms: int, coalesce_bytes: int) -> StreamingResponse:
+    """SSE response that reads a replay buffer from `after_seq` onwards."""
+    frames = coalesce_frames(replay.subscribe(after_seq), window_ms=coalesce_ms, max_bytes=coalesce_bytes)
+    return StreamingResponse(frames, media_type="text/event-stream", headers={"X-Stream-ID": replay.id})
+
+def _lookup_last_event_id(last_event_id: Optional[str]) -> Optional[Tuple[ReplayStream, int]]:
+    parsed = stream_replay_registry.parse_event_id(last_event_id) if last_event_id else None
+    if not parsed:
+        return None
+    replay = stream_replay_registry.get(parsed[0])
+    return (replay, parsed[1]) if replay else None
 
 # --- API Endpoints ---
 @router.post("/stream")
 @limiter.limit("20/minute")
 async def stream_content(request: Request, stream_request: GeminiRequest, client: Any = Depends(get_gemini_client)):
+    # A reconnect carrying Last-Event-ID continues the original generation
+    resumed = _lookup_last_event_id(request.headers.get("last-event-id"))
+    if resumed:
+        replay, after_seq = resumed
+        logger.info(f"Resuming stream {replay.id} after event {after_seq}")
+        return _replay_response(replay, after_seq, stream_request.coalesce_ms, stream_request.coalesce_bytes)
+
     try:
         # Convert history and prompt to the format expected by the SDK
         history = stream_request.history or []
@@ -99,15 +153,19 @@ async def stream_content(request: Request, stream_request: GeminiRequest, client
 
         # Use the client's streaming API
         response_stream = await asyncio.wait_for(
-            gemini_service.run_in_executor(
-                client.models.generate_content_stream,
+            gemini_service.open_stream(
+                client,
+                "models.generate_content_stream",
                 model=stream_request.model,
                 contents=contents,
             ),
             timeout=30.0
         )
 
-        return StreamingResponse(_async_stream_generator(response_stream), media_type="text/event-stream")
+        # The generation is pumped into a replay buffer so it survives client reconnects
+        replay = stream_replay_registry.create()
+        replay.start(_stream_events(response_stream))
+        return _replay_response(replay, -1, stream_request.coalesce_ms, stream_request.coalesce_bytes)
     except asyncio.TimeoutError:
         logger.warning("Gemini stream request timed out.")
         raise HTTPException(status_code=status.HTTP_408_REQUEST_TIMEOUT, detail="Request to AI service timed out.")
@@ -120,85 +178,118 @@ async def stream_content(request: Request, stream_request: GeminiRequest, client
         logger.error(f"Unexpected error in stream_content: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
 
-def validate_and_decode_image(image_input: str, expected_mime: str) -> bytes:
-    """Securely validate and decode base64 image data."""
-    import magic  # Add python-magic to requirements.txt
-
-    # Validate base64 format
-    if not re.match(r'^[A-Za-z0-9+/]*={0,2}$', image_input):
-        raise ValueError("Invalid base64 format")
-
-    try:
-        image_bytes = base64.b64decode(image_input, validate=True)
-    except Exception as e:
-        raise ValueError(f"Invalid base64 encoding: {e}")
+@router.get("/stream/{stream_id}")
+@limiter.limit("60/minute")
+async def resume_stream(
+    request: Request,
+    stream_id: str,
+    last_event_id: Optional[str] = Query(None, description="Fallback for clients that cannot set the Last-Event-ID header"),
+    coalesce_ms: int = Query(0, ge=0, le=1000),
+):
+    """Reattach to a running or recently finished stream (EventSource reconnects use GET)."""
+    replay = stream_replay_registry.get(stream_id)
+    if not replay:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found or expired.")
+
+    after_seq = -1
+    parsed = stream_replay_registry.parse_event_id(request.headers.get("last-event-id") or last_event_id or "")
+    if parsed and parsed[0] == stream_id:
+        after_seq = parsed[1]
+    return _replay_response(replay, after_seq, coalesce_ms, 16384)
+
+def _decode_input_images(request: ImageGenerateRequest) -> List[Any]:
+    """Decode and validate the input images of a vision request.
+
+    This is CPU-bound (base64, MIME sniffing), so callers run it on the
+    thread pool rather than on the event loop. Images given as media store
+    handles are passed through as the handle string.
+    """
+    images = []
 
-    # Double-check decoded size
-    if len(image_bytes) > 10 * 1024 * 1024:
-        raise ValueError("Decoded image exceeds 10MB limit")
+    # Legacy single image input
+    if request.image_input and request.image_input_mime_type:
+        images.append((decode_base64_image(request.image_input, request.image_input_mime_type), request.image_input_mime_type))
 
-    # Validate actual MIME type
-    try:
-        actual_mime = magic.from_buffer(image_bytes, mime=True)
-        if actual_mime != expected_mime:
-            raise ValueError(f"MIME type mismatch: expected {expected_mime}, got {actual_mime}")
-    except Exception:
-        # Fallback validation without python-magic
-        if expected_mime not in ['image/jpeg', 'image/png', 'image/gif', 'image/webp']:
-            raise ValueError("Unsupported image format")
-
-        # Basic image header validation
-    if expected_mime == 'image/jpeg' and not image_bytes.startswith(b'\xff\xd8\xff'):
-        raise ValueError("Invalid JPEG header")
-    elif expected_mime == 'image/png' and not image_bytes.startswith(b'\x89PNG\r\n\x1a\n'):
-        raise ValueError("Invalid PNG header")
-
-    return image_bytes
-
-def _sync_generate_image(client: Any, request: ImageGenerateRequest):
-    """Refactored synchronous helper for image generation."""
-    try:
-        # Case 1: Image and Text prompt (requires a vision model) or Gemini 3 Pro with reference images
-        if (request.image_input and request.image_input_mime_type) or request.reference_images:
-            contents = [request.prompt]
-            
-            # Legacy single image input
-            if request.image_input and request.image_input_mime_type:
-                image_bytes = validate_and_decode_image(request.image_input, request.image_input_mime_type)
-                
-                # Apply Canny edge detection if requested
-                if request.condition_type == "canny_edge":
-                    import cv2
-                    import numpy as np
-
-                    # Decode image for OpenCV
-                    nparr = np.frombuffer(image_bytes, np.uint8)
-                    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    # New multiple reference images
+    if request.reference_images:
+        for ref in request.reference_images:
+            if ref.get('handle'):
+                images.append(ref['handle'])
+            else:
+                images.append((decode_base64_image(ref['data'], ref['mime_type']), ref['mime_type']))
 
-                    # Convert to grayscale and apply Canny
-                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    edges = cv2.Canny(gray, 100, 200)
+    return images
 
-                    # Convert single-channel edges back to 3-channel for encoding
-                    edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+async def _prepare_image_parts(
+    client: Any,
+    request: ImageGenerateRequest,
+    primary: Optional[Tuple[bytes, str]] = None,
+    references: Sequence[Union[Tuple[bytes, str], str]] = (),
+) -> List[Any]:
+    """
+    Decoded (and, if requested, conditioned) input images as content parts.
 
-                    # Re-encode the image to its original format
-                    file_extension = f".{request.image_input_mime_type.split('/')[1]}"
-                    is_success, buffer = cv2.imencode(file_extension, edges_colored)
-                    if not is_success:
-                        raise HTTPException(status_code=500, detail="Failed to re-encode processed image")
-                    image_bytes = buffer.tobytes()
+    `primary` and `references` are already-decoded images (references may
+    also be media handles) that stand in for `image_input` and extend
+    `reference_images`.
+    """
+    images = await gemini_service.run_in_executor(_decode_input_images, request, pool=POOL_CPU)
+    if primary is not None:
+        images.insert(0, primary)
+    images.extend(references)
+
+    # Conditioning applies to the primary input image and runs in worker processes
+    if request.condition_type and (primary is not None or (request.image_input and request.image_input_mime_type)):
+        image_bytes, mime_type = images[0]
+        image_bytes = await image_preprocessor.condition(
+            image_bytes, mime_type, request.condition_type, request.condition_params
+        )
+        images[0] = (image_bytes, mime_type)
 
-                contents.append(types.Part(inline_data=types.Blob(mime_type=request.image_input_mime_type, data=image_bytes)))
+    parts = []
+    for image in images:
+        if isinstance(image, str):
+            parts.append(await media_store.part_for(client, image))
+        else:
+            data, mime_type = image
+            parts.append(types.Part(inline_data=types.Blob(mime_type=mime_type, data=data)))
+    return parts
+
+def _video_image(image: Tuple[bytes, str]) -> types.Image:
+    data, mime_type = image
+    return types.Image(image_bytes=data, mime_type=mime_type)
+
+async def _decode_video_image(ref: Dict[str, str]) -> types.Image:
+    """Video input image given as base64 data or a media handle."""
+    if ref.get('handle'):
+        entry = media_store.get(ref['handle'])
+        return _video_image((await media_store.read(entry), entry.mime_type))
+    img_bytes = await gemini_service.run_in_executor(
+        decode_base64_image, ref['data'], ref['mime_type'], pool=POOL_CPU
+    )
+    return _video_image((img_bytes, ref['mime_type']))
+
+async def _generate_image(
+    client: Any,
+    request: ImageGenerateRequest,
+    primary: Optional[Tuple[bytes, str]] = None,
+    references: Sequence[Union[Tuple[bytes, str], str]] = (),
+):
+    """
+    Image generation helper shared by the image endpoints.
 
-            # New multiple reference images
-            if request.reference_images:
-                for ref in request.reference_images:
-                    img_bytes = validate_and_decode_image(ref['data'], ref['mime_type'])
-                    contents.append(types.Part(inline_data=types.Blob(mime_type=ref['mime_type'], data=img_bytes)))
+    Returns `{"images": [{"data": bytes, "mime_type": str}], "model": str}`;
+    callers encode it with `_image_response`.
+    """
+    try:
+        # Case 1: Image and Text prompt (requires a vision model) or Gemini 3 Pro with reference images
+        has_inputs = primary is not None or references or request.reference_images
+        if (request.image_input and request.image_input_mime_type) or has_inputs:
+            contents = [request.prompt]
+            contents.extend(await _prepare_image_parts(client, request, primary, references))
 
             model = request.model if "gemini" in request.model else "gemini-1.5-flash-latest"
-            
+
             # Configure tools for search grounding
             tools = None
             if request.search_grounding:
@@ -207,15 +298,16 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
             config_params = {
                 "response_mime_type": f"image/{request.image_format}",
             }
-            if request.person_generation:
-                config_params["person_generation"] = request.person_generation
-            
-            # Only add aspect_ratio if not using image_size (they might conflict or depend on model)
-            # For Gemini 3 Pro, aspect_ratio is supported.
+            # GenerateContentConfig has no person_generation field and takes the
+            # aspect ratio through image_config; passing either at the top level
+            # fails validation before the request is sent.
             if request.aspect_ratio:
-                config_params["aspect_ratio"] = request.aspect_ratio
+                config_params["image_config"] = types.ImageConfig(aspect_ratio=request.aspect_ratio)
 
-            response = client.models.generate_content(
+            response = await gemini_service.invoke(
+                client,
+                "models.generate_content",
+                pool=POOL_MEDIA,
                 model=model,
                 contents=contents,
                 config=types.GenerateContentConfig(
@@ -229,7 +321,7 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
                 for part in response.candidates[0].content.parts:
                     if part.inline_data:
                         images_data.append({
-                            "data": base64.b64encode(part.inline_data.data).decode(),
+                            "data": part.inline_data.data,
                             "mime_type": part.inline_data.mime_type,
                         })
 
@@ -242,7 +334,7 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
         else:
             model = request.model
             images = []
-            
+
             # Configure tools for search grounding
             tools = None
             if request.search_grounding:
@@ -250,7 +342,10 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
 
             if 'imagen' in model:
                 # Use the dedicated API for Imagen models
-                result = client.models.generate_images(
+                result = await gemini_service.invoke(
+                    client,
+                    "models.generate_images",
+                    pool=POOL_MEDIA,
                     prompt=request.prompt,
                     model=model,
                     config=types.GenerateImagesConfig(
@@ -262,7 +357,7 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
                     for gi in result.generated_images:
                         if gi.image and gi.image.image_bytes:
                             images.append({
-                                "data": base64.b64encode(gi.image.image_bytes).decode(),
+                                "data": gi.image.image_bytes,
                                 "mime_type": gi.image.mime_type or 'image/png'
                             })
             else:
@@ -270,12 +365,14 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
                 config_params = {
                     "response_mime_type": f"image/{request.image_format}",
                 }
-                if request.person_generation:
-                    config_params["person_generation"] = request.person_generation
+                # As above: no person_generation, aspect ratio via image_config
                 if request.aspect_ratio:
-                    config_params["aspect_ratio"] = request.aspect_ratio
-                
-                result = client.models.generate_content(
+                    config_params["image_config"] = types.ImageConfig(aspect_ratio=request.aspect_ratio)
+
+                result = await gemini_service.invoke(
+                    client,
+                    "models.generate_content",
+                    pool=POOL_MEDIA,
                     model=model,
                     contents=request.prompt,
                     config=types.GenerateContentConfig(
@@ -287,7 +384,7 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
                     for part in result.candidates[0].content.parts:
                         if part.inline_data:
                             images.append({
-                                "data": base64.b64encode(part.inline_data.data).decode(),
+                                "data": part.inline_data.data,
                                 "mime_type": part.inline_data.mime_type,
                             })
 
@@ -302,22 +399,94 @@ def _sync_generate_image(client: Any, request: ImageGenerateRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in _sync_generate_image: {e}", exc_info=True)
+        logger.error(f"Unexpected error in _generate_image: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error during image generation")
 
 
+def _negotiated(
+    request: Request,
+    media_types: List[str],
+    to_parts: Callable[[], List[MediaPart]],
+    headers: Dict[str, str],
+    to_json: Callable[[], Any],
+) -> Any:
+    """Raw or multipart media if the client asked for it, otherwise the JSON body."""
+    media_type = binary_media_type(request, media_types)
+    if media_type is None:
+        return to_json()
+    return binary_response(media_type, to_parts(), headers)
+
+def _image_response(request: Request, result: Dict[str, Any]) -> Any:
+    images = result["images"]
+    return _negotiated(
+        request,
+        [image["mime_type"] or "image/png" for image in images],
+        lambda: [
+            MediaPart(image["data"], image["mime_type"] or "image/png", {"X-Image-Index": str(i)})
+            for i, image in enumerate(images)
+        ],
+        {"X-Model": result["model"]},
+        lambda: _image_json(result),
+    )
+
+def _image_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "images": [
+            {"data": base64.b64encode(image["data"]).decode(), "mime_type": image["mime_type"]}
+            for image in result["images"]
+        ],
+        "model": result["model"],
+    }
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+def _form_payload(model: Type[ModelT], payload: str) -> ModelT:
+    """Validate the JSON `payload` field of a multipart request like a JSON body."""
+    try:
+        return model.model_validate_json(payload)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+async def _read_images(uploads: Sequence[UploadFile]) -> List[Tuple[bytes, str]]:
+    try:
+        return [await read_image_upload(upload) for upload in uploads]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 @router.post("/generate-image-enhanced")
 @limiter.limit("10/minute")
 async def generate_image_enhanced(request: Request, image_request: ImageGenerateRequest, client: Any = Depends(get_gemini_client)):
+    return await _respond_with_image(request, client, image_request)
+
+@router.post("/generate-image-enhanced/upload")
+@limiter.limit("10/minute")
+async def generate_image_enhanced_upload(
+    request: Request,
+    payload: str = Form(..., description="ImageGenerateRequest fields as JSON"),
+    image: Optional[UploadFile] = File(None, description="Primary input image (instead of image_input)"),
+    reference_images: List[UploadFile] = File([], description="Additional reference images"),
+    client: Any = Depends(get_gemini_client),
+):
+    """`/generate-image-enhanced` with input images sent as multipart file parts instead of base64."""
+    image_request = _form_payload(ImageGenerateRequest, payload)
+    if image is not None and image_request.image_input:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Send the input image either as a file or as image_input, not both")
+    primary = (await _read_images([image]))[0] if image is not None else None
+    return await _respond_with_image(request, client, image_request, primary, await _read_images(reference_images))
+
+async def _respond_with_image(
+    request: Request,
+    client: Any,
+    image_request: ImageGenerateRequest,
+    primary: Optional[Tuple[bytes, str]] = None,
+    references: Sequence[Tuple[bytes, str]] = (),
+) -> Any:
     try:
-        # Run the entire synchronous generation logic in the executor
         final_result = await asyncio.wait_for(
-            gemini_service.run_in_executor(
-                _sync_generate_image, client, image_request
-            ),
+            gemini_service.until_disconnected(request, _generate_image(client, image_request, primary, references)),
             timeout=30.0
         )
-        return final_result
+        return _image_response(request, final_result)
     except asyncio.TimeoutError:
         logger.warning("Gemini image generation request timed out.")
         raise HTTPException(status_code=status.HTTP_408_REQUEST_TIMEOUT, detail="Request to AI service timed out.")
@@ -328,64 +497,218 @@ async def generate_image_enhanced(request: Request, image_request: ImageGenerate
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
 
 
-@router.post("/generate-speech")
-@limiter.limit("30/minute")
-async def generate_speech(request: Request, speech_request: SpeechGenerateRequest, client: Any = Depends(get_gemini_client)):
+def _decode_batch_inputs(items: Sequence[ImageGenerateRequest]) -> List[Any]:
+    """
+    Decode the input images of every batch item, each distinct image once.
+
+    Returns, per item, `(primary, references)` for `_generate_image` (media
+    handles are passed through) or the ValueError that rejected the item.
+    """
+    decoded: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+
+    def decode(data: str, mime_type: str) -> Tuple[bytes, str]:
+        key = (mime_type, data)
+        if key not in decoded:
+            decoded[key] = (decode_base64_image(data, mime_type), mime_type)
+        return decoded[key]
+
+    inputs: List[Any] = []
+    for item in items:
+        try:
+            primary = None
+            if item.image_input and item.image_input_mime_type:
+                primary = decode(item.image_input, item.image_input_mime_type)
+            references = [
+                ref['handle'] if ref.get('handle') else decode(ref['data'], ref['mime_type'])
+                for ref in item.reference_images or []
+            ]
+            inputs.append((primary, references))
+        except ValueError as e:
+            inputs.append(e)
+    return inputs
+
+async def _batch_item(
+    client: Any, index: int, item: ImageGenerateRequest, inputs: Any, semaphore: asyncio.Semaphore
+) -> Tuple[str, Dict[str, Any]]:
+    """One batch item as a `result` or `error` event; failures never escape."""
+    if isinstance(inputs, ValueError):
+        return "error", {"index": index, "status_code": status.HTTP_400_BAD_REQUEST, "error": str(inputs)}
+    primary, references = inputs
+    # The decoded images replace the base64 fields, so nothing is decoded twice
+    item = item.model_copy(update={"image_input": None, "image_input_mime_type": None, "reference_images": None})
+    async with semaphore:
+        try:
+            result = await asyncio.wait_for(_generate_image(client, item, primary, references), timeout=30.0)
+        except asyncio.TimeoutError:
+            return "error", {"index": index, "status_code": status.HTTP_408_REQUEST_TIMEOUT, "error": "Request to AI service timed out."}
+        except HTTPException as e:
+            return "error", {"index": index, "status_code": e.status_code, "error": e.detail}
+    return "result", {"index": index, **_image_json(result)}
+
+def _ndjson_frame(kind: str, data: Any) -> bytes:
+    return dumps({"type": kind, "data": data}) + b"\n"
+
+async def _image_batch_body(
+    client: Any,
+    items: Sequence[ImageGenerateRequest],
+    inputs: Sequence[Any],
+    concurrency: int,
+    encode: Callable[[str, Any], bytes],
+) -> AsyncIterator[bytes]:
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.ensure_future(_batch_item(client, index, item, item_inputs, semaphore))
+        for index, (item, item_inputs) in enumerate(zip(items, inputs))
+    ]
+    failed = 0
     try:
-        # Construct speech config
-        speech_config = None
-        if speech_request.multi_speaker_config:
-            # Multi-speaker configuration
-            speaker_configs = []
-            for speaker in speech_request.multi_speaker_config.get('speakers', []):
-                speaker_configs.append(types.SpeakerVoiceConfig(
-                    speaker=speaker['name'],
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name=speaker['voice']
-                        )
-                    )
-                ))
-            speech_config = types.SpeechConfig(
-                multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
-                    speaker_voice_configs=speaker_configs
-                )
-            )
-        elif speech_request.voice_config:
-            # Single speaker configuration
-            speech_config = types.SpeechConfig(
+        for next_done in asyncio.as_completed(tasks):
+            kind, data = await next_done
+            failed += kind == "error"
+            yield encode(kind, data)
+        yield encode("done", {"items": len(tasks), "failed": failed})
+    finally:
+        # The client went away mid-batch: stop the generations still running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@router.post("/generate-image-batch")
+@limiter.limit("5/minute")
+async def generate_image_batch(request: Request, batch_request: ImageBatchRequest, client: Any = Depends(get_gemini_client)):
+    """
+    Generate several images in one request, streaming each as it finishes.
+
+    Items run at most `concurrency` at a time (capped by
+    `IMAGE_BATCH_CONCURRENCY`) and identical input images are decoded once.
+    The body is SSE by default, or NDJSON with `Accept: application/x-ndjson`;
+    either way each item yields a `result` or `error` event carrying its
+    `index`, followed by a final `done` event.
+    """
+    items = batch_request.items
+    inputs = await gemini_service.run_in_executor(_decode_batch_inputs, items, pool=POOL_CPU)
+    concurrency = min(batch_request.concurrency or settings.IMAGE_BATCH_CONCURRENCY, settings.IMAGE_BATCH_CONCURRENCY)
+    headers = {"Cache-Control": "no-cache", "X-Batch-Size": str(len(items))}
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        body = _image_batch_body(client, items, inputs, concurrency, _ndjson_frame)
+        return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+    body = _image_batch_body(client, items, inputs, concurrency, sse_encoder.typed)
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+def _speech_config(speech_request: SpeechGenerateRequest) -> types.GenerateContentConfig:
+    """Audio-only generation config with the requested voice(s)."""
+    # Construct speech config
+    speech_config = None
+    if speech_request.multi_speaker_config:
+        # Multi-speaker configuration
+        speaker_configs = []
+        for speaker in speech_request.multi_speaker_config.get('speakers', []):
+            speaker_configs.append(types.SpeakerVoiceConfig(
+                speaker=speaker['name'],
                 voice_config=types.VoiceConfig(
                     prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                        voice_name=speech_request.voice_config.get('voice_name', 'Kore')
+                        voice_name=speaker['voice']
                     )
                 )
+            ))
+        speech_config = types.SpeechConfig(
+            multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
+                speaker_voice_configs=speaker_configs
             )
+        )
+    elif speech_request.voice_config:
+        # Single speaker configuration
+        speech_config = types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                    voice_name=speech_request.voice_config.get('voice_name', 'Kore')
+                )
+            )
+        )
+
+    return types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=speech_config
+    )
+
+def _speech_voice(speech_request: SpeechGenerateRequest) -> Any:
+    """The effective voice settings of `_speech_config`, as an audio cache key part."""
+    if speech_request.multi_speaker_config:
+        return {"speakers": speech_request.multi_speaker_config.get('speakers', [])}
+    if speech_request.voice_config:
+        return {"voice_name": speech_request.voice_config.get('voice_name', 'Kore')}
+    return None
+
+async def _cached_speech_response(request: Request, entry: AudioEntry) -> Any:
+    """Serve a cached synthesis: the WAV file itself for binary clients, JSON otherwise."""
+    if binary_media_type(request, ["audio/wav"]):
+        return FileResponse(
+            audio_cache.path(entry),
+            media_type="audio/wav",
+            headers={"X-Model": entry.model, "X-Sample-Rate": str(entry.sample_rate), "X-Audio-Cache": "hit"},
+        )
+    return {
+        "audioData": base64.b64encode(await audio_cache.read_pcm(entry)).decode(),
+        "format": "wav",
+        "model": entry.model,
+    }
 
-        response = await asyncio.wait_for(
-            gemini_service.run_in_executor(
-                client.models.generate_content,
+@router.post("/generate-speech")
+@limiter.limit("30/minute")
+async def generate_speech(request: Request, speech_request: SpeechGenerateRequest, client: Any = Depends(get_gemini_client)):
+    try:
+        config = _speech_config(speech_request)
+        cache_key = audio_cache.key(speech_request.model, speech_request.prompt, _speech_voice(speech_request))
+        cached = audio_cache.get(cache_key)
+        if cached is not None:
+            return await _cached_speech_response(request, cached)
+
+        async def synthesize() -> Dict[str, Any]:
+            response = await gemini_service.invoke(
+                client,
+                "models.generate_content",
+                pool=POOL_MEDIA,
                 model=speech_request.model,
                 contents=speech_request.prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=speech_config
-                ),
+                config=config,
+            )
+
+            # Safely extract audio data
+            if response.candidates and response.candidates[0].content.parts:
+                audio_part = response.candidates[0].content.parts[0]
+                if audio_part.inline_data and audio_part.inline_data.data:
+                    speech = {
+                        "audio": audio_part.inline_data.data,
+                        "sample_rate": pcm_sample_rate(audio_part.inline_data.mime_type),
+                    }
+                    await audio_cache.put(cache_key, speech["audio"], speech["sample_rate"], speech_request.model)
+                    return speech
+
+            raise HTTPException(status_code=502, detail="AI service returned no audio data")
+
+        speech = await asyncio.wait_for(
+            _shared_response(
+                "generate-speech",
+                {"model": speech_request.model, "contents": speech_request.prompt, "config": config},
+                synthesize,
+                dedupe=speech_request.dedupe,
+                use_cache=speech_request.use_response_cache,
             ),
             timeout=30.0
         )
-
-        # Safely extract audio data
-        if response.candidates and response.candidates[0].content.parts:
-            audio_part = response.candidates[0].content.parts[0]
-            if audio_part.inline_data and audio_part.inline_data.data:
-                audio_data = audio_part.inline_data.data
-                return {
-                    "audioData": base64.b64encode(audio_data).decode(),
-                    "format": "wav",
-                    "model": speech_request.model
-                }
-
-        raise HTTPException(status_code=502, detail="AI service returned no audio data")
+        # Gemini returns raw 16-bit PCM; binary clients get it wrapped as a WAV file
+        return _negotiated(
+            request,
+            ["audio/wav"],
+            lambda: [MediaPart(pcm16_to_wav(speech["audio"], speech["sample_rate"]), "audio/wav")],
+            {"X-Model": speech_request.model, "X-Sample-Rate": str(speech["sample_rate"])},
+            lambda: {
+                "audioData": base64.b64encode(speech["audio"]).decode(),
+                "format": "wav",
+                "model": speech_request.model
+            },
+        )
 
     except (APIError, GenaiAPIError) as e:
         logger.error(f"Gemini API error in speech generation: {e}")
@@ -396,6 +719,102 @@ async def generate_speech(request: Request, speech_request: SpeechGenerateReques
         logger.error(f"Unexpected error in speech generation: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
 
+async def _audio_chunks(stream: AsyncIterator[Any]) -> AsyncGenerator[Tuple[bytes, Optional[str]], None]:
+    """`(pcm, mime_type)` for each audio part of a streamed speech response."""
+    try:
+        async for chunk in stream:
+            for candidate in getattr(chunk, 'candidates', None) or []:
+                content = getattr(candidate, 'content', None)
+                for part in getattr(content, 'parts', None) or []:
+                    inline = getattr(part, 'inline_data', None)
+                    if inline is not None and inline.data:
+                        yield inline.data, inline.mime_type
+    finally:
+        aclose = getattr(stream, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+async def _speech_wav_body(first: bytes, chunks: AsyncGenerator[Tuple[bytes, Optional[str]], None], sample_rate: int) -> AsyncIterator[bytes]:
+    try:
+        yield wav_header(None, sample_rate) + first
+        async for pcm, _ in chunks:
+            yield pcm
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated stream
+        logger.error(f"Speech stream failed mid-response: {e}", exc_info=True)
+    finally:
+        await chunks.aclose()
+
+async def _speech_sse_body(
+    first: bytes, chunks: AsyncGenerator[Tuple[bytes, Optional[str]], None], sample_rate: int, model: str
+) -> AsyncIterator[bytes]:
+    total = len(first)
+    try:
+        yield sse_encoder.typed('format', {
+            'mime_type': 'audio/L16', 'sample_rate': sample_rate, 'channels': 1, 'sample_width': 2,
+        })
+        yield sse_encoder.typed('audio', base64.b64encode(first).decode())
+        async for pcm, _ in chunks:
+            total += len(pcm)
+            yield sse_encoder.typed('audio', base64.b64encode(pcm).decode())
+        yield sse_encoder.typed('done', {'bytes': total, 'model': model})
+    except Exception as e:
+        logger.error(f"Speech stream failed mid-response: {e}", exc_info=True)
+        yield sse_encoder.typed('error', 'An unexpected error occurred during speech streaming.')
+    finally:
+        await chunks.aclose()
+
+@router.post("/generate-speech/stream")
+@limiter.limit("30/minute")
+async def stream_speech(request: Request, speech_request: SpeechGenerateRequest, client: Any = Depends(get_gemini_client)):
+    """
+    Stream synthesized speech while it is generated.
+
+    By default the body is a chunked `audio/wav` stream: a header of
+    unknown length followed by 16-bit PCM as it arrives, so players can
+    start at once. With `Accept: text/event-stream` it is SSE instead: a
+    `format` event, base64 `audio` events and a final `done` event.
+    """
+    try:
+        stream = await asyncio.wait_for(
+            gemini_service.open_stream(
+                client,
+                "models.generate_content_stream",
+                pool=POOL_MEDIA,
+                model=speech_request.model,
+                contents=speech_request.prompt,
+                config=_speech_config(speech_request),
+            ),
+            timeout=30.0
+        )
+        chunks = _audio_chunks(stream)
+        # The first chunk carries the sample rate the stream header needs
+        try:
+            first, mime_type = await asyncio.wait_for(chunks.__anext__(), timeout=30.0)
+        except BaseException:
+            await chunks.aclose()
+            raise
+    except StopAsyncIteration:
+        raise HTTPException(status_code=502, detail="AI service returned no audio data")
+    except asyncio.TimeoutError:
+        logger.warning("Gemini speech stream timed out before the first audio chunk.")
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="AI service request timed out. Please try again.")
+    except (APIError, GenaiAPIError) as e:
+        logger.error(f"Gemini API error in speech streaming: {e}")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI service error: {getattr(e, 'message', str(e))}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in speech streaming: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
+
+    sample_rate = pcm_sample_rate(mime_type)
+    headers = {"X-Model": speech_request.model, "X-Sample-Rate": str(sample_rate), "Cache-Control": "no-cache"}
+    if "text/event-stream" in request.headers.get("accept", ""):
+        body = _speech_sse_body(first, chunks, sample_rate, speech_request.model)
+        return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+    return StreamingResponse(_speech_wav_body(first, chunks, sample_rate), media_type="audio/wav", headers=headers)
+
 
 class GenerateContentRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=PROMPT_MAX_LENGTH)
@@ -403,15 +822,57 @@ class GenerateContentRequest(BaseModel):
     history: Optional[List[dict]] = Field(None)
     audio_inline: Optional[Dict[str, str]] = Field(None, description="Inline audio as base64 with keys {data, mime_type}")
     audio_file_uri: Optional[str] = Field(None, description="URI of uploaded audio file")
+    dedupe: bool = Field(False, description="Share one upstream call with identical concurrent requests")
+    use_response_cache: bool = Field(False, description="Serve an identical recent response from the response cache")
 
 
 @router.post("/generate-content")
 @limiter.limit("20/minute")
 async def generate_content(request: Request, body: GenerateContentRequest, client: Any = Depends(get_gemini_client)):
     """Generate content with optional inline or URI-referenced audio parts."""
+    return await _respond_with_content(request, client, body)
+
+@router.post("/generate-content/upload")
+@limiter.limit("20/minute")
+async def generate_content_upload(
+    request: Request,
+    payload: str = Form(..., description="GenerateContentRequest fields as JSON"),
+    audio: Optional[UploadFile] = File(None, description="Audio input (instead of audio_inline)"),
+    client: Any = Depends(get_gemini_client),
+):
+    """
+    `/generate-content` with the audio sent as a multipart file part. Audio
+    of `AUDIO_UPLOAD_FILES_API_MIN_BYTES` or more is streamed from the
+    spooled upload to the Files API and referenced by URI.
+    """
+    body = _form_payload(GenerateContentRequest, payload)
+    parts = [await _audio_upload_part(client, audio)] if audio is not None else []
+    return await _respond_with_content(request, client, body, parts)
+
+async def _audio_upload_part(client: Any, audio: UploadFile) -> types.Part:
+    try:
+        mime_type = await audio_upload_type(audio)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if upload_size(audio) < settings.AUDIO_UPLOAD_FILES_API_MIN_BYTES:
+        return types.Part(inline_data=types.Blob(mime_type=mime_type, data=await audio.read()))
+    uploaded = await gemini_service.invoke(
+        client,
+        "files.upload",
+        pool=POOL_MEDIA,
+        file=audio.file,
+        config=types.UploadFileConfig(mime_type=mime_type, display_name=audio.filename),
+    )
+    return types.Part(file_data=types.FileData(file_uri=uploaded.uri, mime_type=mime_type))
+
+async def _respond_with_content(
+    request: Request, client: Any, body: GenerateContentRequest, extra_parts: Sequence[types.Part] = ()
+) -> Any:
     try:
         history = body.history or []
         contents = [*history, {"role": "user", "parts": [{"text": body.prompt}]}]
+        contents.extend(extra_parts)
 
         if body.audio_inline and body.audio_inline.get('data') and body.audio_inline.get('mime_type'):
             audio_bytes = base64.b64decode(body.audio_inline['data'])
@@ -420,46 +881,131 @@ async def generate_content(request: Request, body: GenerateContentRequest, clien
         if body.audio_file_uri:
             contents.append(types.Part(uri=body.audio_file_uri))
 
-        response = await asyncio.wait_for(
-            gemini_service.run_in_executor(
-                client.models.generate_content,
+        async def generate() -> Dict[str, Any]:
+            response = await gemini_service.invoke(
+                client,
+                "models.generate_content",
                 model=body.model,
                 contents=contents,
+            )
+
+            # Keep inline data as bytes; it is encoded per response format below
+            out = {"candidates": []}
+            if response.candidates:
+                for candidate in response.candidates:
+                    candidate_parts = []
+                    for part in candidate.content.parts:
+                        if getattr(part, 'inline_data', None) and getattr(part.inline_data, 'data', None):
+                            candidate_parts.append({
+                                "inline_data": part.inline_data.data,
+                                "mime_type": part.inline_data.mime_type
+                            })
+                        elif getattr(part, 'text', None):
+                            candidate_parts.append({"text": part.text})
+                        elif getattr(part, 'uri', None):
+                            candidate_parts.append({"uri": part.uri})
+                    out["candidates"].append({"parts": candidate_parts})
+            return out
+
+        result = await asyncio.wait_for(
+            _shared_response(
+                "generate-content",
+                {"model": body.model, "contents": contents},
+                generate,
+                dedupe=body.dedupe,
+                use_cache=body.use_response_cache,
             ),
             timeout=45.0
         )
-
-        # Try to synthesize a simple JSON-friendly response
-        out = {"candidates": []}
-        if response.candidates:
-            for candidate in response.candidates:
-                candidate_parts = []
-                for part in candidate.content.parts:
-                    # Inline data -> base64
-                    if getattr(part, 'inline_data', None) and getattr(part.inline_data, 'data', None):
-                        candidate_parts.append({
-                            "inline_data": base64.b64encode(part.inline_data.data).decode(),
-                            "mime_type": part.inline_data.mime_type
-                        })
-                    elif getattr(part, 'text', None):
-                        candidate_parts.append({"text": part.text})
-                    elif getattr(part, 'uri', None):
-                        candidate_parts.append({"uri": part.uri})
-                out["candidates"].append({"parts": candidate_parts})
-
-        return out
+        return _content_response(request, result, body.model)
 
     except (APIError, GenaiAPIError) as e:
         logger.error(f"Gemini API error in generate_content: {e}")
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI service error: {getattr(e, 'message', str(e))}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in generate_content: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
 
+def _content_part_media(part: Dict[str, Any]) -> Tuple[bytes, str]:
+    if "inline_data" in part:
+        return part["inline_data"], part["mime_type"] or "application/octet-stream"
+    if "text" in part:
+        return part["text"].encode("utf-8"), "text/plain; charset=utf-8"
+    return part["uri"].encode("utf-8"), "text/uri-list"
+
+def _content_response(request: Request, result: Dict[str, Any], model: str) -> Any:
+    indexed = [
+        (candidate_index, part_index, part)
+        for candidate_index, candidate in enumerate(result["candidates"])
+        for part_index, part in enumerate(candidate["parts"])
+    ]
+
+    def to_parts() -> List[MediaPart]:
+        parts = []
+        for candidate_index, part_index, part in indexed:
+            data, media_type = _content_part_media(part)
+            parts.append(MediaPart(data, media_type, {
+                "X-Candidate-Index": str(candidate_index),
+                "X-Part-Index": str(part_index),
+            }))
+        return parts
+
+    def to_json() -> Dict[str, Any]:
+        # Inline data -> base64
+        return {"candidates": [
+            {"parts": [
+                {**part, "inline_data": base64.b64encode(part["inline_data"]).decode()} if "inline_data" in part else part
+                for part in candidate["parts"]
+            ]}
+            for candidate in result["candidates"]
+        ]}
+
+    return _negotiated(
+        request,
+        [_content_part_media(part)[1] for _, _, part in indexed],
+        to_parts,
+        {"X-Model": model},
+        to_json,
+    )
+
 # --- Video Generation Endpoints ---
 @router.post("/generate-video")
 @limiter.limit("5/minute")
 async def generate_video(request: Request, video_request: VideoGenerateRequest, client: Any = Depends(get_gemini_client)):
+    return await _start_video(client, video_request)
+
+@router.post("/generate-video/upload")
+@limiter.limit("5/minute")
+async def generate_video_upload(
+    request: Request,
+    payload: str = Form(..., description="VideoGenerateRequest fields as JSON"),
+    image: Optional[UploadFile] = File(None, description="Start frame (instead of image)"),
+    last_frame: Optional[UploadFile] = File(None, description="Last frame (instead of last_frame)"),
+    reference_images: List[UploadFile] = File([], description="Additional reference images"),
+    client: Any = Depends(get_gemini_client),
+):
+    """`/generate-video` with input frames sent as multipart file parts instead of base64."""
+    video_request = _form_payload(VideoGenerateRequest, payload)
+    if (image is not None and video_request.image) or (last_frame is not None and video_request.last_frame):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Send each frame either as a file or in the payload, not both")
+    return await _start_video(
+        client,
+        video_request,
+        image=(await _read_images([image]))[0] if image is not None else None,
+        last_frame=(await _read_images([last_frame]))[0] if last_frame is not None else None,
+        references=await _read_images(reference_images),
+    )
+
+async def _start_video(
+    client: Any,
+    video_request: VideoGenerateRequest,
+    image: Optional[Tuple[bytes, str]] = None,
+    last_frame: Optional[Tuple[bytes, str]] = None,
+    references: Sequence[Tuple[bytes, str]] = (),
+) -> Dict[str, Any]:
+    """Start a video generation; uploaded frames take the place of their payload fields."""
     try:
         # Construct configuration
         config_params = {}
@@ -467,98 +1013,191 @@ async def generate_video(request: Request, video_request: VideoGenerateRequest,
             config_params['aspect_ratio'] = video_request.aspect_ratio
         if video_request.person_generation:
             config_params['person_generation'] = video_request.person_generation
-        
+
         # Handle reference images
-        if video_request.reference_images:
-            ref_images = []
-            for ref in video_request.reference_images:
-                img_bytes = validate_and_decode_image(ref['data'], ref['mime_type'])
-                ref_images.append(types.Part(inline_data=types.Blob(mime_type=ref['mime_type'], data=img_bytes)))
-            config_params['reference_images'] = ref_images
+        ref_images = [await _decode_video_image(ref) for ref in video_request.reference_images or []]
+        ref_images.extend(_video_image(ref) for ref in references)
+        if ref_images:
+            config_params['reference_images'] = [
+                types.VideoGenerationReferenceImage(image=img, reference_type=types.VideoGenerationReferenceType.ASSET)
+                for img in ref_images
+            ]
 
         # Handle last frame
-        if video_request.last_frame:
-            img_bytes = validate_and_decode_image(video_request.last_frame['data'], video_request.last_frame['mime_type'])
-            config_params['last_frame'] = types.Part(inline_data=types.Blob(mime_type=video_request.last_frame['mime_type'], data=img_bytes))
+        if last_frame is not None:
+            config_params['last_frame'] = _video_image(last_frame)
+        elif video_request.last_frame:
+            config_params['last_frame'] = await _decode_video_image(video_request.last_frame)
 
         config = types.GenerateVideosConfig(**config_params)
 
         # Handle start frame (image)
         image_param = None
-        if video_request.image:
-             img_bytes = validate_and_decode_image(video_request.image['data'], video_request.image['mime_type'])
-             image_param = types.Part(inline_data=types.Blob(mime_type=video_request.image['mime_type'], data=img_bytes))
+        if image is not None:
+            image_param = _video_image(image)
+        elif video_request.image:
+            image_param = await _decode_video_image(video_request.image)
 
         # Call the API
-        operation = await gemini_service.run_in_executor(
-            client.models.generate_videos,
+        operation = await gemini_service.invoke(
+            client,
+            "models.generate_videos",
+            pool=POOL_MEDIA,
             model=video_request.model,
             prompt=video_request.prompt,
             image=image_param,
             config=config
         )
-        
+
+        # Polling is owned by the tracker; clients read its state or subscribe
+        video_operation_tracker.track(client, operation)
         return {"operation_name": operation.name}
 
     except (APIError, GenaiAPIError) as e:
         logger.error(f"Gemini API error in video generation: {e}")
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"AI service error: {getattr(e, 'message', str(e))}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in video generation: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
 
-@router.get("/operations/{operation_name:path}")
-async def get_operation_status(request: Request, operation_name: str, client: Any = Depends(get_gemini_client)):
+async def _tracked_operation(client: Any, operation_name: str):
+    tracked = video_operation_tracker.get(operation_name)
+    if tracked is not None:
+        return tracked
     try:
-        operation = await gemini_service.run_in_executor(
-            client.operations.get,
-            name=operation_name
-        )
-        
-        if operation.done():
-            if operation.error:
-                 return {"status": "failed", "error": operation.error.message}
-            
-            # The result is likely a GenerateVideosResponse which has generated_videos list
-            # We need to serialize it properly
-            result_dict = {}
-            if hasattr(operation, 'result'):
-                 # This might be tricky if result is not easily serializable
-                 # But usually for JSON response we want the video URI
-                 try:
-                     # Attempt to extract video URI if possible
-                     if hasattr(operation.result, 'generated_videos') and operation.result.generated_videos:
-                         video = operation.result.generated_videos[0].video
-                         result_dict = {"video": {"uri": video.uri}}
-                     else:
-                         # Fallback
-                         result_dict = {"raw": str(operation.result)}
-                 except:
-                     result_dict = {"raw": str(operation.result)}
-
-            return {"status": "completed", "result": result_dict}
-        else:
-            return {"status": "processing"}
-
+        return await video_operation_tracker.adopt(client, operation_name)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting operation status: {e}")
         raise HTTPException(status_code=500, detail="Failed to get operation status")
 
+@router.get("/operations/{operation_name:path}/events")
+async def operation_events(request: Request, operation_name: str, client: Any = Depends(get_gemini_client)):
+    """SSE `status` events: the current state now and the final state when the operation finishes."""
+    tracked = await _tracked_operation(client, operation_name)
+
+    async def frames() -> AsyncIterator[bytes]:
+        async for state in video_operation_tracker.watch(tracked):
+            yield sse_encoder.comment('keepalive') if state is None else sse_encoder.typed('status', state)
+
+    return StreamingResponse(frames(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/operations/{operation_name:path}")
+async def get_operation_status(request: Request, operation_name: str, client: Any = Depends(get_gemini_client)):
+    """
+    Status of a video operation from the tracker's local state. Operations
+    it does not know yet are polled once and then tracked.
+    """
+    return (await _tracked_operation(client, operation_name)).describe()
+
+@router.get("/videos/{video_id}")
+async def get_cached_video(request: Request, video_id: str):
+    """
+    A finished video from the local cache (the `local_url` of its operation
+    result), with Range and ETag support so media sources can seek and loop.
+    """
+    entry = video_cache.get(video_id)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found in the local cache.")
+    return ranged_file_response(
+        request,
+        video_cache.path(entry),
+        entry.mime_type,
+        entry.etag,
+        {"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
 # --- OBS-Aware Caching Endpoint ---
 
 class OBSAwareRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=1000)
     model: str = Field("gemini-1.5-flash-001")
-    obs_state: Dict = Field(..., description="Current OBS state")
+    obs_state: Optional[Dict] = Field(None, description="Current OBS state (or give session_id)")
+    session_id: Optional[str] = Field(None, description="OBS session holding the current state, instead of obs_state")
     # NEW: Optional change detection fields
     state_changes: Optional[Dict] = Field(None, description="Changes detected in OBS state since last query")
     recent_changes: Optional[List[Dict]] = Field(None, description="List of recent change records")
     is_first_query: Optional[bool] = Field(False, description="If true, indicates this is the first OBS state query (no deltas)")
+    context_mode: str = Field(
+        "full", pattern=r"^(full|incremental)$",
+        description="'incremental' sends the scene collection as a stable (cacheable) prefix and only status and deltas per request",
+    )
     use_explicit_cache: bool = Field(False, description="Use explicit caching for repeated contexts")
     cache_ttl_minutes: int = Field(30, ge=5, le=120, description="Cache TTL in minutes")
+    dedupe: bool = Field(False, description="Share one upstream call with identical concurrent requests")
+    use_response_cache: bool = Field(False, description="Serve an identical recent response from the response cache")
+    hedge: bool = Field(False, description="Send a second attempt if the first is slower than usual")
+
+    @model_validator(mode='after')
+    def check_state_source(self) -> 'OBSAwareRequest':
+        if (self.obs_state is None) == (self.session_id is None):
+            raise ValueError('Give exactly one of obs_state or session_id')
+        return self
 
 context_builder = OBSContextBuilder()
 
+def _resolve_obs_state(
+    obs_state: Optional[Dict[str, Any]], session_id: Optional[str]
+) -> Tuple[Optional[OBSContextState], Optional[OBSSession]]:
+    """The query's OBS state, from its session (memoized per version) or the request body."""
+    if session_id:
+        session = obs_session_store.get(session_id)
+        return session.context_state(), session
+    if obs_state is not None:
+        return OBSContextState.from_dict(obs_state), None
+    return None, None
+
+def _context_system_message(obs_state: OBSContextState, session: Optional[OBSSession], is_json_output: bool) -> str:
+    """System message of `build_context_prompt`, built once per session state version."""
+    build = lambda: context_builder.build_context_prompt(obs_state, "", is_json_output=is_json_output)[0]
+    return session.memoized(("context_prompt", is_json_output), build) if session else build()
+
+async def _incremental_context(
+    obs_request: OBSAwareRequest, obs_state: OBSContextState, session: Optional[OBSSession] = None
+) -> Tuple[str, types.GenerateContentConfig]:
+    """
+    `(contents, config)` for an incremental OBS-aware query.
+
+    The instruction and scene collection form a prefix that only changes when
+    scenes or sources are added or removed; with `use_explicit_cache` it is
+    served from an explicit cache, otherwise it is the system instruction.
+    """
+    instruction = context_builder.json_system_instruction.strip()
+    build = lambda: context_builder.build_inventory(obs_state)
+    inventory = session.memoized("inventory", build) if session else build()
+    contents = context_builder.build_delta_message(
+        obs_state,
+        obs_request.prompt,
+        state_changes=None if obs_request.is_first_query else obs_request.state_changes,
+        recent_changes=obs_request.recent_changes,
+    )
+
+    cache_name = None
+    if obs_request.use_explicit_cache and len(obs_state.available_scenes) >= 3:
+        cache_name = await gemini_cache_service.get_or_create_prefix_cache(
+            system_instruction=instruction,
+            prefix=inventory,
+            model=obs_request.model,
+            ttl_minutes=obs_request.cache_ttl_minutes,
+        )
+
+    if cache_name:
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=OBSActionResponse,
+            cached_content=cache_name,
+        )
+    else:
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=OBSActionResponse,
+            system_instruction=f"{instruction}\n\n{inventory}",
+        )
+    return contents, config
+
 @router.post("/obs-aware-query", response_model=OBSActionResponse)
 @limiter.limit("15/minute")
 async def obs_aware_query(
@@ -569,63 +1208,68 @@ async def obs_aware_query(
     """
     Enhanced endpoint that uses OBS context to generate structured OBS actions.
     """
+    # Resolved first so an unknown session is a 404, not a wrapped upstream error
+    obs_state, session = _resolve_obs_state(obs_request.obs_state, obs_request.session_id)
     try:
-        obs_state = OBSContextState(
-            current_scene=obs_request.obs_state.get('current_scene', ''),
-            available_scenes=obs_request.obs_state.get('available_scenes', []),
-            active_sources=obs_request.obs_state.get('active_sources', []),
-            streaming_status=obs_request.obs_state.get('streaming_status', False),
-            recording_status=obs_request.obs_state.get('recording_status', False),
-            recent_commands=obs_request.obs_state.get('recent_commands', []),
-            timestamp=datetime.now()
-        )
-
-        # Use explicit caching for complex OBS setups
-        if obs_request.use_explicit_cache and len(obs_state.available_scenes) >= 3:
-            cache_name = await gemini_cache_service.get_or_create_cache(
-                system_instruction=context_builder.base_system_instruction,
-                obs_state=obs_request.obs_state,
-                ttl_minutes=obs_request.cache_ttl_minutes
-            )
-
-            if cache_name:
-                # Generate using cached context
-                result = await gemini_cache_service.generate_with_cache(
-                    cache_name=cache_name,
-                    user_prompt=obs_request.prompt,
-                    model=obs_request.model
+        if obs_request.context_mode == "incremental":
+            user_message, config = await _incremental_context(obs_request, obs_state, session)
+        else:
+            # Use explicit caching for complex OBS setups
+            if obs_request.use_explicit_cache and len(obs_state.available_scenes) >= 3:
+                cache_name = await gemini_cache_service.get_or_create_cache(
+                    system_instruction=context_builder.base_system_instruction,
+                    obs_state=session.state if session else obs_request.obs_state,
+                    ttl_minutes=obs_request.cache_ttl_minutes
                 )
 
-                if result:
-                    # Since we are using the cache, we need to manually construct the OBSActionResponse
-                    # This is a fallback and will not have the structured output of the main path
-                    return OBSActionResponse(
-                        actions=[OBSAction(command="SendMessage", args={"message": result['text']})],
-                        reasoning="Response generated from cache."
+                if cache_name:
+                    # Generate using cached context
+                    result = await gemini_cache_service.generate_with_cache(
+                        cache_name=cache_name,
+                        user_prompt=obs_request.prompt,
+                        model=obs_request.model
                     )
 
-        system_message, user_message = context_builder.build_context_prompt(
-            obs_state,
-            obs_request.prompt,
-            is_json_output=True  # Instruct the builder to format for JSON
-        )
+                    if result:
+                        # Since we are using the cache, we need to manually construct the OBSActionResponse
+                        # This is a fallback and will not have the structured output of the main path
+                        return OBSActionResponse(
+                            actions=[OBSAction(command="SendMessage", args={"message": result['text']})],
+                            reasoning="Response generated from cache."
+                        )
+
+            # Instruct the builder to format for JSON
+            system_message = _context_system_message(obs_state, session, is_json_output=True)
+            user_message = obs_request.prompt.strip()
 
-        response = await asyncio.wait_for(
-            gemini_service.run_in_executor(
-                client.models.generate_content,
+            config = types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=OBSActionResponse,
+                system_instruction=system_message
+            )
+
+        async def generate_actions() -> OBSActionResponse:
+            call = gemini_service.invoke_hedged if obs_request.hedge else gemini_service.invoke
+            response = await call(
+                client,
+                "models.generate_content",
                 model=obs_request.model,
                 contents=user_message,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=OBSActionResponse,
-                    system_instruction=system_message
-                ),
+                config=config,
+            )
+            # Validate and parse the JSON response
+            return OBSActionResponse.model_validate_json(response.text)
+
+        action_response = await asyncio.wait_for(
+            _shared_response(
+                "obs-aware-query",
+                {"model": obs_request.model, "contents": user_message, "config": config},
+                generate_actions,
+                dedupe=obs_request.dedupe,
+                use_cache=obs_request.use_response_cache,
             ),
             timeout=45.0
         )
-
-        # Validate and parse the JSON response
-        action_response = OBSActionResponse.model_validate_json(response.text)
         return action_response
 
     except (APIError, GenaiAPIError) as e:
@@ -634,6 +1278,8 @@ async def obs_aware_query(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"AI service error: {getattr(e, 'message', str(e))}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in obs_aware_query: {e}", exc_info=True)
         # Check for validation errors from Pydantic
@@ -647,6 +1293,90 @@ async def obs_aware_query(
             detail="Failed to process OBS-aware query"
         )
 
+# --- OBS State Sessions ---
+class OBSSessionStateRequest(BaseModel):
+    obs_state: Dict[str, Any] = Field(..., description="Full OBS state")
+    base_version: Optional[int] = Field(None, description="Reject the update unless the session is at this version")
+
+class OBSSessionPatchRequest(BaseModel):
+    base_version: Optional[int] = Field(None, description="Reject the patch unless the session is at this version")
+    patch: Optional[Dict[str, Any]] = Field(None, description="JSON merge patch (RFC 7386) for the state")
+    source_updates: Optional[Dict[str, Optional[Dict[str, Any]]]] = Field(
+        None, description="Merge patches for active_sources entries by name; null removes a source"
+    )
+
+@router.post("/obs-sessions", status_code=status.HTTP_201_CREATED)
+async def create_obs_session(body: OBSSessionStateRequest):
+    """Open a session with the full OBS state; queries then pass its `session_id`."""
+    return obs_session_store.create(body.obs_state).describe()
+
+@router.get("/obs-sessions/{session_id}")
+async def get_obs_session(session_id: str):
+    session = obs_session_store.get(session_id)
+    return {**session.describe(), "obs_state": session.state}
+
+@router.put("/obs-sessions/{session_id}")
+async def replace_obs_session(session_id: str, body: OBSSessionStateRequest):
+    """Replace the session state, e.g. to resync after a 409."""
+    return obs_session_store.replace(session_id, body.obs_state, body.base_version).describe()
+
+@router.patch("/obs-sessions/{session_id}")
+async def patch_obs_session(session_id: str, body: OBSSessionPatchRequest):
+    return obs_session_store.patch(session_id, body.patch, body.source_updates, body.base_version).describe()
+
+@router.delete("/obs-sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_obs_session(session_id: str):
+    if not obs_session_store.delete(session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown or expired OBS session: {session_id}")
+
+# --- Media Store Endpoints ---
+@router.post("/media")
+@limiter.limit("30/minute")
+async def upload_media(request: Request):
+    """
+    Store an image in the content-addressed media store.
+
+    The body is the raw image with its MIME type as Content-Type (or JSON
+    `{"data": <base64>, "mime_type": ...}`). Returns a `sha256:<hex>` handle
+    that image and video requests accept as `{"handle": ...}` in place of
+    base64 data. Uploading the same bytes again returns the same handle.
+    """
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    pool = gemini_service.get_pool(POOL_CPU)
+    try:
+        if content_type == "application/json":
+            payload = await request.json()
+            if not isinstance(payload, dict) or not payload.get("data") or not payload.get("mime_type"):
+                raise ValueError("JSON uploads require 'data' and 'mime_type'")
+            mime_type = payload["mime_type"]
+            data = await pool.run(partial(decode_base64_image, payload["data"], mime_type))
+        else:
+            mime_type = content_type
+            body = await request.body()
+            if not body:
+                raise ValueError("Empty upload")
+            data = await pool.run(partial(validate_image_bytes, body, mime_type))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    entry = await media_store.put(data, mime_type)
+    return entry.describe()
+
+@router.get("/media/{handle}")
+async def get_media_info(handle: str):
+    """Metadata for a stored handle; 404 tells the client to upload it again."""
+    return media_store.get(handle).describe()
+
+@router.get("/cache/stats")
+async def response_cache_stats():
+    """Hit/miss counters and size of the response cache."""
+    return response_cache.stats()
+
+@router.get("/cache/audio/stats")
+async def audio_cache_stats():
+    """Hit/miss counters and size of the on-disk speech and sound-effect cache."""
+    return audio_cache.stats()
+
 @router.post("/cache/cleanup")
 async def cleanup_caches(request: Request):
     """Endpoint to manually trigger cache cleanup"""
@@ -683,6 +1413,7 @@ class FunctionCallingRequest(BaseModel):
     model: str = Field("gemini-2.5-flash-preview-tts", description="Model to use.")
     history: Optional[List[dict]] = Field(None)
     obs_state: Optional[Dict[str, Any]] = Field(None, description="Current OBS state")
+    session_id: Optional[str] = Field(None, description="OBS session holding the current state, instead of obs_state")
 
 class FunctionCallingResponse(BaseModel):
     text: str
@@ -707,19 +1438,29 @@ def get_current_time() -> Dict[str, str]:
     """
     return {"current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
+SOUND_EFFECT_MODEL = "gemini-2.5-flash-preview-tts"
+SOUND_EFFECT_VOICE = "Puck"  # Use a distinct voice for SFX
+
 async def _generate_sound_effect_internal(prompt: str, client: Any) -> str:
     """Internal helper to generate sound effect and return base64 audio."""
+    # Shares entries with /generate-speech requests for the same model and voice
+    cache_key = audio_cache.key(SOUND_EFFECT_MODEL, prompt, {"voice_name": SOUND_EFFECT_VOICE})
+    cached = audio_cache.get(cache_key)
+    if cached is not None:
+        return base64.b64encode(await audio_cache.read_pcm(cached)).decode()
     try:
-        response = await gemini_service.run_in_executor(
-            client.models.generate_content,
-            model="gemini-2.5-flash-preview-tts",
+        response = await gemini_service.invoke(
+            client,
+            "models.generate_content",
+            pool=POOL_MEDIA,
+            model=SOUND_EFFECT_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_modalities=["AUDIO"],
                 speech_config=types.SpeechConfig(
                     voice_config=types.VoiceConfig(
                         prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name="Puck" # Use a distinct voice for SFX
+                            voice_name=SOUND_EFFECT_VOICE
                         )
                     )
                 )
@@ -728,6 +1469,12 @@ async def _generate_sound_effect_internal(prompt: str, client: Any) -> str:
         if response.candidates and response.candidates[0].content.parts:
             audio_part = response.candidates[0].content.parts[0]
             if audio_part.inline_data and audio_part.inline_data.data:
+                await audio_cache.put(
+                    cache_key,
+                    audio_part.inline_data.data,
+                    pcm_sample_rate(audio_part.inline_data.mime_type),
+                    SOUND_EFFECT_MODEL,
+                )
                 return base64.b64encode(audio_part.inline_data.data).decode()
     except Exception as e:
         logger.error(f"Error generating sound effect: {e}")
@@ -744,6 +1491,7 @@ async def function_calling_query(
     fc_request: FunctionCallingRequest,
     client: Any = Depends(get_gemini_client)
 ):
+    obs_state, session = _resolve_obs_state(fc_request.obs_state or None, fc_request.session_id)
     try:
         # 1. Define Tools
         tools_list = [control_obs, get_current_time]
@@ -772,17 +1520,8 @@ async def function_calling_query(
 
         # 2. Build Context
         system_instruction = context_builder.base_system_instruction
-        if fc_request.obs_state:
-             obs_state = OBSContextState(
-                current_scene=fc_request.obs_state.get('current_scene', ''),
-                available_scenes=fc_request.obs_state.get('available_scenes', []),
-                active_sources=fc_request.obs_state.get('active_sources', []),
-                streaming_status=fc_request.obs_state.get('streaming_status', False),
-                recording_status=fc_request.obs_state.get('recording_status', False),
-                recent_commands=fc_request.obs_state.get('recent_commands', []),
-                timestamp=datetime.now()
-            )
-             system_instruction, _ = context_builder.build_context_prompt(obs_state, "", is_json_output=False)
+        if obs_state:
+            system_instruction = _context_system_message(obs_state, session, is_json_output=False)
 
         # 3. Initial Call
         history = fc_request.history or []
@@ -796,8 +1535,9 @@ async def function_calling_query(
             system_instruction=system_instruction
         )
 
-        response = await gemini_service.run_in_executor(
-            client.models.generate_content,
+        response = await gemini_service.invoke(
+            client,
+            "models.generate_content",
             model=fc_request.model,
             contents=contents,
             config=config
@@ -859,8 +1599,9 @@ async def function_calling_query(
                 contents.append(types.Content(role="user", parts=[function_response_part]))
                 
                 # Generate next response
-                response = await gemini_service.run_in_executor(
-                    client.models.generate_content,
+                response = await gemini_service.invoke(
+                    client,
+                    "models.generate_content",
                     model=fc_request.model,
                     contents=contents,
                     config=config
@@ -872,6 +1613,8 @@ async def function_calling_query(
 
         return FunctionCallingResponse(text=final_text, actions=obs_actions)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in function_calling_query: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
-from starlette.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.responses import JSONResponse, PlainTextResponse
 import asyncio
 import logging
 from ...config import settings
+from ...services.gemini_cache_service import gemini_cache_service
 from ...services.gemini_service import gemini_service
+from ...services.obs_sessions import obs_session_store
+from ...services.telemetry import telemetry
+from ...services.video_operations import video_operation_tracker
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -20,6 +24,9 @@ async def health_check():
         except asyncio.TimeoutError:
             service_status = "degraded"
 
+        # An open circuit means some model is failing fast; the service itself still works
+        gemini_status = "degraded" if gemini_service.breakers.any_open() else service_status
+
         return JSONResponse(
             status_code=200 if service_status == "healthy" else 503,
             content={
@@ -27,9 +34,14 @@ async def health_check():
                 "version": "1.1.0",
                 "timestamp": asyncio.get_event_loop().time(),
                 "services": {
-                    "gemini": service_status,
+                    "gemini": gemini_status,
                     "auth": "healthy" if settings.BACKEND_API_KEY else "warning"
-                }
+                },
+                "executor": gemini_service.stats(),
+                "circuit_breakers": gemini_service.breakers.stats(),
+                "video_operations": video_operation_tracker.stats(),
+                "context_caches": gemini_cache_service.stats(),
+                "obs_sessions": obs_session_store.stats(),
             }
         )
     except Exception as e:
@@ -39,6 +51,19 @@ async def health_check():
             content={"status": "unhealthy", "error": "Health check failed"}
         )
 
+@router.get("/pools")
+def pool_stats():
+    """Queue depth, wait time and rejections for each Gemini workload pool."""
+    return gemini_service.stats()
+
+@router.get("/metrics")
+def metrics(request: Request):
+    """Per-model/route Gemini latency, TTFT, token and error metrics in Prometheus text format."""
+    client_host = request.client.host if request.client else None
+    if settings.METRICS_LOCAL_ONLY and client_host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403, detail="Metrics are only available locally")
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
 @router.get("/gemini")
 def gemini_health():
     """Checks if the Gemini API key is available."""
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse, JSONResponse
 import asyncio
-import json
 from ..models import StreamRequest, PublishRequest
 from ...auth import get_api_key
+from ...utils.sse import coalesce_frames, sse_encoder
 
 router = APIRouter()
 
@@ -39,14 +39,14 @@ async def stream(request_params: StreamRequest = Depends(), api_key: str = Depen
                 try:
                     msg = await asyncio.wait_for(q.get(), timeout=15.0)
                 except asyncio.TimeoutError:
-                    yield ':\n\n'  # keepalive
+                    yield sse_encoder.comment()  # keepalive
                     continue
-                data = json.dumps(msg)
-                yield f'data: {data}\n\n'
+                yield sse_encoder.encode(msg)
         finally:
             _remove_queue(channel, q)
 
-    return StreamingResponse(event_generator(), media_type='text/event-stream')
+    frames = coalesce_frames(event_generator(), window_ms=request_params.coalesce_ms)
+    return StreamingResponse(frames, media_type='text/event-stream')
 
 
 @router.post('/publish')
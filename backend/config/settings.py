@@ -93,6 +93,128 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_PASSWORD: str | None = None
 
+    # Gemini execution (native asyncio client with thread-pool fallback)
+    GEMINI_ASYNC_MODE: bool = Field(
+        default=True,
+        description="Use the SDK's native asyncio client (genai.Client.aio) instead of the thread pool"
+    )
+
+    # Workload pools: worker threads and bounded wait queue per workload class
+    GEMINI_POOL_INTERACTIVE_WORKERS: int = Field(default=8, ge=1)
+    GEMINI_POOL_INTERACTIVE_QUEUE: int = Field(default=32, ge=0)
+    GEMINI_POOL_MEDIA_WORKERS: int = Field(default=4, ge=1)
+    GEMINI_POOL_MEDIA_QUEUE: int = Field(default=8, ge=0)
+    GEMINI_POOL_CPU_WORKERS: int = Field(default=2, ge=1)
+    GEMINI_POOL_CPU_QUEUE: int = Field(default=8, ge=0)
+    GEMINI_POOL_MAINTENANCE_WORKERS: int = Field(default=2, ge=1)
+    GEMINI_POOL_MAINTENANCE_QUEUE: int = Field(default=16, ge=0)
+    # Image conditioning runs in worker processes (spawned on first use)
+    GEMINI_POOL_PREPROCESS_WORKERS: int = Field(default=2, ge=1)
+    GEMINI_POOL_PREPROCESS_QUEUE: int = Field(default=8, ge=0)
+    IMAGE_CONDITION_CACHE_MAX_ENTRIES: int = Field(default=128, ge=1)
+    IMAGE_CONDITION_CACHE_MAX_BYTES: int = Field(default=64 * 1024 * 1024, ge=1024)
+
+    # Hedged requests (opt-in per request): second attempt after a latency percentile
+    GEMINI_HEDGE_PERCENTILE: float = Field(default=0.95, gt=0, le=1)
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = Field(default=0.5, ge=0)
+    GEMINI_HEDGE_MAX_DELAY_SECONDS: float = Field(default=5.0, ge=0)
+    GEMINI_HEDGE_FALLBACK_MODEL: str | None = Field(
+        default=None,
+        description="Faster model for the hedge attempt; defaults to the requested model"
+    )
+    GEMINI_HEDGE_BUDGET_RATIO: float = Field(
+        default=0.1,
+        gt=0,
+        le=1,
+        description="Maximum hedges per request on average (1.0 at most doubles upstream load)"
+    )
+
+    # Circuit breaker per model: fail fast (or fall back) while a model is unhealthy
+    GEMINI_BREAKER_FAILURE_RATE: float = Field(default=0.5, gt=0, le=1)
+    GEMINI_BREAKER_MIN_CALLS: int = Field(default=5, ge=1)
+    GEMINI_BREAKER_WINDOW_SECONDS: float = Field(default=60.0, gt=0)
+    GEMINI_BREAKER_OPEN_SECONDS: float = Field(default=30.0, gt=0)
+    GEMINI_BREAKER_HALF_OPEN_CALLS: int = Field(default=1, ge=1)
+    GEMINI_BREAKER_SLOW_CALL_SECONDS: float = Field(
+        default=20.0,
+        gt=0,
+        description="A call cancelled after waiting this long (e.g. by a 30s route deadline) counts as a failure"
+    )
+    GEMINI_BREAKER_FALLBACK_MODEL: str | None = Field(
+        default=None,
+        description="Model to use while the requested model's circuit is open"
+    )
+
+    # Resumable streams: per-stream replay buffers for Last-Event-ID reconnects
+    STREAM_REPLAY_TTL_SECONDS: float = Field(default=120.0, ge=0)
+    STREAM_REPLAY_MAX_STREAMS: int = Field(default=256, ge=1)
+    STREAM_REPLAY_MAX_EVENTS: int = Field(default=4096, ge=1)
+    STREAM_REPLAY_MAX_BYTES: int = Field(default=1024 * 1024, ge=1024)
+    STREAM_ABANDON_AFTER_SECONDS: float = Field(
+        default=10.0,
+        ge=0,
+        description="Cancel a generation once it has had no connected reader for this long"
+    )
+
+    # Response cache for deterministic endpoints (opt-in per request)
+    RESPONSE_CACHE_ROUTES: str = Field(
+        default="obs-aware-query,generate-content,generate-speech",
+        description="Comma-separated list of routes allowed to serve cached responses"
+    )
+    RESPONSE_CACHE_TTL_SECONDS: float = Field(default=300.0, ge=0)
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=512, ge=1)
+    RESPONSE_CACHE_MAX_BYTES: int = Field(default=32 * 1024 * 1024, ge=1024)
+
+    # Telemetry: Prometheus text at /api/health/metrics
+    METRICS_LOCAL_ONLY: bool = Field(
+        default=True,
+        description="Only serve /api/health/metrics to loopback clients"
+    )
+
+    # Content-addressed store for reference media (handles instead of base64)
+    MEDIA_STORE_DIR: str = Field(default="media_store", description="Directory for uploaded reference media")
+    MEDIA_STORE_MAX_BYTES: int = Field(default=512 * 1024 * 1024, ge=1024 * 1024)
+    MEDIA_STORE_USE_FILES_API: bool = Field(
+        default=True,
+        description="Reference larger blobs through Gemini Files API URIs instead of inline data"
+    )
+    MEDIA_STORE_FILES_API_MIN_BYTES: int = Field(default=256 * 1024, ge=0)
+
+    # On-disk cache of synthesized speech and sound effects
+    AUDIO_CACHE_ENABLED: bool = Field(default=True)
+    AUDIO_CACHE_DIR: str = Field(default="audio_cache", description="Directory for cached audio blobs")
+    AUDIO_CACHE_MAX_BYTES: int = Field(default=256 * 1024 * 1024, ge=1024 * 1024)
+    AUDIO_CACHE_MAX_ENTRIES: int = Field(default=2048, ge=1)
+
+    # Video operations: one background poller for all in-flight generations
+    VIDEO_POLL_INITIAL_SECONDS: float = Field(default=5.0, gt=0)
+    VIDEO_POLL_MAX_SECONDS: float = Field(default=30.0, gt=0)
+    VIDEO_POLL_BACKOFF: float = Field(default=1.5, ge=1.0)
+    VIDEO_POLL_BATCH_SIZE: int = Field(default=8, ge=1, description="Operations polled per tracker tick")
+    VIDEO_OPERATION_RETENTION_SECONDS: float = Field(default=3600.0, ge=0)
+
+    # Local copies of finished videos, served with Range/ETag support
+    VIDEO_CACHE_ENABLED: bool = Field(default=True)
+    VIDEO_CACHE_DIR: str = Field(default="video_cache", description="Directory for downloaded videos")
+    VIDEO_CACHE_MAX_BYTES: int = Field(default=2 * 1024 * 1024 * 1024, ge=1024 * 1024)
+
+    # Multipart uploads: audio at least this large goes to the Files API instead of inline
+    AUDIO_UPLOAD_FILES_API_MIN_BYTES: int = Field(default=8 * 1024 * 1024, ge=0)
+
+    # Batch image generation: items generated at once per batch request
+    IMAGE_BATCH_CONCURRENCY: int = Field(default=4, ge=1)
+
+    # Explicit context caches for OBS-aware queries: LRU registry plus expiry sweeper
+    GEMINI_CACHE_MAX_ENTRIES: int = Field(default=32, ge=1)
+    GEMINI_CACHE_SWEEP_SECONDS: float = Field(default=60.0, gt=0)
+    GEMINI_CACHE_FAILURE_TTL_SECONDS: float = Field(default=30.0, ge=0, description="Skip re-creating a cache this long after a failed attempt")
+    GEMINI_CACHE_REGISTRY_PATH: str = Field(default="gemini_cache_registry.json", description="Where the registry is persisted across restarts (empty disables)")
+
+    # Server-side OBS state sessions (queries reference a session_id instead of resending state)
+    OBS_SESSION_MAX_SESSIONS: int = Field(default=64, ge=1)
+    OBS_SESSION_MAX_BYTES: int = Field(default=32 * 1024 * 1024, ge=1024, description="Approximate JSON size of all session states")
+    OBS_SESSION_IDLE_SECONDS: float = Field(default=3600.0, gt=0)
+
     # Streamer.bot (optional, with defaults)
     STREAMERBOT_HOST: str = "127.0.0.1"
     STREAMERBOT_PORT: int = 8080
@@ -20,7 +20,10 @@ from .config.validation import validate_environment, ValidationError
 from .auth import get_api_key
 from .api.routes import gemini, assets, overlays, proxy_7tv, proxy_emotes, health
 from .api.routes import knowledge
+from .services.gemini_cache_service import gemini_cache_service
 from .services.gemini_service import gemini_service
+from .services.stream_replay import stream_replay_registry
+from .services.video_operations import video_operation_tracker
 from .middleware import EnhancedLoggingMiddleware
 from .middleware.timeout import TimeoutMiddleware
 from slowapi import _rate_limit_exceeded_handler
@@ -54,11 +57,21 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize GeminiService: {e}")
         raise
 
+    # Polls in-flight video operations for all clients
+    video_operation_tracker.start()
+    # Drops expired explicit caches locally and upstream
+    gemini_cache_service.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down OBS Copilot backend...")
 
+    # Stop upstream generations that are still feeding replay buffers
+    await stream_replay_registry.shutdown()
+    await video_operation_tracker.shutdown()
+    await gemini_cache_service.shutdown()
+
     try:
         # Give ongoing requests time to complete
         shutdown_timeout = 10.0
@@ -153,9 +166,14 @@ def register_middleware_stack(app: FastAPI):
         ("CORS", CORSMiddleware, {
             "allow_origins": allowed_origins,
             "allow_credentials": True,
-            "allow_methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization", "X-API-KEY", "X-Requested-With"],
-            "expose_headers": ["X-Request-ID"],
+            "allow_methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "X-API-KEY", "X-Requested-With", "Last-Event-ID"],
+            # Metadata that media and streaming responses carry in headers
+            "expose_headers": [
+                "X-Request-ID", "X-Stream-ID", "X-Model", "X-Sample-Rate", "X-Media-Count",
+                "X-Image-Index", "X-Part-Index", "X-Candidate-Index", "X-Audio-Cache", "X-Batch-Size",
+                "ETag", "Accept-Ranges", "Content-Range",
+            ],
             "max_age": 3600,
         }),
         ("RequestValidation", RequestValidationMiddleware, {}),
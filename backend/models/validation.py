@@ -2,6 +2,22 @@ from pydantic import BaseModel, Field, validator, model_validator
 from typing import Optional, List, Dict, Any
 import re
 
+from ..utils.image_ops import CONDITION_OPS, resolve_params
+
+CONDITION_TYPE_PATTERN = rf"^({'|'.join(CONDITION_OPS)})$"
+
+def check_media_ref(ref: Optional[Dict[str, str]], field: str) -> None:
+    """An input image is either `{"handle": ...}` or `{"data": ..., "mime_type": ...}`."""
+    if ref is None:
+        return
+    if ref.get('handle'):
+        if ref.get('data'):
+            raise ValueError(f'{field}: give either handle or data, not both')
+        if not re.match(r'^sha256:[0-9a-fA-F]{64}$', ref['handle']):
+            raise ValueError(f'{field}: handle must look like sha256:<64 hex digits>')
+    elif not (ref.get('data') and ref.get('mime_type')):
+        raise ValueError(f'{field}: requires a media handle or both data and mime_type')
+
 class OBSConnectionRequest(BaseModel):
     url: str = Field(..., min_length=1, max_length=255)
     password: Optional[str] = Field(None, max_length=100)
@@ -22,8 +38,11 @@ class GeminiRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=1000)
     model: str = Field("gemini-1.5-flash-latest")
     history: Optional[List[dict]] = Field(None)
+    coalesce_ms: int = Field(0, ge=0, le=1000, description="Merge SSE frames produced within this window (0 disables coalescing)")
+    coalesce_bytes: int = Field(16384, ge=512, le=262144, description="Flush a coalesced SSE write once it reaches this size")
 
 PROMPT_MAX_LENGTH = 1000
+IMAGE_BATCH_MAX_ITEMS = 16
 
 class ImageGenerateRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=PROMPT_MAX_LENGTH)
@@ -36,7 +55,10 @@ class ImageGenerateRequest(BaseModel):
     reference_images: Optional[List[Dict[str, str]]] = Field(None)
     image_size: Optional[str] = Field(None, pattern=r"^(1024x1024|2048x2048|4096x4096)$")
     search_grounding: bool = Field(False)
-    condition_type: Optional[str] = Field(None, pattern=r"^(canny_edge)$")
+    condition_type: Optional[str] = Field(None, pattern=CONDITION_TYPE_PATTERN)
+    condition_params: Optional[Dict[str, float]] = Field(
+        None, description="Parameters for the conditioning op, e.g. {\"threshold1\": 50} for canny_edge"
+    )
 
     @model_validator(mode='before')
     def check_image_input_dependencies(cls, data: Any) -> Any:
@@ -50,11 +72,27 @@ class ImageGenerateRequest(BaseModel):
                 raise ValueError('image_input is required when image_input_mime_type is provided')
         return data
 
+    @model_validator(mode='after')
+    def check_condition_params(self) -> 'ImageGenerateRequest':
+        if self.condition_params and not self.condition_type:
+            raise ValueError('condition_params requires condition_type')
+        if self.condition_type:
+            resolve_params(self.condition_type, self.condition_params)
+        for i, ref in enumerate(self.reference_images or []):
+            check_media_ref(ref, f'reference_images[{i}]')
+        return self
+
+class ImageBatchRequest(BaseModel):
+    items: List[ImageGenerateRequest] = Field(..., min_length=1, max_length=IMAGE_BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, description="Items generated at once (capped by the server)")
+
 class SpeechGenerateRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=5000)
     model: str = Field("gemini-2.5-flash-preview-tts", description="The model to use for speech generation.")
     voice_config: Optional[Dict[str, Any]] = Field(None)
     multi_speaker_config: Optional[Dict[str, Any]] = Field(None)
+    dedupe: bool = Field(False, description="Share one upstream call with identical concurrent requests")
+    use_response_cache: bool = Field(False, description="Serve an identical recent response from the response cache")
 
 class VideoGenerateRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=1000)
@@ -67,6 +105,14 @@ class VideoGenerateRequest(BaseModel):
     last_frame: Optional[Dict[str, str]] = Field(None)
     video: Optional[Dict[str, str]] = Field(None)
 
+    @model_validator(mode='after')
+    def check_media_refs(self) -> 'VideoGenerateRequest':
+        for i, ref in enumerate(self.reference_images or []):
+            check_media_ref(ref, f'reference_images[{i}]')
+        check_media_ref(self.image, 'image')
+        check_media_ref(self.last_frame, 'last_frame')
+        return self
+
 class OBSAction(BaseModel):
     """Represents a single command to be executed in OBS."""
     command: str = Field(..., description="The OBS command to execute, e.g., 'SetCurrentProgramScene'.")
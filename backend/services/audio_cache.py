@@ -0,0 +1,152 @@
+"""Persistent cache of synthesized audio.
+
+Alert lines ("Thanks for the follow!") and sound-effect prompts repeat a
+lot, so generated audio is kept on disk keyed by (model, prompt, voice
+config). Each entry is a ready-to-serve WAV blob that endpoints can return
+with `FileResponse`; metadata lives in `index.json`. The cache is an LRU
+bounded by `AUDIO_CACHE_MAX_BYTES` and `AUDIO_CACHE_MAX_ENTRIES`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..config import settings
+from ..utils.files import JSONIndex, remove_files, write_atomic
+from ..utils.media import pcm16_to_wav
+
+logger = logging.getLogger(__name__)
+
+# Size of the RIFF header `pcm16_to_wav` prepends
+WAV_HEADER_BYTES = 44
+
+
+@dataclass
+class AudioEntry:
+    key: str
+    model: str
+    sample_rate: int
+    size: int
+    created: float
+
+
+class AudioCache:
+    """Disk-backed LRU of WAV blobs keyed by synthesis parameters."""
+
+    def __init__(self, root: Path, max_bytes: int, max_entries: int, enabled: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, AudioEntry]" = OrderedDict()
+        self._index = JSONIndex(root / "index.json")
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def key(model: str, prompt: str, voice: Any = None) -> str:
+        """Cache key for a synthesis request; `voice` is any JSON-able voice/speaker config."""
+        raw = json.dumps([model, prompt, voice], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _load(self) -> None:
+        try:
+            raw = self._index.load()
+            if raw is None:
+                return
+            # The index is saved least recently used first
+            for item in raw.get("entries", []):
+                entry = AudioEntry(**item)
+                if self.path(entry).exists():
+                    self._entries[entry.key] = entry
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable audio cache index {self._index.path}: {e}")
+
+    async def _save(self, removed: Sequence[Path] = ()) -> None:
+        """Persist the index, then delete the blobs of `removed` entries, off the event loop."""
+        await self._index.save({"entries": [asdict(e) for e in self._entries.values()]})
+        if removed:
+            await asyncio.to_thread(remove_files, removed)
+
+    def path(self, entry: AudioEntry) -> Path:
+        return self.root / f"{entry.key}.wav"
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def get(self, key: str) -> Optional[AudioEntry]:
+        """Entry for `key` if cached (and its blob still exists), marking it recently used."""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and not self.path(entry).exists():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    async def read_pcm(self, entry: AudioEntry) -> bytes:
+        """Raw PCM of a cached entry, for callers that return base64 JSON."""
+        data = await asyncio.to_thread(self.path(entry).read_bytes)
+        return data[WAV_HEADER_BYTES:]
+
+    async def put(self, key: str, pcm: bytes, sample_rate: int, model: str) -> Optional[AudioEntry]:
+        """Store 16-bit PCM as a WAV blob; returns None when caching is disabled."""
+        if not self.enabled:
+            return None
+        entry = AudioEntry(
+            key=key, model=model, sample_rate=sample_rate, size=len(pcm) + WAV_HEADER_BYTES, created=time.time()
+        )
+        if entry.size > self.max_bytes:
+            return None
+        try:
+            # Plain file I/O: a thread, not the admission-controlled CPU pool,
+            # so a busy pool never turns a cache write or hit into a 503
+            await asyncio.to_thread(write_atomic, self.path(entry), pcm16_to_wav(pcm, sample_rate))
+        except Exception as e:
+            # A full or read-only disk must not fail the request that produced the audio
+            logger.warning(f"Could not write audio cache entry {key}: {getattr(e, 'detail', e)}")
+            return None
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        await self._save(removed=self._evict())
+        return entry
+
+    def _evict(self) -> List[Path]:
+        """Drop least recently used entries over the limits; returns their blob paths."""
+        removed = []
+        total = self.size
+        while self._entries and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size
+            removed.append(self.path(entry))
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+audio_cache = AudioCache(
+    root=Path(settings.AUDIO_CACHE_DIR),
+    max_bytes=settings.AUDIO_CACHE_MAX_BYTES,
+    max_entries=settings.AUDIO_CACHE_MAX_ENTRIES,
+    enabled=settings.AUDIO_CACHE_ENABLED,
+)
@@ -0,0 +1,196 @@
+"""Per-model circuit breakers for the Gemini backend.
+
+Each model gets a breaker that watches the outcome of recent calls:
+
+- closed: calls flow normally; once at least `min_calls` outcomes within
+  `window_seconds` show a failure rate of `failure_rate` or more, it opens.
+- open: calls fail immediately (or move to the fallback model) for
+  `open_seconds`, instead of waiting out the request timeouts.
+- half-open: up to `half_open_calls` trial calls are let through; a success
+  closes the breaker again, a failure re-opens it.
+
+Only upstream trouble counts as a failure: timeouts, 5xx and throttling
+(429). Client errors and local pool rejections do not. A cancellation
+only counts once the call had been waiting `slow_call_seconds`: routes
+give up on calls through their own `asyncio.wait_for` deadlines, which
+expire before the service's 60s timeout, so a hanging upstream would
+otherwise never open the breaker.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from google.genai.errors import APIError as GenaiAPIError  # type: ignore
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Upstream status codes that mean the model itself is in trouble
+_UPSTREAM_FAILURE_CODES = {408, 429}
+
+
+def is_upstream_failure(error: BaseException) -> Optional[bool]:
+    """
+    Classifies a call outcome: True for upstream failures, False for errors
+    that say nothing about the model's health, None for cancellations.
+    """
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return None
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if isinstance(error, HTTPException):
+        if error.status_code not in (500, 502, 504):
+            # 503 here is local admission control (or an open breaker), 4xx are ours
+            return False
+        # GeminiService maps SDK errors to HTTP errors; look at the original one
+        error = error.__cause__ or error.__context__ or error
+    if isinstance(error, GenaiAPIError):
+        code = getattr(error, 'code', None)
+        return code is None or code >= 500 or code in _UPSTREAM_FAILURE_CODES
+    return True
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the failure rate of recent calls."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1,
+        slow_call_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.slow_call_seconds = slow_call_seconds
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        # (timestamp, failed) per finished call
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+            logger.info(f"Circuit for {self.name} is half-open; allowing trial calls")
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (reserves a trial slot when half-open)."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._trials < self.half_open_calls:
+            self._trials += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker will let a trial call through (at least 1)."""
+        remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+        return max(int(remaining + 0.999), 1)
+
+    def record(self, error: Optional[BaseException] = None, elapsed: Optional[float] = None) -> None:
+        """
+        Record the outcome of a call that `allow()` let through; `elapsed` is
+        how long it had been waiting for the upstream.
+        """
+        failed = False if error is None else is_upstream_failure(error)
+        if failed is None and self._slow(elapsed):
+            # The caller's deadline gave up on a call that was hanging upstream
+            failed = True
+        state = self.state
+        if state == HALF_OPEN:
+            self._trials = max(self._trials - 1, 0)
+            if failed is None:
+                return
+            if failed:
+                self._open("trial call failed")
+            else:
+                logger.info(f"Circuit for {self.name} closed after a successful trial call")
+                self._state = CLOSED
+                self._outcomes.clear()
+            return
+        if failed is None or state != CLOSED:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+        if len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for _, f in self._outcomes if f)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open(f"{failures}/{len(self._outcomes)} recent calls failed")
+
+    def _slow(self, elapsed: Optional[float]) -> bool:
+        return self.slow_call_seconds is not None and elapsed is not None and elapsed >= self.slow_call_seconds
+
+    def _open(self, reason: str) -> None:
+        logger.warning(f"Circuit for {self.name} opened for {self.open_seconds}s: {reason}")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        failures = sum(1 for _, f in self._outcomes if f)
+        return {
+            "state": state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": failures,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after() if state == OPEN else 0,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Lazily creates one breaker per model name."""
+
+    def __init__(self, fallback_model: Optional[str] = None, **breaker_options: Any):
+        self.fallback_model = fallback_model
+        self.breaker_options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model, **self.breaker_options)
+        return breaker
+
+    def any_open(self) -> bool:
+        return any(breaker.state != CLOSED for breaker in self._breakers.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: breaker.stats() for model, breaker in self._breakers.items()}
+
+    @classmethod
+    def from_settings(cls) -> "CircuitBreakerRegistry":
+        return cls(
+            fallback_model=settings.GEMINI_BREAKER_FALLBACK_MODEL,
+            failure_rate=settings.GEMINI_BREAKER_FAILURE_RATE,
+            min_calls=settings.GEMINI_BREAKER_MIN_CALLS,
+            window_seconds=settings.GEMINI_BREAKER_WINDOW_SECONDS,
+            open_seconds=settings.GEMINI_BREAKER_OPEN_SECONDS,
+            half_open_calls=settings.GEMINI_BREAKER_HALF_OPEN_CALLS,
+            slow_call_seconds=settings.GEMINI_BREAKER_SLOW_CALL_SECONDS,
+        )
@@ -1,15 +1,40 @@
+"""Explicit (context) caches for OBS-aware queries.
+
+Created caches are tracked in a registry bounded to
+`GEMINI_CACHE_MAX_ENTRIES`, in LRU order. A background sweeper (started in
+the app lifespan) drops expired entries every `GEMINI_CACHE_SWEEP_SECONDS`,
+and every entry leaving the registry, whether expired or evicted, is also
+deleted upstream so it stops billing storage. Remote deletes run
+concurrently.
+
+The registry is persisted to `GEMINI_CACHE_REGISTRY_PATH` (key, cache
+name, model and expiry per entry) and reloaded at startup, so a restart
+reuses remote caches that are still live; entries that expired while the
+server was down are deleted upstream by the first sweep.
+
+Concurrent requests for the same OBS state share one `caches.create`, and
+a failed creation is remembered for `GEMINI_CACHE_FAILURE_TTL_SECONDS` so
+callers fall back to uncached generation instead of retrying upstream.
+"""
+import asyncio
 import hashlib
 import json
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from pathlib import Path
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Set
 
 from google import genai  # type: ignore
 from google.genai import types  # type: ignore
 from .gemini_client import get_client
 
 from ..config import settings
+from ..utils.files import JSONIndex
 from .gemini_service import gemini_service
+from .single_flight import SingleFlight
+from .workload_pools import POOL_MAINTENANCE
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +44,13 @@ class GeminiCacheService:
     Google GenAI SDK `genai.Client`.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_entries: int = 32,
+        sweep_interval: float = 60.0,
+        failure_ttl: float = 30.0,
+        registry_path: Optional[Path] = None,
+    ):
         # Client will be retrieved from centralized factory when needed.
         try:
             self.client = get_client()
@@ -28,7 +59,91 @@ class GeminiCacheService:
             logger.warning(f"GenAI client creation failed: {e}", exc_info=True)
             self.client = None
 
-        self.active_caches: Dict[str, Any] = {}
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.failure_ttl = failure_ttl
+        self.active_caches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._creations = SingleFlight()
+        # cache key -> monotonic time until which creation is not retried
+        self._failures: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+        self.evictions = 0
+        self.remote_deletes = 0
+        self.negative_hits = 0
+        self.registry_path = registry_path
+        self._index = JSONIndex(registry_path) if registry_path is not None else None
+        self._load()
+
+    def _load(self) -> None:
+        if self._index is None:
+            return
+        try:
+            raw = self._index.load()
+            if raw is None:
+                return
+            # The registry is saved least recently used first
+            for item in raw.get("entries", []):
+                self.active_caches[item["key"]] = {
+                    "name": item["name"],
+                    "model": item.get("model"),
+                    "expires": datetime.fromisoformat(item["expires"]),
+                    "created": datetime.fromisoformat(item["created"]),
+                }
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cache registry {self.registry_path}: {e}")
+            return
+        logger.info(f"Loaded {len(self.active_caches)} explicit cache(s) from {self.registry_path}")
+
+    async def _save(self) -> None:
+        """Persist the registry off the event loop (see `utils.files.JSONIndex`)."""
+        if self._index is None:
+            return
+        entries = [
+            {
+                "key": key,
+                "name": info["name"],
+                "model": info.get("model"),
+                "expires": info["expires"].isoformat(),
+                "created": info["created"].isoformat(),
+            }
+            for key, info in self.active_caches.items()
+        ]
+        try:
+            await self._index.save({"entries": entries})
+        except OSError as e:
+            logger.warning(f"Could not save cache registry {self.registry_path}: {e}")
+
+    def start(self) -> None:
+        """Start the expiry sweeper (idempotent); its first sweep reconciles a reloaded registry."""
+        if self._task is None or self._task.done():
+            # The limit may have shrunk since the registry was saved
+            if self._evict():
+                self._spawn(self._save())
+            self._task = asyncio.create_task(self._run(), name="gemini-cache-sweeper")
+
+    async def shutdown(self, timeout: float = 5.0) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Let creations and deletes finish rather than leaving caches billing until their TTL
+        if self._background:
+            _, pending = await asyncio.wait(set(self._background), timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            if self.active_caches:
+                try:
+                    await self.cleanup_expired_caches()
+                except Exception as e:
+                    logger.error(f"Cache sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(self.sweep_interval)
 
     def _generate_cache_key(self, system_instruction: str, obs_state: dict) -> str:
         """Generate a consistent cache key for similar OBS states"""
@@ -50,20 +165,63 @@ class GeminiCacheService:
         Get existing cache or create a new one for OBS context.
         Returns cache name if successful, None otherwise.
         """
+        return await self._get_or_create(
+            self._generate_cache_key(system_instruction, obs_state),
+            system_instruction,
+            f"Current OBS State: {json.dumps(obs_state, indent=2)}",
+            "gemini-2.5-flash",
+            ttl_minutes,
+        )
+
+    async def get_or_create_prefix_cache(
+        self, system_instruction: str, prefix: str, model: str, ttl_minutes: int = 30
+    ) -> Optional[str]:
+        """
+        Cache holding a stable context `prefix` for `model`, keyed on its exact
+        text, so only a change to the prefix itself creates a new cache.
+        """
+        cache_key = hashlib.sha256(
+            json.dumps([system_instruction, prefix, model], separators=(',', ':')).encode()
+        ).hexdigest()
+        return await self._get_or_create(cache_key, system_instruction, prefix, model, ttl_minutes)
+
+    async def _get_or_create(
+        self, cache_key: str, system_instruction: str, context: str, model: str, ttl_minutes: int
+    ) -> Optional[str]:
         if not self.client:
             logger.error("Gemini client not initialized. Cannot create cache.")
             return None
 
-        cache_key = self._generate_cache_key(system_instruction, obs_state)
-
         if cache_key in self.active_caches:
             cache_info = self.active_caches[cache_key]
             if datetime.now() < cache_info["expires"]:
                 logger.info(f"Using existing cache: {cache_key}")
+                self.active_caches.move_to_end(cache_key)
                 return cache_info["name"]
             else:
                 del self.active_caches[cache_key]
+                await self._save()
+                self._delete_soon([cache_info])
 
+        retry_at = self._failures.get(cache_key)
+        if retry_at is not None:
+            if time.monotonic() < retry_at:
+                self.negative_hits += 1
+                return None
+            del self._failures[cache_key]
+
+        # Concurrent callers share one creation. It runs as its own task, so a
+        # cache created after every caller gave up is still tracked, not leaked.
+        return await self._creations.do(
+            cache_key,
+            lambda: asyncio.shield(self._spawn(
+                self._create(cache_key, system_instruction, context, model, ttl_minutes)
+            )),
+        )
+
+    async def _create(
+        self, cache_key: str, system_instruction: str, context: str, model: str, ttl_minutes: int
+    ) -> Optional[str]:
         try:
             logger.info(f"Creating new cache for key: {cache_key}")
 
@@ -74,31 +232,34 @@ class GeminiCacheService:
                     types.Content(
                         role='user',
                         parts=[
-                            types.Part.from_text(
-                                f"Current OBS State: {json.dumps(obs_state, indent=2)}"
-                            )
+                            types.Part.from_text(text=context)
                         ],
                     )
                 ],
                 'ttl': f"{ttl_minutes * 60}s",
             }
 
-            cache = await gemini_service.run_in_executor(
-                self.client.caches.create,
-                model="gemini-2.5-flash",
+            cache = await gemini_service.invoke(
+                self.client,
+                "caches.create",
+                model=model,
                 config=config,
             )
 
             self.active_caches[cache_key] = {
                 "name": getattr(cache, 'name', None),
+                "model": model,
                 "expires": datetime.now() + timedelta(minutes=ttl_minutes),
                 "created": datetime.now(),
             }
+            self._evict()
+            await self._save()
             logger.info(f"Created new cache: {getattr(cache, 'name', '<unknown>')} (key: {cache_key})")
             return getattr(cache, 'name', None)
 
         except Exception as e:
             logger.error(f"Failed to create cache: {e}", exc_info=True)
+            self._failures[cache_key] = time.monotonic() + self.failure_ttl
             return None
 
     async def generate_with_cache(
@@ -110,8 +271,9 @@ class GeminiCacheService:
             return None
 
         try:
-            response = await gemini_service.run_in_executor(
-                self.client.models.generate_content,
+            response = await gemini_service.invoke(
+                self.client,
+                "models.generate_content",
                 model=model,
                 contents=user_prompt,
                 config=types.GenerateContentConfig(cached_content=cache_name),
@@ -136,33 +298,80 @@ class GeminiCacheService:
             logger.error("Gemini client not initialized. Cannot clean up caches.")
             return 0
 
+        now_monotonic = time.monotonic()
+        for key in [k for k, retry_at in self._failures.items() if retry_at <= now_monotonic]:
+            del self._failures[key]
+
         now = datetime.now()
         expired_keys = [
             key
             for key, cache_info in self.active_caches.items()
             if now >= cache_info["expires"]
         ]
+        expired = [self.active_caches.pop(key) for key in expired_keys]
+        if expired:
+            await self._save()
+        return await self._delete_remote(expired)
 
-        cleaned_count = 0
-        for key in expired_keys:
-            cache_info = self.active_caches.pop(key, None)
-            if not cache_info:
-                continue
+    def _evict(self) -> bool:
+        """
+        Drop least recently used entries beyond `max_entries`, deleting them
+        upstream; returns whether any were dropped (the caller saves).
+        """
+        evicted = []
+        while len(self.active_caches) > self.max_entries:
+            _, cache_info = self.active_caches.popitem(last=False)
+            evicted.append(cache_info)
+        if evicted:
+            self.evictions += len(evicted)
+            logger.info(f"Evicted {len(evicted)} cache(s) over the {self.max_entries}-entry limit")
+            self._delete_soon(evicted)
+        return bool(evicted)
 
-            try:
-                await gemini_service.run_in_executor(
-                    self.client.caches.delete, name=cache_info["name"]
-                )
-                logger.info(f"Deleted expired cache: {cache_info['name']}")
-                cleaned_count += 1
-            except Exception as e:
-                logger.warning(
-                    f"Failed to delete remote cache {cache_info['name']}: {e}",
-                    exc_info=True,
-                )
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
 
-        return cleaned_count
+    def _delete_soon(self, entries: List[Dict[str, Any]]) -> None:
+        """Delete `entries` upstream in the background, off the request path."""
+        self._spawn(self._delete_remote(entries))
 
+    async def _delete_remote(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Delete caches upstream concurrently; returns how many succeeded."""
+        names = [entry["name"] for entry in entries if entry.get("name")]
+        if not names or not self.client:
+            return 0
+        results = await asyncio.gather(
+            *(gemini_service.invoke(self.client, "caches.delete", name=name, pool=POOL_MAINTENANCE) for name in names),
+            return_exceptions=True,
+        )
+        deleted = 0
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Failed to delete remote cache {name}: {result}")
+            else:
+                logger.info(f"Deleted remote cache: {name}")
+                deleted += 1
+        self.remote_deletes += deleted
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.active_caches),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "remote_deletes": self.remote_deletes,
+            "creations": self._creations.stats(),
+            "negative_hits": self.negative_hits,
+            "running": self._task is not None and not self._task.done(),
+        }
 
 # Singleton instance
-gemini_cache_service = GeminiCacheService()
\ No newline at end of file
+gemini_cache_service = GeminiCacheService(
+    max_entries=settings.GEMINI_CACHE_MAX_ENTRIES,
+    sweep_interval=settings.GEMINI_CACHE_SWEEP_SECONDS,
+    failure_ttl=settings.GEMINI_CACHE_FAILURE_TTL_SECONDS,
+    registry_path=Path(settings.GEMINI_CACHE_REGISTRY_PATH) if settings.GEMINI_CACHE_REGISTRY_PATH else None,
+)
\ No newline at end of file
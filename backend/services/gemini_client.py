@@ -4,7 +4,7 @@ This module creates a single genai.Client instance using the configured
 GEMINI_API_KEY from settings. Other modules should import get_client() to
 access the client. Keeping a single factory simplifies testing and mocking.
 """
-from typing import Optional
+from typing import Any, Optional
 import logging
 from google import genai  # type: ignore
 from ..config import settings
@@ -27,3 +27,11 @@ def get_client() -> genai.Client:
             logger.exception("Failed to initialize google.genai.Client: %s", e)
             raise
     return _client
+
+def get_async_client() -> Any:
+    """Return the native asyncio surface (`genai.Client.aio`) of the shared client.
+
+    The async client shares credentials and the HTTP connection settings of the
+    sync client, so there is still exactly one client per process.
+    """
+    return get_client().aio
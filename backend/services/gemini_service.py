@@ -1,90 +1,504 @@
 import asyncio
+import inspect
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from concurrent.futures import Executor
 from functools import partial
-from typing import Any, Callable, Coroutine
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Dict, Iterator, Optional, Tuple
 
 from fastapi import HTTPException, status
+from google.genai.errors import APIError as GenaiAPIError  # type: ignore
+
+from ..config import settings
+from .circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from .hedging import HedgePolicy
+from .single_flight import SingleFlight
+from .telemetry import telemetry
+from .workload_pools import (
+    POOL_CPU,
+    POOL_INTERACTIVE,
+    POOL_MAINTENANCE,
+    POOL_MEDIA,
+    POOL_PREPROCESS,
+    PoolConfig,
+    WorkloadPool,
+)
 
 logger = logging.getLogger(__name__)
 
+# Sentinel returned by next() when a sync stream is exhausted
+_STREAM_END = object()
+
+def _output_tokens(response: Any) -> Optional[int]:
+    """Candidate token count reported in a response's usage metadata, if any."""
+    count = getattr(getattr(response, 'usage_metadata', None), 'candidates_token_count', None)
+    return count if isinstance(count, int) else None
+
+async def _aclose(iterator: Any) -> None:
+    aclose = getattr(iterator, 'aclose', None)
+    if aclose is not None:
+        await aclose()
+
+class CancellationStats:
+    """
+    Counts generations cut short by a disconnect or timeout.
+
+    Tokens saved are estimated from a moving average of the output tokens of
+    completed calls of the same kind, minus what was produced before the cut.
+    """
+    def __init__(self, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self._expected: Dict[str, float] = {}
+        self.generations = 0
+        self.estimated_tokens_saved = 0
+
+    def observe(self, name: str, output_tokens: Optional[int]) -> None:
+        if not output_tokens:
+            return
+        previous = self._expected.get(name)
+        self._expected[name] = output_tokens if previous is None else (
+            previous + self.smoothing * (output_tokens - previous)
+        )
+
+    def cancelled(self, name: str, produced: int = 0) -> None:
+        self.generations += 1
+        self.estimated_tokens_saved += max(int(self._expected.get(name, 0)) - produced, 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {"generations": self.generations, "estimated_tokens_saved": self.estimated_tokens_saved}
+
+def default_pool_config() -> Dict[str, PoolConfig]:
+    """Pool sizing from settings, one entry per workload class."""
+    return {
+        POOL_INTERACTIVE: PoolConfig(settings.GEMINI_POOL_INTERACTIVE_WORKERS, settings.GEMINI_POOL_INTERACTIVE_QUEUE),
+        POOL_MEDIA: PoolConfig(settings.GEMINI_POOL_MEDIA_WORKERS, settings.GEMINI_POOL_MEDIA_QUEUE),
+        POOL_CPU: PoolConfig(settings.GEMINI_POOL_CPU_WORKERS, settings.GEMINI_POOL_CPU_QUEUE),
+        POOL_MAINTENANCE: PoolConfig(settings.GEMINI_POOL_MAINTENANCE_WORKERS, settings.GEMINI_POOL_MAINTENANCE_QUEUE),
+        POOL_PREPROCESS: PoolConfig(
+            settings.GEMINI_POOL_PREPROCESS_WORKERS, settings.GEMINI_POOL_PREPROCESS_QUEUE, processes=True
+        ),
+    }
+
 class GeminiService:
     """
-    A service to run synchronous Google Gemini API calls in a separate thread pool
-    to avoid blocking the main FastAPI event loop.
+    Runs Google Gemini API calls without blocking the main FastAPI event loop.
+
+    When async mode is enabled, calls go straight to the SDK's native asyncio
+    client (`client.aio`). Methods without an async implementation (and clients
+    without an `aio` surface) fall back to a thread pool. Either way the call
+    is admitted by its workload pool, so per-pool limits always apply.
+
+    Thread-pool work is split into named workload pools (see workload_pools),
+    each with its own workers and bounded wait queue.
     """
-    def __init__(self, max_workers: int = 8):
-        # Using more workers for I/O-bound tasks
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        logger.info(f"GeminiService initialized with {max_workers} workers.")
+    def __init__(self, pools: Optional[Dict[str, PoolConfig]] = None, async_mode: Optional[bool] = None):
+        self.pools: Dict[str, WorkloadPool] = {
+            name: WorkloadPool(name, config.max_workers, config.max_queue, processes=config.processes)
+            for name, config in (pools or default_pool_config()).items()
+        }
+        self.async_mode = settings.GEMINI_ASYNC_MODE if async_mode is None else async_mode
+        # Opt-in deduplication of identical in-flight requests
+        self.single_flight = SingleFlight()
+        self.cancellations = CancellationStats()
+        self.hedging = HedgePolicy.from_settings()
+        self.breakers = CircuitBreakerRegistry.from_settings()
+        sizes = ", ".join(f"{name}={pool.max_workers}" for name, pool in self.pools.items())
+        logger.info(f"GeminiService initialized with pools [{sizes}] (async mode: {self.async_mode}).")
+
+    @property
+    def executor(self) -> Executor:
+        """Executor of the interactive pool (kept for callers of the single-pool API)."""
+        return self.pools[POOL_INTERACTIVE].executor
+
+    def get_pool(self, name: str) -> WorkloadPool:
+        try:
+            return self.pools[name]
+        except KeyError:
+            raise ValueError(f"Unknown workload pool: {name}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait time and rejection counters per pool."""
+        return {
+            "async_mode": self.async_mode,
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+            "single_flight": self.single_flight.stats(),
+            "cancellations": self.cancellations.stats(),
+            "hedging": self.hedging.stats(),
+            "circuit_breakers": self.breakers.stats(),
+        }
 
     async def initialize(self):
         """Initialize service resources."""
         # Add any async initialization logic here if needed
         logger.info("GeminiService initialized.")
 
-    async def run_in_executor(self, sync_func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    @staticmethod
+    def _resolve(root: Any, method: str) -> Any:
+        """Resolve a dotted SDK method path such as 'models.generate_content'."""
+        target = root
+        for attr in method.split('.'):
+            target = getattr(target, attr)
+        return target
+
+    def _resolve_async(self, client: Any, method: str) -> Optional[Callable[..., Awaitable[Any]]]:
+        """Return the native coroutine for `method` on `client.aio`, if one exists."""
+        if not self.async_mode:
+            return None
+        aio = getattr(client, 'aio', None)
+        if aio is None:
+            return None
+        try:
+            func = self._resolve(aio, method)
+        except AttributeError:
+            return None
+        return func if inspect.iscoroutinefunction(func) else None
+
+    async def _guarded(self, awaitable: Awaitable[Any], name: str, args_count: int = 0) -> Any:
         """
-        Runs a synchronous function in the thread pool executor with a timeout.
+        Awaits a Gemini call with a timeout and maps failures to HTTP errors.
         """
-        loop = asyncio.get_event_loop()
         try:
-            # Use functools.partial to pass arguments to the function
-            func = partial(sync_func, *args, **kwargs)
-
             # Add a timeout to prevent requests from hanging indefinitely
-            result = await asyncio.wait_for(
-                loop.run_in_executor(self.executor, func),
-                timeout=60.0  # 60-second timeout for AI requests
-            )
-            return result
-        except asyncio.TimeoutError as e:
-            logger.error(f"Gemini API request timed out after 60s: {sync_func.__name__}")
+            response = await asyncio.wait_for(awaitable, timeout=60.0)  # 60-second timeout for AI requests
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini API request timed out after 60s: {name}")
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail="AI service request timed out. Please try again."
             )
         except asyncio.CancelledError:
-            logger.warning(f"Gemini API request cancelled: {sync_func.__name__}")
+            # Let cancellation propagate so callers' timeouts and disconnect
+            # handling still work; the upstream call has been abandoned
+            logger.warning(f"Gemini API request cancelled: {name}")
+            raise
+        except HTTPException:
+            raise
+        except GenaiAPIError as e:
+            logger.error(f"Gemini API error in {name}: {e}")
             raise HTTPException(
-                status_code=status.HTTP_499_CLIENT_CLOSED_REQUEST,
-                detail="Request was cancelled."
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"AI service error: {getattr(e, 'message', None) or str(e)}"
             )
         except Exception as e:
             logger.error(
-                f"Error in {sync_func.__name__}: {type(e).__name__}: {e}",
+                f"Error in {name}: {type(e).__name__}: {e}",
                 exc_info=True,
-                extra={'function': sync_func.__name__, 'args_count': len(args)}
+                extra={'function': name, 'args_count': args_count}
             )
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="AI service temporarily unavailable."
             )
+        return response
 
-    async def shutdown(self):
-        """Gracefully shuts down the thread pool executor."""
-        logger.info("Shutting down GeminiService thread pool executor.")
-
-        # Shutdown but allow pending tasks to complete
-        self.executor.shutdown(wait=True, cancel_futures=False)
-
-        # If there are any hanging tasks after a timeout, force cancel them
-        # Note: The executor.shutdown() blocks, so we run it in a thread to avoid blocking the event loop
-        loop = asyncio.get_event_loop()
-        shutdown_complete = loop.run_in_executor(
-            None,  # Use default executor
-            lambda: self.executor.shutdown(wait=True)
+    def _count_cut_short(self, name: str, error: BaseException) -> None:
+        # Only a disconnect (cancellation) or our timeout cuts a generation short
+        if isinstance(error, asyncio.CancelledError) or (
+            isinstance(error, HTTPException) and error.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+        ):
+            self.cancellations.cancelled(name)
+
+    async def until_disconnected(self, request: Any, awaitable: Awaitable[Any], poll_interval: float = 0.5) -> Any:
+        """
+        Awaits `awaitable`, cancelling it as soon as the HTTP client disconnects.
+
+        Queued pool work is dropped and native calls close their connection.
+        A sync SDK call that is already running in a worker cannot be
+        interrupted, but its result is discarded.
+        """
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=poll_interval)
+                if done:
+                    return task.result()
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected from {request.url.path}; cancelling generation")
+                    raise HTTPException(status_code=499, detail="Client closed request.")  # Client Closed Request
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def _guard_model(self, kwargs: Dict[str, Any]) -> Optional[CircuitBreaker]:
+        """
+        Returns the breaker guarding a call to `kwargs['model']`.
+
+        If that model's circuit is open, the call is moved to the fallback
+        model when one is configured and healthy; otherwise it fails right
+        away with 503 and a Retry-After hint.
+        """
+        model = kwargs.get('model')
+        if not model:
+            return None
+        breaker = self.breakers.get(model)
+        if breaker.allow():
+            return breaker
+
+        fallback = self.breakers.fallback_model
+        if fallback and fallback != model:
+            fallback_breaker = self.breakers.get(fallback)
+            if fallback_breaker.allow():
+                logger.warning(f"Circuit for {model} is open; using fallback model {fallback}")
+                kwargs['model'] = fallback
+                return fallback_breaker
+
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Model {model} is temporarily unavailable. Please retry shortly.",
+            headers={"Retry-After": str(breaker.retry_after())},
         )
 
+    async def run_in_executor(
+        self, sync_func: Callable[..., Any], *args: Any, pool: str = POOL_INTERACTIVE, **kwargs: Any
+    ) -> Any:
+        """
+        Runs a synchronous function on a workload pool with a timeout.
+
+        Raises a 503 with Retry-After right away if the pool's queue is full.
+        """
+        # Use functools.partial to pass arguments to the function
+        func = partial(sync_func, *args, **kwargs)
+        name = getattr(sync_func, '__name__', repr(sync_func))
+        return await self._guarded(self.get_pool(pool).run(func), name, len(args))
+
+    async def invoke(self, client: Any, method: str, *args: Any, pool: str = POOL_INTERACTIVE, **kwargs: Any) -> Any:
+        """
+        Calls an SDK method by dotted path (e.g. 'models.generate_content').
+
+        Uses `client.aio` when available, otherwise runs the sync method on the
+        given workload pool. Both paths share the same timeout and error mapping.
+        """
+        return await self._invoke(client, method, args, kwargs, pool)
+
+    async def _invoke(
+        self,
+        client: Any,
+        method: str,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        pool: str,
+        count_cancellation: bool = True,
+    ) -> Any:
+        """`invoke`; with `count_cancellation=False` the caller accounts for cut-short calls."""
+        started = time.monotonic()
+        breaker = None
+        try:
+            breaker = self._guard_model(kwargs)
+            async_func = self._resolve_async(client, method)
+            if async_func is None:
+                response = await self.run_in_executor(self._resolve(client, method), *args, pool=pool, **kwargs)
+            else:
+                release = await self.get_pool(pool).acquire()
+                try:
+                    response = await self._guarded(async_func(*args, **kwargs), method, len(args))
+                finally:
+                    release()
+        except BaseException as e:
+            elapsed = time.monotonic() - started
+            if breaker is not None:
+                breaker.record(e, elapsed=elapsed)
+            if count_cancellation:
+                self._count_cut_short(method, e)
+            telemetry.record(kwargs.get('model'), elapsed, error=e)
+            raise
+        if breaker is not None:
+            breaker.record()
+        self.cancellations.observe(method, _output_tokens(response))
+        telemetry.record(kwargs.get('model'), time.monotonic() - started, usage=getattr(response, 'usage_metadata', None))
+        return response
+
+    async def invoke_hedged(
+        self,
+        client: Any,
+        method: str,
+        *args: Any,
+        pool: str = POOL_INTERACTIVE,
+        policy: Optional[HedgePolicy] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Like `invoke`, but sends a second attempt if the first is slow.
+
+        The hedge is sent once the policy's percentile delay has passed and
+        its budget allows it, optionally to the policy's fallback model. The
+        first successful answer wins and the other attempt is cancelled.
+        """
+        policy = policy or self.hedging
+        model = kwargs.get('model')
+        policy.earn()
+
+        # Set once an attempt has won; cancelling the other one after that is
+        # hedging overhead (tokens spent, not saved), not a cut-short generation
+        settled = False
+
+        async def attempt(attempt_kwargs: Dict[str, Any]) -> Any:
+            started = time.monotonic()
+            try:
+                result = await self._invoke(client, method, args, attempt_kwargs, pool, count_cancellation=False)
+            except BaseException as e:
+                if not settled:
+                    self._count_cut_short(method, e)
+                elif isinstance(e, asyncio.CancelledError):
+                    policy.losers_cancelled += 1
+                raise
+            policy.observe(attempt_kwargs.get('model'), time.monotonic() - started)
+            return result
+
+        primary = asyncio.ensure_future(attempt(kwargs))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=policy.delay(model))
+            if done or not policy.try_acquire():
+                return await primary
+
+            hedge_kwargs = dict(kwargs, model=policy.fallback_model or model)
+            logger.info(f"Hedging slow {method} call ({model} -> {hedge_kwargs['model']})")
+            hedge = asyncio.ensure_future(attempt(hedge_kwargs))
+            pending.add(hedge)
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        settled = True
+                        if task is hedge:
+                            policy.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def open_stream(self, client: Any, method: str, pool: str = POOL_INTERACTIVE, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Starts a streaming SDK call and returns an async iterator over its chunks.
+
+        On the native path chunks arrive on the event loop directly. The fallback
+        drives the sync iterator from the workload pool, one chunk per hop.
+
+        Closing the returned iterator early (or cancelling its consumer) closes
+        the upstream response and counts the generation as cancelled.
+        """
+        started = time.monotonic()
+        breaker = None
+        try:
+            breaker = self._guard_model(kwargs)
+            async_func = self._resolve_async(client, method)
+            if async_func is not None:
+                # As on the fallback path, admission covers opening the stream, not reading it
+                release = await self.get_pool(pool).acquire()
+                try:
+                    stream = await self._guarded(async_func(**kwargs), method)
+                finally:
+                    release()
+            else:
+                iterator = await self.run_in_executor(self._resolve(client, method), pool=pool, **kwargs)
+                stream = self._iterate_in_executor(iterator, self.get_pool(pool))
+        except BaseException as e:
+            elapsed = time.monotonic() - started
+            if breaker is not None:
+                breaker.record(e, elapsed=elapsed)
+            self._count_cut_short(method, e)
+            telemetry.record(kwargs.get('model'), elapsed, error=e)
+            raise
+        return self._track_stream(stream, method, kwargs.get('model'), started, breaker)
+
+    async def _track_stream(
+        self,
+        stream: AsyncIterator[Any],
+        name: str,
+        model: Optional[str],
+        started: float,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> AsyncIterator[Any]:
+        produced = 0
+        ttft = None
+        usage = None
+        error: Optional[BaseException] = None
+        try:
+            async for chunk in stream:
+                if ttft is None:
+                    ttft = time.monotonic() - started
+                # Usage counts are cumulative, so the last report wins
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                reported = _output_tokens(chunk)
+                # Estimate from text until a count arrives
+                produced = reported if reported is not None else produced + len(getattr(chunk, 'text', None) or '') // 4
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            logger.info(f"Stream {name} abandoned after ~{produced} output tokens; closing upstream")
+            self.cancellations.cancelled(name, produced)
+            error = e
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        else:
+            self.cancellations.observe(name, produced)
+        finally:
+            if breaker is not None:
+                # Once chunks are flowing the upstream is alive; only a stall before the first one is slow
+                breaker.record(error, elapsed=time.monotonic() - started if ttft is None else None)
+            telemetry.record(model, time.monotonic() - started, usage=usage, ttft=ttft, error=error)
+            await _aclose(stream)
+
+    async def _iterate_in_executor(self, iterator: Iterator[Any], pool: WorkloadPool) -> AsyncIterator[Any]:
+        # next() and close() must not overlap: closing a generator that is
+        # running in another thread raises ValueError
+        lock = threading.Lock()
+
+        def step() -> Any:
+            with lock:
+                return next(iterator, _STREAM_END)
+
+        def close() -> None:
+            with lock:
+                getattr(iterator, 'close', lambda: None)()
+
+        finished = False
+        try:
+            while True:
+                # Run the blocking next() call in a thread; the stream was already
+                # admitted, so its chunks must not be rejected mid-response
+                chunk = await pool.run(step, admit=False)
+                if chunk is _STREAM_END:
+                    finished = True
+                    break
+                yield chunk
+        finally:
+            if not finished:
+                # Don't wait for an in-flight next(); the close runs right after it
+                try:
+                    pool.submit(close, admit=False)
+                except RuntimeError:
+                    logger.debug("Workload pool already shut down; leaving stream to be garbage collected")
+
+    async def shutdown(self):
+        """Gracefully shuts down all workload pools."""
+        logger.info("Shutting down GeminiService workload pools.")
+
+        # executor.shutdown() blocks, so we run it in a thread to avoid blocking the event loop
+        loop = asyncio.get_running_loop()
+        shutdown_complete = asyncio.gather(*(
+            loop.run_in_executor(None, pool.shutdown)  # Use default executor
+            for pool in self.pools.values()
+        ))
+
         try:
             await asyncio.wait_for(shutdown_complete, timeout=5.0)
-            logger.info("GeminiService thread pool shut down gracefully")
+            logger.info("GeminiService workload pools shut down gracefully")
         except asyncio.TimeoutError:
             logger.warning("GeminiService shutdown exceeded timeout, forcing cancellation")
             # Force shutdown of remaining tasks
-            self.executor.shutdown(wait=False, cancel_futures=True)
+            for pool in self.pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
 
         logger.info("GeminiService cleanup complete")
 
 # Create a singleton instance to be used across the application
-gemini_service = GeminiService()
\ No newline at end of file
+gemini_service = GeminiService()
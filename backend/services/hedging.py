@@ -0,0 +1,102 @@
+"""Hedging policy for latency-critical Gemini calls.
+
+If the first attempt has not answered within a high percentile of recent
+latencies for its model, a second attempt is sent (optionally to a faster
+fallback model). The first good answer wins and the other attempt is
+cancelled.
+
+Hedges are paid for from a token bucket. Every request earns `budget_ratio`
+tokens and every hedge spends one, so hedges stay below that fraction of
+traffic. With at most one hedge per request and the ratio capped at 1.0,
+hedging can never more than double upstream load.
+"""
+import logging
+import math
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """Decides when (and whether) a hedge attempt may be sent."""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.5,
+        max_delay: float = 5.0,
+        fallback_model: Optional[str] = None,
+        budget_ratio: float = 0.1,
+        max_budget: float = 10.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        if not 0 < budget_ratio <= 1:
+            raise ValueError("budget_ratio must be in (0, 1]")
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.fallback_model = fallback_model
+        self.budget_ratio = budget_ratio
+        self.max_budget = max_budget
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._budget = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.losers_cancelled = 0
+        self.denied = 0
+
+    def observe(self, model: Optional[str], latency: float) -> None:
+        """Record the latency of a successful attempt."""
+        self._latencies[model or "unknown"].append(latency)
+
+    def delay(self, model: Optional[str]) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        samples = self._latencies.get(model or "unknown")
+        if not samples or len(samples) < self.min_samples:
+            # Not enough history yet; only hedge clearly slow calls
+            return self.max_delay
+        ordered = sorted(samples)
+        index = min(math.ceil(self.percentile * len(ordered)) - 1, len(ordered) - 1)
+        return min(max(ordered[max(index, 0)], self.min_delay), self.max_delay)
+
+    def earn(self) -> None:
+        """Credit the budget for one incoming request."""
+        self.requests += 1
+        self._budget = min(self._budget + self.budget_ratio, self.max_budget)
+
+    def try_acquire(self) -> bool:
+        """Spend one hedge from the budget; False when it is exhausted."""
+        if self._budget < 1:
+            self.denied += 1
+            return False
+        self._budget -= 1
+        self.hedges += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "losers_cancelled": self.losers_cancelled,
+            "denied": self.denied,
+            "budget": round(self._budget, 2),
+            "fallback_model": self.fallback_model,
+            "delays": {model: round(self.delay(model), 3) for model in self._latencies},
+        }
+
+    @classmethod
+    def from_settings(cls) -> "HedgePolicy":
+        return cls(
+            percentile=settings.GEMINI_HEDGE_PERCENTILE,
+            min_delay=settings.GEMINI_HEDGE_MIN_DELAY_SECONDS,
+            max_delay=settings.GEMINI_HEDGE_MAX_DELAY_SECONDS,
+            fallback_model=settings.GEMINI_HEDGE_FALLBACK_MODEL,
+            budget_ratio=settings.GEMINI_HEDGE_BUDGET_RATIO,
+        )
@@ -0,0 +1,104 @@
+"""Image conditioning stage for vision requests.
+
+Conditioning (Canny edges, resize, grayscale, depth-like blur, sketch; see
+`utils.image_ops`) is CPU-bound, so it runs on the process-backed
+`preprocess` workload pool rather than the threads that serve Gemini calls.
+Results are cached in a bounded LRU keyed by (input hash, op, params), so a
+reference image that is reused across requests is processed only once.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+from ..utils.image_ops import apply_condition, resolve_params
+from .gemini_service import gemini_service
+from .workload_pools import POOL_PREPROCESS
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+class ImagePreprocessor:
+    """Runs conditioning ops on the preprocess pool behind an LRU result cache."""
+
+    def __init__(self, max_entries: int, max_bytes: int, timeout: float = 30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._cache: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(image_bytes: bytes, op: str, params: Dict[str, Any]) -> CacheKey:
+        return (
+            hashlib.sha256(image_bytes).hexdigest(),
+            op,
+            json.dumps(params, sort_keys=True, separators=(',', ':')),
+        )
+
+    async def condition(
+        self, image_bytes: bytes, mime_type: str, op: str, params: Optional[Dict[str, float]] = None
+    ) -> bytes:
+        """Return `image_bytes` with `op` applied, from cache when possible."""
+        resolved = resolve_params(op, params)
+        key = self.cache_key(image_bytes, op, resolved)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        pool = gemini_service.get_pool(POOL_PREPROCESS)
+        try:
+            result = await asyncio.wait_for(
+                # partial of a module-level function pickles cleanly into the worker
+                pool.run(partial(apply_condition, image_bytes, mime_type, op, resolved)),
+                timeout=self.timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Image conditioning '{op}' timed out after {self.timeout}s")
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Image preprocessing timed out.")
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except BrokenProcessPool:
+            # The pool already replaced its workers and retried once
+            logger.error("Image preprocessing failed again after restarting its worker pool", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Image preprocessing is unavailable.")
+
+        self._store(key, result)
+        return result
+
+    def _store(self, key: CacheKey, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._cache[key] = value
+        self.size += len(value)
+        while len(self._cache) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._cache),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+image_preprocessor = ImagePreprocessor(
+    max_entries=settings.IMAGE_CONDITION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.IMAGE_CONDITION_CACHE_MAX_BYTES,
+)
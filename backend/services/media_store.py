@@ -0,0 +1,197 @@
+"""Content-addressed store for reference media.
+
+Clients upload an image once and get back a handle (`sha256:<hex>`) that
+requests can use in place of base64 data. Blobs live on disk under
+`MEDIA_STORE_DIR`, with a small JSON index, and are evicted least recently
+used first once the store exceeds `MEDIA_STORE_MAX_BYTES`.
+
+For larger blobs the Gemini Files API URI is tracked per hash and reused
+until shortly before it expires, so repeated requests send a reference
+instead of the bytes. If the upload fails the blob is sent inline.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from google.genai import types  # type: ignore
+
+from ..config import settings
+from ..utils.files import JSONIndex, remove_files, write_atomic
+from .gemini_service import gemini_service
+from .workload_pools import POOL_MEDIA
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = "sha256:"
+_HANDLE_RE = re.compile(r"^sha256:([0-9a-f]{64})$")
+
+# Files API uploads live for 48 hours; stop reusing them a little early
+FILES_API_DEFAULT_TTL = 47 * 3600
+FILES_API_EXPIRY_MARGIN = 3600
+
+
+@dataclass
+class MediaEntry:
+    sha256: str
+    mime_type: str
+    size: int
+    last_used: float
+    file_uri: Optional[str] = None
+    # Wall-clock expiry of `file_uri` (epoch seconds)
+    file_expires_at: Optional[float] = None
+
+    @property
+    def handle(self) -> str:
+        return f"{HANDLE_PREFIX}{self.sha256}"
+
+    def file_uri_valid(self) -> bool:
+        return bool(self.file_uri) and (self.file_expires_at or 0) - FILES_API_EXPIRY_MARGIN > time.time()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"handle": self.handle, "sha256": self.sha256, "mime_type": self.mime_type, "size": self.size}
+
+
+def parse_handle(handle: str) -> str:
+    """Return the hex digest of a `sha256:<hex>` handle; raises 400 if malformed."""
+    match = _HANDLE_RE.match((handle or "").strip().lower())
+    if not match:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid media handle: {handle!r}")
+    return match.group(1)
+
+
+class MediaStore:
+    """Disk-backed, size-bounded blob store keyed by SHA-256."""
+
+    def __init__(self, root: Path, max_bytes: int, files_api_min_bytes: int, use_files_api: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.files_api_min_bytes = files_api_min_bytes
+        self.use_files_api = use_files_api
+        self._entries: Dict[str, MediaEntry] = {}
+        self._index = JSONIndex(root / "index.json")
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            raw = self._index.load()
+            if raw is None:
+                return
+            for item in raw.get("entries", []):
+                entry = MediaEntry(**item)
+                if self._blob_path(entry.sha256).exists():
+                    self._entries[entry.sha256] = entry
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable media store index {self._index.path}: {e}")
+
+    async def _save(self, removed: Sequence[Path] = ()) -> None:
+        """Persist the index, then delete the blobs of `removed` entries, off the event loop."""
+        await self._index.save({"entries": [asdict(e) for e in self._entries.values()]})
+        if removed:
+            await asyncio.to_thread(remove_files, removed)
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    async def put(self, data: bytes, mime_type: str) -> MediaEntry:
+        """Store `data` (if new) and return its entry."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        entry = self._entries.get(sha256)
+        if entry is not None:
+            entry.last_used = time.time()
+            return entry
+
+        path = self._blob_path(sha256)
+        # File I/O runs in a thread rather than the admission-controlled CPU pool
+        await asyncio.to_thread(write_atomic, path, data)
+        entry = MediaEntry(sha256=sha256, mime_type=mime_type, size=len(data), last_used=time.time())
+        self._entries[sha256] = entry
+        await self._save(removed=self._evict())
+        logger.info(f"Stored media {entry.handle} ({entry.size} bytes, {mime_type})")
+        return entry
+
+    def get(self, handle: str) -> MediaEntry:
+        """Entry for `handle`; raises 404 if it was never uploaded or was evicted."""
+        entry = self._entries.get(parse_handle(handle))
+        if entry is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Unknown media handle {handle}; upload it to /api/gemini/media first",
+            )
+        entry.last_used = time.time()
+        return entry
+
+    async def read(self, entry: MediaEntry) -> bytes:
+        return await asyncio.to_thread(self._blob_path(entry.sha256).read_bytes)
+
+    async def part_for(self, client: Any, handle: str) -> types.Part:
+        """
+        Content part for `handle`: a Files API reference when one is (or can
+        be made) available, inline data otherwise.
+        """
+        entry = self.get(handle)
+        if self.use_files_api and entry.size >= self.files_api_min_bytes:
+            if not entry.file_uri_valid():
+                # Concurrent requests for the same blob share a single upload
+                await gemini_service.single_flight.do(
+                    f"files-upload:{entry.sha256}", lambda: self._upload(client, entry)
+                )
+            if entry.file_uri_valid():
+                return types.Part(file_data=types.FileData(file_uri=entry.file_uri, mime_type=entry.mime_type))
+        return types.Part(inline_data=types.Blob(mime_type=entry.mime_type, data=await self.read(entry)))
+
+    async def _upload(self, client: Any, entry: MediaEntry) -> None:
+        try:
+            uploaded = await gemini_service.invoke(
+                client,
+                "files.upload",
+                pool=POOL_MEDIA,
+                file=str(self._blob_path(entry.sha256)),
+                config=types.UploadFileConfig(mime_type=entry.mime_type),
+            )
+        except (HTTPException, OSError) as e:
+            logger.warning(f"Files API upload of {entry.handle} failed, sending inline: {getattr(e, 'detail', e)}")
+            return
+
+        expires = getattr(uploaded, "expiration_time", None)
+        entry.file_uri = getattr(uploaded, "uri", None)
+        entry.file_expires_at = expires.timestamp() if hasattr(expires, "timestamp") else time.time() + FILES_API_DEFAULT_TTL
+        await self._save()
+
+    def _evict(self) -> List[Path]:
+        """Drop least recently used entries over the size limit; returns their blob paths."""
+        removed = []
+        total = self.size
+        for entry in sorted(self._entries.values(), key=lambda e: e.last_used):
+            if total <= self.max_bytes:
+                break
+            del self._entries[entry.sha256]
+            total -= entry.size
+            removed.append(self._blob_path(entry.sha256))
+            logger.info(f"Evicted media {entry.handle} from the store")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "files_api_uris": sum(1 for e in self._entries.values() if e.file_uri_valid()),
+        }
+
+
+media_store = MediaStore(
+    root=Path(settings.MEDIA_STORE_DIR),
+    max_bytes=settings.MEDIA_STORE_MAX_BYTES,
+    files_api_min_bytes=settings.MEDIA_STORE_FILES_API_MIN_BYTES,
+    use_files_api=settings.MEDIA_STORE_USE_FILES_API,
+)
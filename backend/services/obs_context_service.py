@@ -1,5 +1,5 @@
 import json
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -14,6 +14,19 @@ class OBSContextState:
     recent_commands: List[Dict]
     timestamp: datetime
 
+    @classmethod
+    def from_dict(cls, obs_state: Dict[str, Any], timestamp: Optional[datetime] = None) -> 'OBSContextState':
+        """State from the `obs_state` dict clients send (or a session holds)."""
+        return cls(
+            current_scene=obs_state.get('current_scene', ''),
+            available_scenes=obs_state.get('available_scenes', []),
+            active_sources=obs_state.get('active_sources', []),
+            streaming_status=obs_state.get('streaming_status', False),
+            recording_status=obs_state.get('recording_status', False),
+            recent_commands=obs_state.get('recent_commands', []),
+            timestamp=timestamp or datetime.now(),
+        )
+
 class OBSContextBuilder:
     """Builds consistent, cacheable context for Gemini API requests"""
 
@@ -47,7 +60,7 @@ The JSON object must contain two fields:
 
         # Add a concise summary of active sources
         if obs_state.active_sources:
-             source_names = [s.get('sourceName', 'Unknown') for s in obs_state.active_sources[:5]]
+             source_names = [s.get('sourceName') or s.get('inputName') or 'Unknown' for s in obs_state.active_sources[:5]]
              system_parts.append(f"- Active Sources in Current Scene: {', '.join(source_names)}")
 
         system_parts.append(f"- Streaming: {'Active' if obs_state.streaming_status else 'Inactive'}")
@@ -64,4 +77,60 @@ The JSON object must contain two fields:
         system_message = "\n".join(system_parts)
         user_message = (user_input or "").strip()
 
-        return system_message, user_message
\ No newline at end of file
+        return system_message, user_message
+
+    @staticmethod
+    def _status_lines(obs_state: OBSContextState) -> List[str]:
+        return [
+            f"- Current Scene: {obs_state.current_scene}",
+            f"- Streaming: {'Active' if obs_state.streaming_status else 'Inactive'}",
+            f"- Recording: {'Active' if obs_state.recording_status else 'Inactive'}",
+        ]
+
+    def build_inventory(self, obs_state: OBSContextState) -> str:
+        """
+        The slowly changing part of the context: the scene list and the
+        source inventory, sorted so the text only changes when the scene
+        collection does. Incremental mode sends this as a cacheable prefix.
+        """
+        parts = ["OBS SCENE COLLECTION:", f"- Scenes: {', '.join(sorted(obs_state.available_scenes))}"]
+        sources = sorted(
+            (s.get('sourceName') or s.get('inputName') or 'Unknown', s.get('inputKind') or s.get('sourceKind'))
+            for s in obs_state.active_sources
+        )
+        if sources:
+            parts.append("- Sources:")
+            parts.extend(f"  - {name} ({kind})" if kind else f"  - {name}" for name, kind in sources)
+        return "\n".join(parts)
+
+    def build_delta_message(
+        self,
+        obs_state: OBSContextState,
+        user_input: str,
+        state_changes: Optional[Dict[str, Any]] = None,
+        recent_changes: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        """
+        The per-request part of an incremental context: current status, the
+        changes since the last query and recent commands, then the request.
+        """
+        parts = ["CURRENT OBS STATE:", *self._status_lines(obs_state)]
+
+        if state_changes:
+            parts.append("- CHANGES SINCE LAST QUERY:")
+            for key, value in state_changes.items():
+                parts.append(f"  - {key}: {json.dumps(value, sort_keys=True)}")
+
+        if recent_changes:
+            parts.append("- RECENT CHANGES (last 3):")
+            for change in recent_changes[-3:]:
+                parts.append(f"  - [{change.get('type', 'change')}] {json.dumps(change.get('changes'), sort_keys=True)}")
+
+        if obs_state.recent_commands:
+            parts.append("- RECENT COMMANDS (last 3):")
+            for cmd in obs_state.recent_commands[-3:]:
+                args = json.dumps(cmd.get('args')) if cmd.get('args') else '{}'
+                parts.append(f"  - {cmd.get('command', 'N/A')}({args})")
+
+        parts.extend(["", "USER REQUEST:", (user_input or "").strip()])
+        return "\n".join(parts)
@@ -0,0 +1,210 @@
+"""Server-side OBS state sessions.
+
+A client opens a session with its full OBS state once, then keeps it
+current with small patches, and OBS-aware queries reference the session
+by `session_id` instead of resending the whole state. Each update bumps
+the session's version; patches may name the version they were computed
+against and are rejected with 409 if the session has moved on.
+
+Sessions live in memory, bounded by `OBS_SESSION_MAX_SESSIONS` and the
+approximate JSON size `OBS_SESSION_MAX_BYTES`, evicting the least recently
+used first; sessions idle for `OBS_SESSION_IDLE_SECONDS` expire. Values
+derived from a state (the `OBSContextState`, builder output) are memoized
+per version with `OBSSession.memoized`.
+"""
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+from ..utils.sse import dumps
+from .obs_context_service import OBSContextState
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7386 JSON merge patch; returns a new value and leaves `target` untouched."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _source_name(source: Dict[str, Any]) -> Optional[str]:
+    return source.get('sourceName') or source.get('inputName')
+
+
+def apply_source_updates(sources: List[Dict[str, Any]], updates: Dict[str, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge-patch `active_sources` entries by name, so one changed source does
+    not resend the list. A None update removes the source; unknown names
+    are appended.
+    """
+    remaining = dict(updates)
+    result = []
+    for source in sources:
+        name = _source_name(source)
+        if name in remaining:
+            update = remaining.pop(name)
+            if update is None:
+                continue
+            source = merge_patch(source, update)
+        result.append(source)
+    for name, update in remaining.items():
+        if update is not None:
+            result.append(merge_patch({"inputName": name}, update))
+    return result
+
+
+class OBSSession:
+    """One client's OBS state and the values derived from its current version."""
+
+    def __init__(self, session_id: str, state: Dict[str, Any], size: int):
+        self.session_id = session_id
+        self.state = state
+        self.size = size
+        self.version = 1
+        self.updated = datetime.now()
+        self.last_used = time.monotonic()
+        self._memo: Dict[Hashable, Any] = {}
+
+    def memoized(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """`factory()`, computed once per state version."""
+        if key not in self._memo:
+            self._memo[key] = factory()
+        return self._memo[key]
+
+    def context_state(self) -> OBSContextState:
+        return self.memoized("context_state", lambda: OBSContextState.from_dict(self.state, self.updated))
+
+    def update(self, state: Dict[str, Any], size: int) -> None:
+        self.state = state
+        self.size = size
+        self.version += 1
+        self.updated = datetime.now()
+        self._memo.clear()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"session_id": self.session_id, "version": self.version}
+
+
+class OBSSessionStore:
+    """Versioned per-session OBS state, as an LRU bounded by count and bytes."""
+
+    def __init__(self, max_sessions: int = 64, max_bytes: int = 32 * 1024 * 1024, idle_seconds: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, OBSSession]" = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+
+    def _measure(self, state: Dict[str, Any]) -> int:
+        size = len(dumps(state))
+        if size > self.max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"OBS state of {size} bytes exceeds the {self.max_bytes}-byte session limit",
+            )
+        return size
+
+    def create(self, state: Dict[str, Any]) -> OBSSession:
+        session = OBSSession(secrets.token_urlsafe(16), state, self._measure(state))
+        self._sessions[session.session_id] = session
+        self.size += session.size
+        self._evict(keep=session.session_id)
+        return session
+
+    def get(self, session_id: str) -> OBSSession:
+        """The session, marked recently used; raises 404 if it is unknown or expired."""
+        session = self._sessions.get(session_id)
+        if session is not None and time.monotonic() - session.last_used > self.idle_seconds:
+            self._remove(session_id)
+            session = None
+        if session is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown or expired OBS session: {session_id}")
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def replace(self, session_id: str, state: Dict[str, Any], base_version: Optional[int] = None) -> OBSSession:
+        session = self._checked(session_id, base_version)
+        self._update(session, state)
+        return session
+
+    def patch(
+        self,
+        session_id: str,
+        patch: Optional[Dict[str, Any]] = None,
+        source_updates: Optional[Dict[str, Optional[Dict[str, Any]]]] = None,
+        base_version: Optional[int] = None,
+    ) -> OBSSession:
+        """Apply a merge patch and/or per-source updates as one new version."""
+        session = self._checked(session_id, base_version)
+        state = merge_patch(session.state, patch) if patch else dict(session.state)
+        if source_updates:
+            state["active_sources"] = apply_source_updates(state.get("active_sources") or [], source_updates)
+        self._update(session, state)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._remove(session_id) is not None
+
+    def _checked(self, session_id: str, base_version: Optional[int]) -> OBSSession:
+        session = self.get(session_id)
+        if base_version is not None and base_version != session.version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"OBS session is at version {session.version}, not {base_version}; resend the full state",
+            )
+        return session
+
+    def _update(self, session: OBSSession, state: Dict[str, Any]) -> None:
+        size = self._measure(state)
+        self.size += size - session.size
+        session.update(state, size)
+        self._evict(keep=session.session_id)
+
+    def _remove(self, session_id: str) -> Optional[OBSSession]:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.size -= session.size
+        return session
+
+    def _evict(self, keep: str) -> None:
+        while len(self._sessions) > self.max_sessions or self.size > self.max_bytes:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._remove(session_id)
+            self.evictions += 1
+            logger.info(f"Evicted idle OBS session {session_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.size,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+obs_session_store = OBSSessionStore(
+    max_sessions=settings.OBS_SESSION_MAX_SESSIONS,
+    max_bytes=settings.OBS_SESSION_MAX_BYTES,
+    idle_seconds=settings.OBS_SESSION_IDLE_SECONDS,
+)
@@ -0,0 +1,111 @@
+"""Bounded in-memory cache for deterministic Gemini responses.
+
+Entries are keyed by `single_flight.request_key` (model, system instruction,
+contents, generation config) and store the finished response value: the
+validated `OBSActionResponse` or the serialized JSON body. A hit skips both
+the upstream call and re-validation. The cache is an LRU bounded by entry
+count and approximate bytes, and every entry expires after a TTL.
+"""
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ..config import settings
+from ..utils.sse import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate the memory held by a cached value via its JSON size."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_sizeof(k) + _sizeof(v) for k, v in value.items()) + 2
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value) + 2
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    try:
+        return len(dumps(value))
+    except TypeError:
+        return len(repr(value))
+
+
+class ResponseCache:
+    """LRU + TTL cache with a memory cap and per-route hit/miss counters."""
+
+    def __init__(self, routes: Iterable[str], ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.routes = frozenset(routes)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self.size = 0
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+
+    def enabled_for(self, route: str) -> bool:
+        return self.ttl_seconds > 0 and route in self.routes
+
+    def get(self, route: str, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses[route] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits[route] += 1
+        return entry[2]
+
+    def set(self, key: str, value: Any) -> None:
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            logger.debug(f"Response of {size} bytes exceeds the cache cap; not caching")
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+        self.size += size
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        routes = sorted(set(self.hits) | set(self.misses))
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "routes": {
+                route: {"hits": self.hits[route], "misses": self.misses[route]}
+                for route in routes
+            },
+        }
+
+
+response_cache = ResponseCache(
+    routes=[route.strip() for route in settings.RESPONSE_CACHE_ROUTES.split(',') if route.strip()],
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+)
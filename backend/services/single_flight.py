@@ -0,0 +1,85 @@
+"""Single-flight execution of identical in-flight requests.
+
+Concurrent callers that present the same key share one upstream call and
+receive the same result (or exception). A cancelled waiter only detaches
+itself; the shared call is cancelled when its last waiter goes away.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _normalize(value: Any) -> Any:
+    """Convert SDK/pydantic objects into plain JSON-compatible structures."""
+    if isinstance(value, BaseModel):
+        return _normalize(value.model_dump(exclude_none=True))
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    return value
+
+
+def request_key(**parts: Any) -> str:
+    """Stable hash of the normalized request parts (model, contents, config, ...)."""
+    payload = json.dumps(_normalize(parts), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+            self.executions += 1
+        else:
+            self.shared += 1
+            logger.debug(f"Joining in-flight request {key[:12]} ({call.waiters} waiting)")
+
+        call.waiters += 1
+        try:
+            # shield() keeps one waiter's cancellation from cancelling the shared call
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                logger.info(f"Last waiter left in-flight request {key[:12]}; cancelling it")
+                # Forget it now so a new caller starts fresh instead of joining a dying call
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executions": self.executions, "shared": self.shared}
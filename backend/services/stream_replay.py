@@ -0,0 +1,173 @@
+"""Replay buffers that make Gemini SSE streams resumable.
+
+Every stream gets an id, and every frame carries an SSE `id: <stream>:<seq>`.
+The upstream generation is pumped into a `ReplayStream` by a background task
+that is independent of the HTTP response. A client that reconnects with
+`Last-Event-ID` picks up from the buffer while the generation keeps running.
+Buffers are bounded by event count and bytes, and finished streams are kept
+only for a short TTL. A generation that has had no connected reader for
+`abandon_after` seconds is cancelled, which closes the upstream response.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Optional, Tuple
+
+from ..config import settings
+from ..utils.sse import sse_encoder
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayStream:
+    """Bounded, append-only buffer of the frames of one generation."""
+
+    def __init__(self, stream_id: str, max_events: int, max_bytes: int, abandon_after: float = 10.0):
+        self.id = stream_id
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.abandon_after = abandon_after
+        self.readers = 0
+        self._abandon_handle: Optional[asyncio.TimerHandle] = None
+        self.events: Deque[Tuple[int, bytes]] = deque()
+        self.size = 0
+        self.next_seq = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def publish(self, kind: str, data: Any) -> None:
+        """Append a `{"type": kind, "data": data}` frame and wake readers."""
+        seq = self.next_seq
+        self.next_seq += 1
+        frame = sse_encoder.typed(kind, data, event_id=f"{self.id}:{seq}")
+        self.events.append((seq, frame))
+        self.size += len(frame)
+        while self.events and (len(self.events) > self.max_events or self.size > self.max_bytes):
+            _, dropped = self.events.popleft()
+            self.size -= len(dropped)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._cancel_abandon_timer()
+        self._notify()
+
+    def _notify(self) -> None:
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def start(self, events: AsyncIterator[Tuple[str, Any]]) -> None:
+        """Pump `(kind, data)` events into the buffer from a background task."""
+        async def pump():
+            try:
+                async for kind, data in events:
+                    self.publish(kind, data)
+            finally:
+                self.finish()
+
+        self.task = asyncio.create_task(pump(), name=f"gemini-stream-{self.id}")
+
+    async def subscribe(self, after_seq: int = -1) -> AsyncIterator[bytes]:
+        """Yield buffered frames after `after_seq`, then live frames until done."""
+        cursor = after_seq
+        self.readers += 1
+        self._cancel_abandon_timer()
+        try:
+            while True:
+                wakeup = self._wakeup
+                if self.events and self.events[0][0] > cursor + 1:
+                    # Frames between the cursor and the oldest buffered one were evicted
+                    missed = self.events[0][0] - cursor - 1
+                    yield sse_encoder.typed('gap', {'missed_events': missed})
+                for seq, frame in list(self.events):
+                    if seq > cursor:
+                        cursor = seq
+                        yield frame
+                if self.done:
+                    return
+                await wakeup.wait()
+        finally:
+            # The reader went away (disconnect or end of stream)
+            self.readers -= 1
+            if self.readers == 0 and not self.done:
+                self._abandon_handle = asyncio.get_running_loop().call_later(self.abandon_after, self._abandon)
+
+    def _abandon(self) -> None:
+        self._abandon_handle = None
+        if self.readers == 0 and not self.done:
+            logger.info(f"No reader reconnected to stream {self.id} within {self.abandon_after}s; cancelling generation")
+            self.cancel()
+
+    def _cancel_abandon_timer(self) -> None:
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+
+    def cancel(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+class StreamReplayRegistry:
+    """Tracks live and recently finished streams, bounded in count and age."""
+
+    def __init__(self, max_streams: int, ttl_seconds: float, max_events: int, max_bytes: int, abandon_after: float = 10.0):
+        self.max_streams = max_streams
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.abandon_after = abandon_after
+        self._streams: "OrderedDict[str, ReplayStream]" = OrderedDict()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [
+            stream_id for stream_id, stream in self._streams.items()
+            if stream.done and now - stream.finished_at > self.ttl_seconds
+        ]
+        for stream_id in expired:
+            del self._streams[stream_id]
+
+        while len(self._streams) >= self.max_streams:
+            stream_id, stream = self._streams.popitem(last=False)
+            logger.warning(f"Replay registry full; evicting stream {stream_id}")
+            stream.cancel()
+
+    def create(self) -> ReplayStream:
+        self._purge()
+        stream = ReplayStream(uuid.uuid4().hex[:16], self.max_events, self.max_bytes, self.abandon_after)
+        self._streams[stream.id] = stream
+        return stream
+
+    def get(self, stream_id: str) -> Optional[ReplayStream]:
+        self._purge()
+        return self._streams.get(stream_id)
+
+    @staticmethod
+    def parse_event_id(event_id: str) -> Optional[Tuple[str, int]]:
+        """Split a `<stream>:<seq>` event id; returns None if malformed."""
+        stream_id, sep, seq = (event_id or '').strip().rpartition(':')
+        if not sep or not stream_id or not seq.isdigit():
+            return None
+        return stream_id, int(seq)
+
+    async def shutdown(self) -> None:
+        tasks = [s.task for s in self._streams.values() if s.task and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._streams.clear()
+
+
+stream_replay_registry = StreamReplayRegistry(
+    max_streams=settings.STREAM_REPLAY_MAX_STREAMS,
+    ttl_seconds=settings.STREAM_REPLAY_TTL_SECONDS,
+    max_events=settings.STREAM_REPLAY_MAX_EVENTS,
+    max_bytes=settings.STREAM_REPLAY_MAX_BYTES,
+    abandon_after=settings.STREAM_ABANDON_AFTER_SECONDS,
+)
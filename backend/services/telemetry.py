@@ -0,0 +1,205 @@
+"""Per-model, per-route telemetry for Gemini calls.
+
+Every call made through `GeminiService.invoke`/`open_stream` records total
+latency, time to first token (streams), output throughput, prompt/candidate/
+cached token counts and, on failure, the error class. The route label comes
+from a context variable that the API routers bind per request.
+
+Metrics are rendered in the Prometheus text exposition format, without
+depending on a client library.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+# Route label for calls made while handling a request; background work keeps the default
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar("gemini_route", default="none")
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+THROUGHPUT_BUCKETS = (5.0, 10.0, 25.0, 50.0, 100.0, 200.0, 400.0)
+
+TOKEN_KINDS = (
+    ("prompt", "prompt_token_count"),
+    ("candidates", "candidates_token_count"),
+    ("cached", "cached_content_token_count"),
+)
+
+# Model names come from request bodies; cap distinct label sets to bound memory
+MAX_LABEL_SETS = 256
+
+Labels = Tuple[str, ...]
+
+
+async def bind_route(request: Request) -> None:
+    """Router dependency that labels Gemini calls with the matched route's full path template."""
+    route = request.scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if path is None:
+        current_route.set(request.url.path)
+        return
+    # Inside a mounted app the route path is relative to the mount, which
+    # Starlette appends to root_path (the app's own root_path stays in app_root_path)
+    root_path = request.scope.get("root_path", "")
+    app_root_path = request.scope.get("app_root_path", root_path)
+    mount_prefix = root_path[len(app_root_path):] if root_path.startswith(app_root_path) else ""
+    current_route.set(mount_prefix + path)
+
+
+def error_class(error: BaseException) -> str:
+    """Short, low-cardinality label for a failed call."""
+    if isinstance(error, HTTPException):
+        return f"http_{error.status_code}"
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    return type(error).__name__
+
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """Token counts by kind from a response's `usage_metadata` (missing ones skipped)."""
+    counts = {}
+    for kind, attr in TOKEN_KINDS:
+        value = getattr(usage, attr, None)
+        if isinstance(value, int):
+            counts[kind] = value
+    return counts
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class GeminiTelemetry:
+    """Aggregates call outcomes by (model, route) and renders them for Prometheus."""
+
+    LABELS = ("model", "route")
+
+    def __init__(self, max_label_sets: int = MAX_LABEL_SETS):
+        self.max_label_sets = max_label_sets
+        # Keeps rendering consistent with concurrent updates from any thread
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._label_sets = set()
+        self._requests: Dict[Labels, int] = defaultdict(int)
+        self._errors: Dict[Tuple[Labels, str], int] = defaultdict(int)
+        self._tokens: Dict[Tuple[Labels, str], int] = defaultdict(int)
+        self._latency: Dict[Labels, _Histogram] = {}
+        self._ttft: Dict[Labels, _Histogram] = {}
+        self._throughput: Dict[Labels, _Histogram] = {}
+
+    def _labels(self, model: Optional[str], route: Optional[str]) -> Labels:
+        labels = (model or "unknown", route or current_route.get())
+        if labels not in self._label_sets:
+            if len(self._label_sets) >= self.max_label_sets:
+                return ("other", labels[1])
+            self._label_sets.add(labels)
+        return labels
+
+    def record(
+        self,
+        model: Optional[str],
+        latency: float,
+        usage: Any = None,
+        ttft: Optional[float] = None,
+        error: Optional[BaseException] = None,
+        route: Optional[str] = None,
+    ) -> None:
+        """Record one finished (or failed) Gemini call."""
+        counts = usage_counts(usage) if usage is not None else {}
+        with self._lock:
+            labels = self._labels(model, route)
+            self._requests[labels] += 1
+            if error is not None:
+                self._errors[(labels, error_class(error))] += 1
+            for kind, value in counts.items():
+                self._tokens[(labels, kind)] += value
+
+            self._histogram(self._latency, labels, LATENCY_BUCKETS).observe(latency)
+            if ttft is not None:
+                self._histogram(self._ttft, labels, LATENCY_BUCKETS).observe(ttft)
+            candidates = counts.get("candidates")
+            if error is None and candidates and latency > 0:
+                # For streams, throughput is measured from the first token
+                generation_time = latency - ttft if ttft is not None and latency > ttft else latency
+                self._histogram(self._throughput, labels, THROUGHPUT_BUCKETS).observe(candidates / generation_time)
+
+    @staticmethod
+    def _histogram(store: Dict[Labels, _Histogram], labels: Labels, buckets: Sequence[float]) -> _Histogram:
+        histogram = store.get(labels)
+        if histogram is None:
+            histogram = store[labels] = _Histogram(buckets)
+        return histogram
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition (format version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            self._render_counter(lines, "gemini_requests_total", "Gemini calls by model and route.",
+                                 ((labels, "", value) for labels, value in self._requests.items()))
+            self._render_counter(lines, "gemini_errors_total", "Failed Gemini calls by error class.",
+                                 ((labels, f'error="{_escape(err)}"', value)
+                                  for (labels, err), value in self._errors.items()))
+            self._render_counter(lines, "gemini_tokens_total", "Tokens by kind (prompt, candidates, cached).",
+                                 ((labels, f'kind="{kind}"', value)
+                                  for (labels, kind), value in self._tokens.items()))
+            self._render_histograms(lines, "gemini_request_latency_seconds", "Total Gemini call latency.", self._latency)
+            self._render_histograms(lines, "gemini_time_to_first_token_seconds", "Time to first streamed chunk.", self._ttft)
+            self._render_histograms(lines, "gemini_output_tokens_per_second", "Output token throughput.", self._throughput)
+        return "\n".join(lines) + "\n"
+
+    def _render_counter(self, lines: List[str], name: str, help_text: str, samples) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, extra, value in sorted(samples):
+            lines.append(f"{name}{_format_labels(self.LABELS, labels, extra)} {value}")
+
+    def _render_histograms(self, lines: List[str], name: str, help_text: str, store: Dict[Labels, _Histogram]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(store.items()):
+            bounds = [*histogram.buckets, "+Inf"]
+            counts = [*histogram.counts, histogram.count]
+            for bound, count in zip(bounds, counts):
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{_format_labels(self.LABELS, labels, le)} {count}")
+            lines.append(f"{name}_sum{_format_labels(self.LABELS, labels)} {round(histogram.sum, 6)}")
+            lines.append(f"{name}_count{_format_labels(self.LABELS, labels)} {histogram.count}")
+
+
+telemetry = GeminiTelemetry()
@@ -0,0 +1,150 @@
+"""Local cache of generated videos.
+
+When the video operation tracker sees a generation finish, the video is
+downloaded once into `VIDEO_CACHE_DIR` and the operation result gains a
+`local_url`. Viewers and OBS media sources fetch that URL from this server
+with Range/ETag support instead of each hitting the upstream URI. The cache
+is an LRU bounded by `VIDEO_CACHE_MAX_BYTES`, indexed in `index.json`.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..config import settings
+from ..utils.files import JSONIndex, remove_files, write_atomic
+from .gemini_service import gemini_service
+from .video_operations import TrackedOperation, video_operation_tracker
+from .workload_pools import POOL_MEDIA
+
+logger = logging.getLogger(__name__)
+
+LOCAL_URL_PREFIX = "/api/gemini/videos/"
+
+
+@dataclass
+class VideoEntry:
+    video_id: str
+    operation: str
+    mime_type: str
+    size: int
+    etag: str
+    created: float
+
+
+class VideoCache:
+    """Disk-backed LRU of downloaded videos, keyed by operation."""
+
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, VideoEntry]" = OrderedDict()
+        self._index = JSONIndex(root / "index.json")
+        self.downloads = 0
+        self.hits = 0
+        self._load()
+
+    @staticmethod
+    def video_id(operation_name: str) -> str:
+        return hashlib.sha256(operation_name.encode('utf-8')).hexdigest()[:32]
+
+    def _load(self) -> None:
+        try:
+            raw = self._index.load()
+            if raw is None:
+                return
+            for item in raw.get("entries", []):
+                entry = VideoEntry(**item)
+                if self.path(entry).exists():
+                    self._entries[entry.video_id] = entry
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable video cache index {self._index.path}: {e}")
+
+    async def _save(self, removed: Sequence[Path] = ()) -> None:
+        """Persist the index, then delete the blobs of `removed` entries, off the event loop."""
+        await self._index.save({"entries": [asdict(e) for e in self._entries.values()]})
+        if removed:
+            await asyncio.to_thread(remove_files, removed)
+
+    def path(self, entry: VideoEntry) -> Path:
+        return self.root / f"{entry.video_id}.mp4"
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def get(self, video_id: str) -> Optional[VideoEntry]:
+        entry = self._entries.get(video_id)
+        if entry is None or not self.path(entry).exists():
+            return None
+        self._entries.move_to_end(video_id)
+        self.hits += 1
+        return entry
+
+    async def cache_operation(self, tracked: TrackedOperation, result: Dict[str, Any]) -> None:
+        """Completion hook: download the operation's first video and add `local_url` to `result`."""
+        if not self.enabled or "video" not in result:
+            return
+        video_id = self.video_id(tracked.name)
+        if video_id not in self._entries:
+            video = tracked.operation.result.generated_videos[0].video
+            data = getattr(video, 'video_bytes', None)
+            if not data:
+                data = await gemini_service.invoke(tracked.client, "files.download", pool=POOL_MEDIA, file=video)
+            self.downloads += 1
+            if len(data) > self.max_bytes:
+                logger.warning(f"Video for {tracked.name} ({len(data)} bytes) exceeds the cache size")
+                return
+            entry = VideoEntry(
+                video_id=video_id,
+                operation=tracked.name,
+                mime_type=getattr(video, 'mime_type', None) or "video/mp4",
+                size=len(data),
+                etag="",
+                created=time.time(),
+            )
+            # File I/O runs in a thread rather than the admission-controlled CPU pool
+            entry.etag = await asyncio.to_thread(_write_hashed, self.path(entry), data)
+            self._entries[video_id] = entry
+            await self._save(removed=self._evict())
+            logger.info(f"Cached video for {tracked.name} ({entry.size} bytes)")
+        result["video"]["local_url"] = f"{LOCAL_URL_PREFIX}{video_id}"
+
+    def _evict(self) -> List[Path]:
+        """Drop least recently used entries over the size limit; returns their file paths."""
+        removed = []
+        total = self.size
+        while self._entries and total > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size
+            removed.append(self.path(entry))
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "downloads": self.downloads,
+            "hits": self.hits,
+        }
+
+
+def _write_hashed(path: Path, data: bytes) -> str:
+    """Write `data` atomically; returns its strong ETag."""
+    write_atomic(path, data)
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+video_cache = VideoCache(
+    root=Path(settings.VIDEO_CACHE_DIR),
+    max_bytes=settings.VIDEO_CACHE_MAX_BYTES,
+    enabled=settings.VIDEO_CACHE_ENABLED,
+)
+video_operation_tracker.add_completion_hook(video_cache.cache_operation)
@@ -0,0 +1,275 @@
+"""Background tracking of long-running video generation operations.
+
+`/generate-video` hands its operation to `video_operation_tracker`. A
+single background task then owns all upstream polling: each tick polls the
+operations that are due, together, with per-operation backoff from
+`VIDEO_POLL_INITIAL_SECONDS` up to `VIDEO_POLL_MAX_SECONDS`. Status reads
+are answered from local state, and subscribers are pushed the final state
+as soon as a poll sees it finish. Finished operations are kept for
+`VIDEO_OPERATION_RETENTION_SECONDS`.
+
+Completion hooks (see `add_completion_hook`) run before a successful
+operation is reported as completed and may add fields to its result; the
+video cache uses this to download each video once.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from google.genai import types  # type: ignore
+
+from ..config import settings
+from .gemini_service import gemini_service
+from .workload_pools import POOL_MAINTENANCE
+
+logger = logging.getLogger(__name__)
+
+STATUS_PROCESSING = "processing"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+CompletionHook = Callable[['TrackedOperation', Dict[str, Any]], Awaitable[None]]
+
+
+def describe_result(operation: Any) -> Dict[str, Any]:
+    """JSON-friendly result of a finished video operation."""
+    result = getattr(operation, 'result', None) or getattr(operation, 'response', None)
+    try:
+        videos = getattr(result, 'generated_videos', None)
+        if videos:
+            return {"video": {"uri": videos[0].video.uri}}
+    except AttributeError:
+        pass
+    return {"raw": str(result)}
+
+
+class TrackedOperation:
+    """Local state of one upstream operation."""
+
+    def __init__(self, client: Any, operation: Any, interval: float):
+        self.client = client
+        self.operation = operation
+        self.name: str = operation.name
+        self.status = STATUS_PROCESSING
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished_at: Optional[float] = None
+        self.interval = interval
+        self.next_poll = time.monotonic()
+        self.polls = 0
+        self.failures = 0
+        self.finished = asyncio.Event()
+
+    def describe(self) -> Dict[str, Any]:
+        if self.status == STATUS_COMPLETED:
+            return {"status": self.status, "result": self.result}
+        if self.status == STATUS_FAILED:
+            return {"status": self.status, "error": self.error}
+        return {"status": self.status}
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        self.status, self.result, self.error = status, result, error
+        self.finished_at = time.time()
+        self.finished.set()
+
+
+class VideoOperationTracker:
+    """Polls all in-flight video operations from one background task."""
+
+    def __init__(
+        self,
+        initial_interval: float = 5.0,
+        max_interval: float = 30.0,
+        backoff: float = 1.5,
+        batch_size: int = 8,
+        retention_seconds: float = 3600.0,
+        max_failures: int = 5,
+    ):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.max_failures = max_failures
+        self._operations: Dict[str, TrackedOperation] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._hooks: List[CompletionHook] = []
+        self._completions: Set[asyncio.Task] = set()
+        self.upstream_polls = 0
+
+    def add_completion_hook(self, hook: CompletionHook) -> None:
+        """Run `hook(tracked, result)` for each successful operation before it is reported."""
+        self._hooks.append(hook)
+
+    def start(self) -> None:
+        """Start the polling task (idempotent; `track` also starts it on demand)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="video-operation-tracker")
+
+    async def shutdown(self) -> None:
+        # Stop in-progress completion hooks (e.g. video cache downloads) and wait for them to unwind
+        completions = list(self._completions)
+        for task in completions:
+            task.cancel()
+        await asyncio.gather(*completions, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, name: str) -> Optional[TrackedOperation]:
+        return self._operations.get(name)
+
+    def track(self, client: Any, operation: Any) -> TrackedOperation:
+        """Take over polling of `operation` (a no-op if it is already tracked)."""
+        tracked = self._operations.get(operation.name)
+        if tracked is None:
+            tracked = TrackedOperation(client, operation, self.initial_interval)
+            # A new generation needs time before the first poll is useful
+            tracked.next_poll += self.initial_interval
+            self._operations[tracked.name] = tracked
+            self._wakeup.set()
+        self.start()
+        return tracked
+
+    async def adopt(self, client: Any, name: str) -> TrackedOperation:
+        """
+        Track an operation this process did not start (e.g. after a restart),
+        polling it once so the caller gets its real state.
+        """
+        tracked = self._operations.get(name)
+        if tracked is None:
+            tracked = TrackedOperation(client, types.GenerateVideosOperation(name=name), self.initial_interval)
+            self._operations[name] = tracked
+            try:
+                await self._poll(tracked, raise_errors=True)
+            except BaseException:
+                self._operations.pop(name, None)
+                raise
+            self._wakeup.set()
+            self.start()
+        return tracked
+
+    async def watch(self, tracked: TrackedOperation, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Current state of a tracked operation, then its final state once it
+        finishes. Yields None every `keepalive` seconds while waiting.
+
+        Takes the operation rather than its name, so a watch keeps working
+        if the operation is pruned before or while the stream runs.
+        """
+        yield tracked.describe()
+        if tracked.finished.is_set():
+            return
+        while not tracked.finished.is_set():
+            try:
+                await asyncio.wait_for(tracked.finished.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield None
+        yield tracked.describe()
+
+    async def _run(self) -> None:
+        while True:
+            self._prune()
+            now = time.monotonic()
+            due = sorted(
+                (op for op in self._operations.values() if not op.finished.is_set() and op.next_poll <= now),
+                key=lambda op: op.next_poll,
+            )[:self.batch_size]
+            if due:
+                await asyncio.gather(*(self._poll(op) for op in due))
+
+            pending = [
+                op.next_poll for op in self._operations.values()
+                if not op.finished.is_set() and math.isfinite(op.next_poll)
+            ]
+            delay = max(min(pending) - time.monotonic(), 0.0) if pending else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, tracked: TrackedOperation, raise_errors: bool = False) -> None:
+        tracked.polls += 1
+        self.upstream_polls += 1
+        try:
+            operation = await gemini_service.invoke(
+                tracked.client, "operations.get", tracked.operation, pool=POOL_MAINTENANCE
+            )
+        except HTTPException as e:
+            if raise_errors:
+                raise
+            tracked.failures += 1
+            logger.warning(f"Polling video operation {tracked.name} failed ({tracked.failures}): {e.detail}")
+            if tracked.failures >= self.max_failures:
+                tracked.finish(STATUS_FAILED, error=f"Lost track of operation: {e.detail}")
+            else:
+                self._schedule(tracked)
+            return
+
+        tracked.failures = 0
+        tracked.operation = operation
+        # `done` is a field on genai operations, not a method
+        if operation.done:
+            if operation.error:
+                message = operation.error.get('message') if isinstance(operation.error, dict) else operation.error
+                tracked.finish(STATUS_FAILED, error=str(message))
+                logger.info(f"Video operation {tracked.name} failed after {tracked.polls} poll(s)")
+            elif self._hooks:
+                # Hooks may take a while (downloads), so they run off the polling loop
+                tracked.next_poll = float('inf')
+                task = asyncio.create_task(self._complete(tracked, describe_result(operation)))
+                self._completions.add(task)
+                task.add_done_callback(self._completions.discard)
+            else:
+                self._complete_now(tracked, describe_result(operation))
+        else:
+            self._schedule(tracked)
+
+    async def _complete(self, tracked: TrackedOperation, result: Dict[str, Any]) -> None:
+        for hook in self._hooks:
+            try:
+                await hook(tracked, result)
+            except Exception as e:
+                logger.error(f"Completion hook failed for video operation {tracked.name}: {e}", exc_info=True)
+        self._complete_now(tracked, result)
+
+    def _complete_now(self, tracked: TrackedOperation, result: Dict[str, Any]) -> None:
+        tracked.finish(STATUS_COMPLETED, result=result)
+        logger.info(f"Video operation {tracked.name} completed after {tracked.polls} poll(s)")
+
+    def _schedule(self, tracked: TrackedOperation) -> None:
+        tracked.next_poll = time.monotonic() + tracked.interval
+        tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for name in [n for n, op in self._operations.items() if op.finished_at and op.finished_at < cutoff]:
+            del self._operations[name]
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight = sum(1 for op in self._operations.values() if not op.finished.is_set())
+        return {
+            "tracked": len(self._operations),
+            "in_flight": in_flight,
+            "upstream_polls": self.upstream_polls,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+video_operation_tracker = VideoOperationTracker(
+    initial_interval=settings.VIDEO_POLL_INITIAL_SECONDS,
+    max_interval=settings.VIDEO_POLL_MAX_SECONDS,
+    backoff=settings.VIDEO_POLL_BACKOFF,
+    batch_size=settings.VIDEO_POLL_BATCH_SIZE,
+    retention_seconds=settings.VIDEO_OPERATION_RETENTION_SECONDS,
+)
@@ -0,0 +1,254 @@
+"""Named, separately sized executor pools with admission control.
+
+Each workload class (interactive text, media generation, CPU preprocessing,
+maintenance) gets its own executor and a bounded wait queue, so slow media
+jobs cannot starve interactive requests. When a pool's queue is full, new
+work is rejected immediately with 503 and a Retry-After hint instead of
+piling up until a timeout fires.
+
+Native asyncio calls (the SDK's `client.aio` surface) go through the same
+admission: `acquire` counts them against the pool's queue bound and waits
+for one of `max_workers` run slots before the call starts.
+
+Pools configured with `processes=True` run on a process pool instead, for
+CPU-bound work that would otherwise contend for the GIL. Their tasks must be
+picklable (module-level functions and plain arguments) and go through `run`,
+which holds a run slot in this process for as long as the task runs so the
+stats can tell running from queued work. If a worker dies and breaks the
+process pool, it is replaced with a fresh one and the task is retried once.
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+POOL_INTERACTIVE = "interactive"
+POOL_MEDIA = "media"
+POOL_CPU = "cpu"
+POOL_MAINTENANCE = "maintenance"
+POOL_PREPROCESS = "preprocess"
+
+
+@dataclass
+class PoolConfig:
+    """Sizing for a single workload pool."""
+    max_workers: int
+    max_queue: int
+    processes: bool = False
+
+
+class WorkloadPool:
+    """A named executor that admits at most `max_workers + max_queue` tasks."""
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_queue: int,
+        executor: Optional[Executor] = None,
+        processes: bool = False,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        if executor is None and processes:
+            executor = self._process_executor()
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"gemini-{name}"
+        )
+        self.processes = isinstance(self.executor, ProcessPoolExecutor)
+        self.restarts = 0
+        self._executor_lock = threading.Lock()
+
+        # Counters are touched from worker threads and the event loop
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+        # Run slots for native async calls, one semaphore per event loop
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+    def _process_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a multi-threaded server process is unsafe
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _restart(self, broken: Executor) -> None:
+        """Replaces a broken process pool, unless a concurrent caller already did."""
+        with self._executor_lock:
+            if self.executor is not broken:
+                return
+            logger.warning(f"Workload pool '{self.name}' lost a worker process; starting a new process pool")
+            self.executor = self._process_executor()
+            self.restarts += 1
+        broken.shutdown(wait=False)
+
+    @property
+    def queued(self) -> int:
+        return max(self.in_flight - self.active, 0)
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until a queue slot frees up (1-60)."""
+        with self._lock:
+            avg_run = self._total_run / self.completed if self.completed else 1.0
+            backlog = self.queued + 1
+        return min(max(math.ceil(avg_run * backlog / self.max_workers), 1), 60)
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self.in_flight < self.max_workers + self.max_queue:
+                self.in_flight += 1
+                return
+            self.rejected += 1
+        retry_after = self.retry_after()
+        logger.warning(f"Workload pool '{self.name}' is saturated; rejecting request (retry after {retry_after}s)")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The {self.name} workload queue is full. Please retry shortly.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def _release(self, _future: Future) -> None:
+        # Runs for completed and cancelled (never started) tasks alike
+        with self._lock:
+            self.in_flight -= 1
+
+    def _instrument(self, func: Callable[[], Any], submitted: float) -> Callable[[], Any]:
+        def run() -> Any:
+            started = time.monotonic()
+            wait = started - submitted
+            with self._lock:
+                self.active += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                return func()
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self._total_run += time.monotonic() - started
+        return run
+
+    def submit(self, func: Callable[[], Any], admit: bool = True) -> Future:
+        """
+        Submits `func` to this pool's executor and returns its future.
+
+        With `admit=False` the task bypasses the queue limit; this is used for
+        follow-up work of an already admitted request (e.g. stream chunks).
+        Process-backed pools only accept work through `run`.
+        """
+        if self.processes:
+            raise RuntimeError(f"Workload pool '{self.name}' runs in processes; use run()")
+        if admit:
+            self._admit()
+        else:
+            with self._lock:
+                self.in_flight += 1
+
+        submitted = time.monotonic()
+        try:
+            future = self.executor.submit(self._instrument(func, submitted))
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func: Callable[[], Any], admit: bool = True) -> Any:
+        """Runs `func` on this pool's executor (see `submit`)."""
+        if not self.processes:
+            return await asyncio.wrap_future(self.submit(func, admit=admit))
+
+        # Worker processes can't update our counters, so the task holds a
+        # run slot here; the executor itself never has work waiting
+        release = await self.acquire(admit=admit)
+        try:
+            for attempt in range(2):
+                executor = self.executor
+                try:
+                    return await asyncio.wrap_future(executor.submit(func))
+                except BrokenProcessPool:
+                    if attempt:
+                        raise
+                    self._restart(executor)
+        finally:
+            release()
+
+    async def acquire(self, admit: bool = True) -> Callable[[], None]:
+        """
+        Admits a native async call and waits for a run slot.
+
+        Raises 503 with Retry-After if the queue is full, like `submit`.
+        Returns the callable that releases the slot once the call is done.
+        """
+        if admit:
+            self._admit()
+        else:
+            with self._lock:
+                self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_workers)
+        submitted = time.monotonic()
+        try:
+            await slots.acquire()
+        except BaseException:
+            self._release(None)
+            raise
+
+        started = time.monotonic()
+        wait = started - submitted
+        with self._lock:
+            self.active += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            slots.release()
+            with self._lock:
+                self.active -= 1
+                self.in_flight -= 1
+                self.completed += 1
+                self._total_run += time.monotonic() - started
+        return release
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.completed
+            return {
+                "processes": self.processes,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": max(self.in_flight - self.active, 0),
+                "completed": completed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 2) if completed else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2),
+                "avg_run_ms": round(self._total_run / completed * 1000, 2) if completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
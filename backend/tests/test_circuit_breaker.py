@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from google.genai.errors import APIError as GenaiAPIError
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    is_upstream_failure,
+)
+from backend.services.gemini_service import GeminiService
+
+
+def _api_error(code):
+    return GenaiAPIError(code, {"error": {"message": "boom", "status": "X"}})
+
+
+def test_failure_classification():
+    assert is_upstream_failure(asyncio.TimeoutError()) is True
+    assert is_upstream_failure(_api_error(429)) is True
+    assert is_upstream_failure(_api_error(500)) is True
+    assert is_upstream_failure(_api_error(400)) is False
+    assert is_upstream_failure(HTTPException(status_code=503)) is False
+    assert is_upstream_failure(asyncio.CancelledError()) is None
+
+
+def test_breaker_opens_then_half_opens_and_closes():
+    breaker = CircuitBreaker("m", failure_rate=0.5, min_calls=4, open_seconds=0.05)
+    breaker.record()
+    breaker.record(asyncio.TimeoutError())
+    breaker.record()
+    assert breaker.state == CLOSED
+    breaker.record(asyncio.TimeoutError())
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    breaker._opened_at -= 1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial call at a time
+    breaker.record()
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker("m", min_calls=1, open_seconds=10)
+    breaker.record(asyncio.TimeoutError())
+    breaker._opened_at -= 20
+    assert breaker.allow()
+    breaker.record(asyncio.TimeoutError())
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_or_uses_fallback():
+    service = GeminiService(async_mode=True)
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(side_effect=_api_error(503))
+
+    service.breakers = CircuitBreakerRegistry(min_calls=2, open_seconds=30)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await service.invoke(client, "models.generate_content", model="flaky", contents="hi")
+        assert exc_info.value.status_code == 502
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.invoke(client, "models.generate_content", model="flaky", contents="hi")
+    assert exc_info.value.status_code == 503
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+    assert client.aio.models.generate_content.await_count == 2
+
+    service.breakers.fallback_model = "backup"
+    client.aio.models.generate_content = AsyncMock(return_value="ok")
+    assert await service.invoke(client, "models.generate_content", model="flaky", contents="hi") == "ok"
+    client.aio.models.generate_content.assert_awaited_once_with(model="backup", contents="hi")
+    assert service.stats()["circuit_breakers"]["flaky"]["state"] == OPEN
+
+
+@pytest.mark.asyncio
+async def test_route_deadlines_on_hanging_calls_open_the_breaker():
+    service = GeminiService(async_mode=True)
+    client = MagicMock()
+
+    async def hang(**_):
+        await asyncio.Event().wait()
+
+    client.aio.models.generate_content = AsyncMock(side_effect=hang)
+
+    service.breakers = CircuitBreakerRegistry(min_calls=3, slow_call_seconds=0.02, open_seconds=30)
+    # A client that gives up quickly says nothing about the model
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(service.invoke(client, "models.generate_content", model="hung", contents="hi"), timeout=0.001)
+    assert service.breakers.get("hung").stats()["recent_calls"] == 0
+
+    # Routes wrap calls in their own wait_for deadline, shorter than the service timeout
+    for _ in range(3):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(service.invoke(client, "models.generate_content", model="hung", contents="hi"), timeout=0.05)
+
+    assert service.breakers.get("hung").state == OPEN
+    with pytest.raises(HTTPException) as exc_info:
+        await service.invoke(client, "models.generate_content", model="hung", contents="hi")
+    assert exc_info.value.status_code == 503
@@ -0,0 +1,34 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from backend.main import app
+
+ORIGIN = "http://localhost:5173"
+
+
+async def _preflight(method, path="/api/gemini/obs-sessions/abc"):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        return await ac.options(path, headers={
+            "Origin": ORIGIN,
+            "Access-Control-Request-Method": method,
+            "Access-Control-Request-Headers": "Content-Type",
+        })
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method", ["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def test_preflight_allows_session_methods(method):
+    response = await _preflight(method)
+
+    assert response.status_code == 200
+    assert method in response.headers["access-control-allow-methods"]
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+
+
+@pytest.mark.asyncio
+async def test_media_metadata_headers_are_exposed():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/api/gemini/cache/audio/stats", headers={"Origin": ORIGIN})
+
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-model", "x-sample-rate", "x-media-count", "x-image-index", "x-audio-cache"} <= exposed
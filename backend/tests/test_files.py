@@ -0,0 +1,29 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.utils.files import JSONIndex, write_atomic
+
+
+def test_concurrent_writers_never_share_a_temporary_file(tmp_path):
+    path = tmp_path / "blobs" / "blob.bin"
+    payloads = [bytes([i]) * 65536 for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda data: write_atomic(path, data), payloads))
+
+    assert path.read_bytes() in payloads
+    assert [p.name for p in path.parent.iterdir()] == ["blob.bin"]
+
+
+@pytest.mark.asyncio
+async def test_index_saves_never_roll_back_to_an_older_snapshot(tmp_path):
+    index = JSONIndex(tmp_path / "index.json")
+    assert index.load() is None
+
+    await asyncio.gather(*(index.save({"version": i}) for i in range(20)))
+    assert index.load() == {"version": 19}
+    # An older snapshot that reaches the writer late is dropped
+    index._write(1, json.dumps({"version": "stale"}).encode())
+    assert index.load() == {"version": 19}
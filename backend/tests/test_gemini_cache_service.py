@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from backend.config import settings
+from backend.services.gemini_cache_service import GeminiCacheService
+
+
+def _service(**kwargs):
+    service = GeminiCacheService(**kwargs)
+    service.client = MagicMock()
+    names = iter(f"cachedContents/{i}" for i in range(100))
+    service.client.aio.caches.create = AsyncMock(side_effect=lambda **_: SimpleNamespace(name=next(names)))
+    service.client.aio.caches.delete = AsyncMock(return_value=None)
+    return service
+
+
+def _state(scene):
+    return {"available_scenes": [scene]}
+
+
+async def _settle(service):
+    await asyncio.gather(*service._background)
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_deletes_upstream():
+    service = _service(max_entries=2)
+
+    first = await service.get_or_create_cache("sys", _state("a"))
+    await service.get_or_create_cache("sys", _state("b"))
+    # Touching "a" makes "b" the least recently used
+    assert await service.get_or_create_cache("sys", _state("a")) == first
+    await service.get_or_create_cache("sys", _state("c"))
+    await _settle(service)
+
+    assert [info["name"] for info in service.active_caches.values()] == ["cachedContents/0", "cachedContents/2"]
+    service.client.aio.caches.delete.assert_awaited_once_with(name="cachedContents/1")
+    assert service.stats()["evictions"] == 1
+    assert service.stats()["remote_deletes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sweeper_deletes_expired_caches_concurrently():
+    service = _service(sweep_interval=0.01)
+    in_flight = 0
+    peak = 0
+
+    async def delete(name):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if name == "cachedContents/2":
+            raise RuntimeError("gone")
+
+    service.client.aio.caches.delete = AsyncMock(side_effect=delete)
+    for scene in "abc":
+        await service.get_or_create_cache("sys", _state(scene))
+    for info in service.active_caches.values():
+        info["expires"] = datetime.now() - timedelta(seconds=1)
+
+    service.start()
+    try:
+        for _ in range(100):
+            if service.stats()["remote_deletes"] == 2:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await service.shutdown()
+
+    assert not service.active_caches
+    # Deletes run concurrently, up to the maintenance pool's worker limit
+    assert peak == min(3, settings.GEMINI_POOL_MAINTENANCE_WORKERS)
+    assert service.stats()["remote_deletes"] == 2
+    assert service.stats()["running"] is False
+
+
+@pytest.mark.asyncio
+async def test_concurrent_creations_are_coalesced_and_failures_remembered():
+    service = _service(failure_ttl=60)
+    release = asyncio.Event()
+
+    async def create(**_):
+        await release.wait()
+        return SimpleNamespace(name="cachedContents/shared")
+
+    service.client.aio.caches.create = AsyncMock(side_effect=create)
+    waiters = [asyncio.ensure_future(service.get_or_create_cache("sys", _state("a"))) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["cachedContents/shared"] * 5
+    assert service.client.aio.caches.create.await_count == 1
+    assert len(service.active_caches) == 1
+
+    service.client.aio.caches.create = AsyncMock(side_effect=RuntimeError("quota"))
+    assert await service.get_or_create_cache("sys", _state("b")) is None
+    assert await service.get_or_create_cache("sys", _state("b")) is None
+    service.client.aio.caches.create.assert_awaited_once()
+    assert service.stats()["negative_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_creation_outlives_cancelled_callers():
+    service = _service()
+    release = asyncio.Event()
+
+    async def create(**_):
+        await release.wait()
+        return SimpleNamespace(name="cachedContents/late")
+
+    service.client.aio.caches.create = AsyncMock(side_effect=create)
+    waiter = asyncio.ensure_future(service.get_or_create_cache("sys", _state("a")))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    release.set()
+    await _settle(service)
+
+    assert [info["name"] for info in service.active_caches.values()] == ["cachedContents/late"]
+
+
+@pytest.mark.asyncio
+async def test_registry_survives_restart_and_reconciles_expired(tmp_path):
+    registry = tmp_path / "registry.json"
+    before = _service(registry_path=registry)
+    live = await before.get_or_create_cache("sys", _state("live"))
+    await before.get_or_create_cache("sys", _state("stale"))
+    stale_key = before._generate_cache_key("sys", _state("stale"))
+    before.active_caches[stale_key]["expires"] = datetime.now() - timedelta(seconds=1)
+    await before._save()
+
+    after = _service(registry_path=registry)
+    assert await after.get_or_create_cache("sys", _state("live")) == live
+    after.client.aio.caches.create.assert_not_awaited()
+
+    after.start()
+    try:
+        for _ in range(100):
+            if after.stats()["remote_deletes"]:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await after.shutdown()
+
+    after.client.aio.caches.delete.assert_awaited_once_with(name="cachedContents/1")
+    reloaded = GeminiCacheService(registry_path=registry)
+    assert [info["name"] for info in reloaded.active_caches.values()] == [live]
+    assert reloaded.active_caches[after._generate_cache_key("sys", _state("live"))]["model"] == "gemini-2.5-flash"
+
+
+@pytest.mark.asyncio
+async def test_incremental_obs_context_reuses_the_prefix_cache(monkeypatch):
+    from httpx import AsyncClient, ASGITransport
+    from backend.main import app
+    from backend.api.routes.gemini import get_gemini_client
+
+    service = _service()
+    service.client.aio.models.generate_content = AsyncMock(return_value=SimpleNamespace(
+        text='{"actions": [{"command": "SetCurrentProgramScene", "args": {"sceneName": "BRB"}}], "reasoning": "ok"}'
+    ))
+    monkeypatch.setattr("backend.api.routes.gemini.gemini_cache_service", service)
+    state = {
+        "current_scene": "Main",
+        "available_scenes": ["Main", "BRB", "Ending"],
+        "active_sources": [{"inputName": "Mic", "inputKind": "wasapi_input_capture"}, {"inputName": "Cam"}],
+    }
+    first = {"prompt": "go to brb", "obs_state": state, "is_first_query": True,
+             "context_mode": "incremental", "use_explicit_cache": True}
+    second = dict(first, is_first_query=False, obs_state=dict(state, current_scene="BRB"),
+                  state_changes={"scene_changed": {"from": "Main", "to": "BRB"}})
+
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: service.client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            responses = [await ac.post("/api/gemini/obs-aware-query", json=payload) for payload in (first, second)]
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    assert [r.status_code for r in responses] == [200, 200]
+    service.client.aio.caches.create.assert_awaited_once()
+    prefix = service.client.aio.caches.create.await_args.kwargs["config"]["contents"][0].parts[0].text
+    assert "Cam" in prefix and "Mic (wasapi_input_capture)" in prefix and "Current Scene" not in prefix
+    calls = service.client.aio.models.generate_content.await_args_list
+    assert {call.kwargs["config"].cached_content for call in calls} == {"cachedContents/0"}
+    assert "CHANGES SINCE LAST QUERY" not in calls[0].kwargs["contents"]
+    assert '"to": "BRB"' in calls[1].kwargs["contents"]
+    assert calls[1].kwargs["contents"].endswith("USER REQUEST:\ngo to brb")
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.services.gemini_service import GeminiService
+from backend.services.workload_pools import POOL_MEDIA, PoolConfig
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+async def _agen(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_invoke_prefers_native_async_client():
+    service = GeminiService(async_mode=True)
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value="async-result")
+
+    result = await service.invoke(client, "models.generate_content", model="m", contents="hi")
+
+    assert result == "async-result"
+    client.aio.models.generate_content.assert_awaited_once_with(model="m", contents="hi")
+    client.models.generate_content.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_invoke_falls_back_to_thread_pool():
+    service = GeminiService(async_mode=False)
+    client = MagicMock()
+    client.models.generate_content.return_value = "sync-result"
+
+    result = await service.invoke(client, "models.generate_content", model="m", contents="hi")
+
+    assert result == "sync-result"
+    client.models.generate_content.assert_called_once_with(model="m", contents="hi")
+
+
+@pytest.mark.asyncio
+async def test_open_stream_native_and_fallback_yield_same_chunks():
+    chunks = [FakeChunk("a"), FakeChunk("b")]
+
+    native = GeminiService(async_mode=True)
+    native_client = MagicMock()
+    native_client.aio.models.generate_content_stream = AsyncMock(return_value=_agen(chunks))
+    native_stream = await native.open_stream(native_client, "models.generate_content_stream", model="m", contents="hi")
+    assert [c.text async for c in native_stream] == ["a", "b"]
+
+    fallback = GeminiService(async_mode=True)
+    sync_client = MagicMock()
+    sync_client.models.generate_content_stream.return_value = iter(chunks)
+    fallback_stream = await fallback.open_stream(sync_client, "models.generate_content_stream", model="m", contents="hi")
+    assert [c.text async for c in fallback_stream] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_fails_fast_with_retry_after():
+    service = GeminiService(pools={POOL_MEDIA: PoolConfig(max_workers=1, max_queue=1)}, async_mode=False)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(service.run_in_executor(release.wait, pool=POOL_MEDIA))
+    waiting = asyncio.ensure_future(service.run_in_executor(release.wait, pool=POOL_MEDIA))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.run_in_executor(release.wait, pool=POOL_MEDIA)
+    assert exc_info.value.status_code == 503
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+    stats = service.stats()["pools"][POOL_MEDIA]
+    assert stats["active"] == 1
+    assert stats["queued"] == 1
+    assert stats["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(running, waiting)
+    assert service.stats()["pools"][POOL_MEDIA]["completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_closing_fallback_stream_closes_upstream_and_counts_cancellation():
+    closed = threading.Event()
+
+    def upstream():
+        try:
+            for text in ("a" * 40, "b" * 40, "c" * 40):
+                yield FakeChunk(text)
+        finally:
+            closed.set()
+
+    service = GeminiService(async_mode=False)
+    service.cancellations.observe("models.generate_content_stream", 100)
+    client = MagicMock()
+    client.models.generate_content_stream.return_value = upstream()
+
+    stream = await service.open_stream(client, "models.generate_content_stream", model="m", contents="hi")
+    assert (await stream.__anext__()).text == "a" * 40
+    await stream.aclose()
+
+    assert await asyncio.get_running_loop().run_in_executor(None, closed.wait, 1)
+    assert service.stats()["cancellations"] == {"generations": 1, "estimated_tokens_saved": 90}
+
+
+@pytest.mark.asyncio
+async def test_until_disconnected_cancels_work_when_client_leaves():
+    service = GeminiService(async_mode=True)
+    cancelled = asyncio.Event()
+
+    async def generate():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(side_effect=[False, True])
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.until_disconnected(request, generate(), poll_interval=0.01)
+    assert exc_info.value.status_code == 499
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_native_calls_are_admitted_by_their_pool():
+    service = GeminiService(pools={POOL_MEDIA: PoolConfig(max_workers=1, max_queue=1)}, async_mode=True)
+    release = asyncio.Event()
+    client = MagicMock()
+
+    async def generate(**_):
+        await release.wait()
+        return "ok"
+
+    client.aio.models.generate_images = AsyncMock(side_effect=generate)
+    call = lambda: service.invoke(client, "models.generate_images", pool=POOL_MEDIA, model="m", prompt="p")
+    running = asyncio.ensure_future(call())
+    waiting = asyncio.ensure_future(call())
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await call()
+    assert exc_info.value.status_code == 503
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+    stats = service.stats()["pools"][POOL_MEDIA]
+    assert (stats["active"], stats["queued"], stats["rejected"]) == (1, 1, 1)
+    # Only one call runs at a time; the queued one has not reached the SDK
+    assert client.aio.models.generate_images.await_count == 1
+
+    release.set()
+    assert await asyncio.gather(running, waiting) == ["ok", "ok"]
+    stats = service.stats()["pools"][POOL_MEDIA]
+    assert (stats["active"], stats["queued"], stats["completed"]) == (0, 0, 2)
+
+
+@pytest.mark.asyncio
+async def test_only_cancelled_sdk_calls_count_as_cut_short_generations():
+    service = GeminiService(async_mode=True)
+    started = threading.Event()
+    client = MagicMock()
+
+    async def generate(**_):
+        await asyncio.Event().wait()
+
+    client.aio.models.generate_content = AsyncMock(side_effect=generate)
+
+    # Local work run on a pool (file writes, validation) is not a generation
+    job = asyncio.ensure_future(service.run_in_executor(lambda: started.set() or started.wait(0.2), pool=POOL_MEDIA))
+    await asyncio.sleep(0.05)
+    job.cancel()
+    await asyncio.gather(job, return_exceptions=True)
+    assert service.stats()["cancellations"]["generations"] == 0
+
+    call = asyncio.ensure_future(service.invoke(client, "models.generate_content", model="m", contents="hi"))
+    await asyncio.sleep(0.05)
+    call.cancel()
+    await asyncio.gather(call, return_exceptions=True)
+    assert service.stats()["cancellations"]["generations"] == 1
+    await service.shutdown()
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from unittest.mock import MagicMock
+
+from backend.services.gemini_service import GeminiService
+from backend.services.hedging import HedgePolicy
+
+
+def _client(latencies):
+    """Client whose async generate_content sleeps per model and records cancellations."""
+    client = MagicMock()
+    client.cancelled = []
+
+    async def generate_content(model, contents):
+        try:
+            await asyncio.sleep(latencies[model])
+        except asyncio.CancelledError:
+            client.cancelled.append(model)
+            raise
+        return f"answer from {model}"
+
+    client.aio.models.generate_content = generate_content
+    return client
+
+
+def test_delay_tracks_percentile_within_bounds():
+    policy = HedgePolicy(percentile=0.9, min_delay=0.05, max_delay=2.0, min_samples=10)
+    assert policy.delay("m") == 2.0  # no history yet
+    for latency in [0.1] * 9 + [1.0]:
+        policy.observe("m", latency)
+    assert policy.delay("m") == 0.1
+    policy.observe("m", 5.0)
+    assert policy.delay("m") == 1.0
+
+
+def test_budget_limits_hedges_to_a_fraction_of_requests():
+    policy = HedgePolicy(budget_ratio=0.5)
+    granted = 0
+    for _ in range(10):
+        policy.earn()
+        granted += policy.try_acquire()
+    assert granted == 5
+    assert policy.denied == 5
+    with pytest.raises(ValueError):
+        HedgePolicy(budget_ratio=1.5)
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_to_fallback_and_cancelled():
+    service = GeminiService(async_mode=True)
+    policy = HedgePolicy(min_delay=0.01, max_delay=0.01, fallback_model="fast", budget_ratio=1.0)
+    client = _client({"slow": 1.0, "fast": 0.01})
+
+    result = await service.invoke_hedged(client, "models.generate_content", policy=policy, model="slow", contents="hi")
+
+    assert result == "answer from fast"
+    assert client.cancelled == ["slow"]
+    assert policy.hedges == 1 and policy.hedge_wins == 1
+    # The loser was cancelled by hedging, not cut short by a client
+    assert policy.losers_cancelled == 1
+    assert service.stats()["cancellations"]["generations"] == 0
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_budget_is_exhausted():
+    service = GeminiService(async_mode=True)
+    policy = HedgePolicy(min_delay=0.01, max_delay=0.01, fallback_model="fast", budget_ratio=0.1)
+    client = _client({"slow": 0.05, "fast": 0.01})
+
+    result = await service.invoke_hedged(client, "models.generate_content", policy=policy, model="slow", contents="hi")
+
+    assert result == "answer from slow"
+    assert policy.hedges == 0 and policy.denied == 1
@@ -0,0 +1,87 @@
+import base64
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from backend.main import app
+from backend.api.routes import gemini
+from backend.api.routes.gemini import get_gemini_client
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+REFERENCE = {"data": base64.b64encode(PNG).decode(), "mime_type": "image/png"}
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    image_part = SimpleNamespace(inline_data=SimpleNamespace(data=b"out", mime_type="image/png"))
+    response = SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[image_part]))])
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    yield client
+    if previous is None:
+        app.dependency_overrides.pop(get_gemini_client, None)
+    else:
+        app.dependency_overrides[get_gemini_client] = previous
+
+
+def _items(count):
+    return [{"prompt": f"variation {i}", "model": "gemini-x", "reference_images": [REFERENCE]} for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_ndjson_and_decodes_shared_references_once(client, monkeypatch):
+    decode = MagicMock(side_effect=gemini.decode_base64_image)
+    monkeypatch.setattr("backend.api.routes.gemini.decode_base64_image", decode)
+    items = _items(3) + [{"prompt": "broken", "reference_images": [{"data": "!!!!", "mime_type": "image/png"}]}]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post(
+            "/api/gemini/generate-image-batch",
+            json={"items": items, "concurrency": 2},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    results = {event["data"]["index"]: event for event in events[:-1]}
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(results[i]["type"] == "result" and results[i]["data"]["images"][0]["data"] == "b3V0" for i in range(3))
+    assert results[3]["type"] == "error" and results[3]["data"]["status_code"] == 400
+    assert events[-1] == {"type": "done", "data": {"items": 4, "failed": 1}}
+    # One decode for the shared reference, one for the broken item
+    assert decode.call_count == 2
+    assert client.aio.models.generate_content.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_upstream_failures_per_item_over_sse(client):
+    good = client.aio.models.generate_content.return_value
+    client.aio.models.generate_content = AsyncMock(side_effect=[good, SimpleNamespace(candidates=[])])
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/api/gemini/generate-image-batch", json={"items": _items(2), "concurrency": 1})
+        empty = await ac.post("/api/gemini/generate-image-batch", json={"items": []})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [frame["type"] for frame in frames] == ["result", "error", "done"]
+    assert frames[1]["data"]["index"] == 1 and frames[1]["data"]["status_code"] == 502
+    assert empty.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_text_only_gemini_image_config_passes_sdk_validation(client):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post(
+            "/api/gemini/generate-image-enhanced",
+            json={"prompt": "a cat", "model": "gemini-x", "aspect_ratio": "16:9", "person_generation": "dont_allow"},
+        )
+
+    assert response.status_code == 200
+    config = client.aio.models.generate_content.await_args.kwargs["config"]
+    assert config.image_config.aspect_ratio == "16:9"
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from backend.models.validation import ImageGenerateRequest
+from backend.services.gemini_service import GeminiService
+from backend.services.image_preprocessing import ImagePreprocessor
+from backend.services.workload_pools import POOL_PREPROCESS, PoolConfig, WorkloadPool
+from backend.utils.image_ops import CONDITION_OPS, apply_condition, resolve_params
+
+
+def _png(width=64, height=48):
+    img = np.zeros((height, width, 3), np.uint8)
+    cv2.rectangle(img, (10, 10), (40, 30), (255, 255, 255), -1)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def _decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+@pytest.mark.parametrize("op", sorted(CONDITION_OPS))
+def test_every_op_round_trips_to_the_input_format(op):
+    out = apply_condition(_png(), "image/png", op)
+    assert out.startswith(b"\x89PNG")
+    assert _decode(out) is not None
+
+
+def test_resize_and_param_validation():
+    resized = _decode(apply_condition(_png(200, 100), "image/png", "resize", {"max_side": 100}))
+    assert resized.shape[:2] == (50, 100)
+    assert resolve_params("canny_edge", {"threshold1": 50.0}) == {"threshold1": 50, "threshold2": 200}
+    with pytest.raises(ValueError):
+        resolve_params("canny_edge", {"sigma": 1})
+    with pytest.raises(ValueError):
+        resolve_params("resize", {"max_side": 10})
+
+
+def test_request_model_validates_condition_params():
+    ImageGenerateRequest(prompt="p", condition_type="sketch", condition_params={"blur": 9})
+    with pytest.raises(ValidationError):
+        ImageGenerateRequest(prompt="p", condition_type="sketch", condition_params={"threshold1": 9})
+    with pytest.raises(ValidationError):
+        ImageGenerateRequest(prompt="p", condition_type="emboss")
+
+
+@pytest.mark.asyncio
+async def test_conditioning_runs_in_a_worker_process_and_is_cached(monkeypatch):
+    service = GeminiService(pools={POOL_PREPROCESS: PoolConfig(1, 2, processes=True)})
+    monkeypatch.setattr("backend.services.image_preprocessing.gemini_service", service)
+    preprocessor = ImagePreprocessor(max_entries=4, max_bytes=1 << 20)
+    try:
+        first = await preprocessor.condition(_png(), "image/png", "canny_edge")
+        second = await preprocessor.condition(_png(), "image/png", "canny_edge", {"threshold1": 100})
+
+        assert first == second == apply_condition(_png(), "image/png", "canny_edge")
+        assert preprocessor.stats()["hits"] == 1
+        assert service.stats()["pools"][POOL_PREPROCESS]["processes"] is True
+        assert service.stats()["pools"][POOL_PREPROCESS]["completed"] == 1
+
+        with pytest.raises(HTTPException) as exc_info:
+            await preprocessor.condition(b"not an image", "image/png", "grayscale")
+        assert exc_info.value.status_code == 400
+    finally:
+        await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_reports_running_and_queued_tasks():
+    pool = WorkloadPool("preprocess", max_workers=1, max_queue=2, processes=True)
+    try:
+        tasks = [asyncio.ensure_future(pool.run(partial(time.sleep, 0.5))) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        stats = pool.stats()
+        assert (stats["active"], stats["queued"]) == (1, 1)
+
+        await asyncio.gather(*tasks)
+        stats = pool.stats()
+        assert (stats["active"], stats["queued"], stats["completed"]) == (0, 0, 2)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_broken_process_pool_is_replaced_and_retried_once():
+    pool = WorkloadPool("preprocess", max_workers=1, max_queue=2, processes=True)
+    try:
+        # A task that kills its worker breaks the pool on the first attempt and the retry
+        with pytest.raises(BrokenProcessPool):
+            await pool.run(partial(os._exit, 1))
+        assert pool.restarts == 1
+
+        # The next task finds the pool broken, replaces it and runs
+        assert await pool.run(partial(abs, -3)) == 3
+        assert pool.stats()["restarts"] == 2
+        assert (pool.stats()["active"], pool.stats()["queued"]) == (0, 0)
+    finally:
+        pool.shutdown()
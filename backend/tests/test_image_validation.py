@@ -0,0 +1,51 @@
+import base64
+
+import pytest
+
+from backend.utils.image_validation import decode_base64_image, sniff_image_type, validate_image_bytes
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 40
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 40
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 40
+BMP = b"BM" + (1078).to_bytes(4, "little") + b"\x00" * 4 + (54).to_bytes(4, "little") + (40).to_bytes(4, "little") + b"\x00" * 40
+HEIC = b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00mif1heic" + b"\x00" * 40
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+@pytest.mark.parametrize("data, mime", [(PNG, "image/png"), (JPEG, "image/jpeg"), (WEBP, "image/webp"), (b"GIF89a" + b"\x00" * 8, "image/gif")])
+def test_decodes_supported_types(data, mime):
+    assert sniff_image_type(data) == mime
+    assert decode_base64_image(_b64(data), mime) == data
+
+
+@pytest.mark.parametrize("payload, mime, message", [
+    (_b64(PNG), "image/jpeg", "MIME type mismatch"),
+    (_b64(b"plain text here"), "image/png", "Invalid PNG header"),
+    (_b64(PNG), "image/bmp", "MIME type mismatch"),
+    (_b64(BMP), "image/heic", "MIME type mismatch"),
+    (_b64(PNG), "application/pdf", "Unsupported image format"),
+    (_b64(PNG)[:-1], "image/png", "multiple of 4"),
+    (_b64(PNG)[:-4] + "AA\nA", "image/png", "Invalid base64"),
+    ("é" * 8, "image/png", "ASCII"),
+])
+def test_rejects_bad_input(payload, mime, message):
+    with pytest.raises(ValueError, match=message):
+        decode_base64_image(payload, mime)
+
+
+def test_size_limit_is_enforced_from_encoded_length():
+    payload = _b64(PNG + b"\x00" * 1024)
+    assert decode_base64_image(payload, "image/png", max_bytes=2048)
+    with pytest.raises(ValueError, match="exceeds"):
+        decode_base64_image(payload, "image/png", max_bytes=1024)
+    with pytest.raises(ValueError, match="exceeds"):
+        validate_image_bytes(PNG + b"\x00" * 1024, "image/png", max_bytes=1024)
+
+
+@pytest.mark.parametrize("data, mime", [(BMP, "image/bmp"), (HEIC, "image/heic")])
+def test_other_declared_image_types_are_confirmed_with_magic(data, mime):
+    assert decode_base64_image(_b64(data), mime) == data
+    assert validate_image_bytes(data, mime) == data
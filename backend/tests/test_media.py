@@ -0,0 +1,217 @@
+import base64
+import json
+import wave
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.services.audio_cache import AudioCache
+from backend.utils.media import MULTIPART_MIXED, binary_media_type, parse_range, pcm16_to_wav, pcm_sample_rate
+
+
+@pytest.fixture(autouse=True)
+def isolated_audio_cache(tmp_path, monkeypatch):
+    cache = AudioCache(tmp_path / "audio", max_bytes=1 << 20, max_entries=8)
+    monkeypatch.setattr("backend.api.routes.gemini.audio_cache", cache)
+    return cache
+
+
+def _request(accept):
+    request = MagicMock()
+    request.headers = {"accept": accept} if accept is not None else {}
+    return request
+
+
+@pytest.mark.parametrize("accept, media_types, expected", [
+    (None, ["image/png"], None),
+    ("*/*", ["image/png"], None),
+    ("application/json", ["image/png"], None),
+    ("image/png", ["image/png"], "image/png"),
+    ("image/*", ["image/jpeg"], "image/jpeg"),
+    ("application/json, image/png;q=0.5", ["image/png"], None),
+    ("image/png", ["image/png", "image/png"], None),
+    ("multipart/mixed, application/json;q=0.9", ["image/png", "image/png"], MULTIPART_MIXED),
+])
+def test_accept_negotiation(accept, media_types, expected):
+    assert binary_media_type(_request(accept), media_types) == expected
+
+
+def test_pcm16_to_wav_header():
+    pcm = b"\x01\x00" * 100
+    with wave.open(BytesIO(pcm16_to_wav(pcm, 16000))) as wav:
+        assert wav.getframerate() == 16000
+        assert wav.getsampwidth() == 2
+        assert wav.readframes(100) == pcm
+    assert pcm_sample_rate("audio/L16;codec=pcm;rate=44100") == 44100
+    assert pcm_sample_rate(None) == 24000
+
+
+@pytest.mark.asyncio
+async def test_generate_speech_serves_wav_or_json():
+    pcm = b"\x00\x01" * 50
+    part = MagicMock()
+    part.inline_data.data = pcm
+    part.inline_data.mime_type = "audio/L16;codec=pcm;rate=24000"
+    response = MagicMock()
+    response.candidates = [MagicMock()]
+    response.candidates[0].content.parts = [part]
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            binary = await ac.post("/api/gemini/generate-speech", json={"prompt": "hi"}, headers={"Accept": "audio/wav"})
+            default = await ac.post("/api/gemini/generate-speech", json={"prompt": "hi"})
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    assert binary.status_code == 200
+    assert binary.headers["content-type"] == "audio/wav"
+    assert binary.headers["x-sample-rate"] == "24000"
+    assert binary.content[:4] == b"RIFF" and binary.content[44:] == pcm
+
+    assert default.status_code == 200
+    assert base64.b64decode(default.json()["audioData"]) == pcm
+
+
+def _audio_chunk(pcm, rate=16000):
+    inline = SimpleNamespace(data=pcm, mime_type=f"audio/L16;codec=pcm;rate={rate}")
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(inline_data=inline)]))])
+
+
+async def _agen(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_stream_speech_as_wav_and_sse():
+    pcm = [b"\x01\x00" * 10, b"\x02\x00" * 10]
+    client = MagicMock()
+    client.aio.models.generate_content_stream = AsyncMock(side_effect=lambda **_: _agen([_audio_chunk(p) for p in pcm]))
+
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            wav = await ac.post("/api/gemini/generate-speech/stream", json={"prompt": "hi"})
+            sse = await ac.post(
+                "/api/gemini/generate-speech/stream", json={"prompt": "hi"}, headers={"Accept": "text/event-stream"}
+            )
+            client.aio.models.generate_content_stream = AsyncMock(side_effect=lambda **_: _agen([]))
+            empty = await ac.post("/api/gemini/generate-speech/stream", json={"prompt": "hi"})
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    assert wav.status_code == 200
+    assert wav.headers["content-type"] == "audio/wav"
+    assert wav.headers["x-sample-rate"] == "16000"
+    assert wav.content[:4] == b"RIFF" and wav.content[40:44] == b"\xff\xff\xff\xff"
+    assert wav.content[44:] == b"".join(pcm)
+
+    events = [json.loads(line[len("data: "):]) for line in sse.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["format", "audio", "audio", "done"]
+    assert events[0]["data"]["sample_rate"] == 16000
+    assert b"".join(base64.b64decode(e["data"]) for e in events[1:3]) == b"".join(pcm)
+
+    assert empty.status_code == 502
+
+
+@pytest.mark.asyncio
+async def test_repeated_speech_is_served_from_the_audio_cache(tmp_path, isolated_audio_cache):
+    cache = isolated_audio_cache
+    pcm = b"\x03\x00" * 50
+    part = MagicMock()
+    part.inline_data.data = pcm
+    part.inline_data.mime_type = "audio/L16;codec=pcm;rate=24000"
+    response = MagicMock()
+    response.candidates = [MagicMock()]
+    response.candidates[0].content.parts = [part]
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    body = {"prompt": "Thanks for the follow!", "voice_config": {"voice_name": "Puck"}}
+
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.post("/api/gemini/generate-speech", json=body)
+            wav = await ac.post("/api/gemini/generate-speech", json=body, headers={"Accept": "audio/wav"})
+            as_json = await ac.post("/api/gemini/generate-speech", json=body)
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    client.aio.models.generate_content.assert_awaited_once()
+    assert wav.headers["x-audio-cache"] == "hit"
+    assert wav.content == pcm16_to_wav(pcm, 24000)
+    assert first.json() == as_json.json()
+    assert cache.stats()["hits"] == 2
+
+    # Entries survive a restart, and the sound-effect tool shares them
+    reloaded = AudioCache(tmp_path / "audio", max_bytes=1 << 20, max_entries=8)
+    key = AudioCache.key("gemini-2.5-flash-preview-tts", "Thanks for the follow!", {"voice_name": "Puck"})
+    assert await reloaded.read_pcm(reloaded.get(key)) == pcm
+
+
+@pytest.mark.asyncio
+async def test_audio_cache_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=1 << 20, max_entries=2)
+    for name in ("a", "b"):
+        await cache.put(name, b"\x00\x00" * 4, 24000, "m")
+    assert cache.get("a") is not None
+    await cache.put("c", b"\x00\x00" * 4, 24000, "m")
+
+    assert cache.get("b") is None
+    assert not (tmp_path / "b.wav").exists()
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_audio_cache_io_bypasses_the_cpu_pool(tmp_path, monkeypatch):
+    # A saturated CPU pool must not turn cache writes and hits into 503s
+    saturated = AsyncMock(side_effect=HTTPException(status_code=503))
+    monkeypatch.setattr("backend.services.gemini_service.gemini_service.run_in_executor", saturated)
+    cache = AudioCache(tmp_path, max_bytes=1 << 20, max_entries=1)
+    for name in ("a", "b"):
+        assert await cache.put(name, b"\x01\x00" * 4, 24000, "m") is not None
+
+    assert await cache.read_pcm(cache.get("b")) == b"\x01\x00" * 4
+    assert not (tmp_path / "a.wav").exists()
+    saturated.assert_not_awaited()
+
+
+@pytest.mark.parametrize("header,size,span", [
+    (None, 100, None),
+    ("bytes=10-19", 100, (10, 19)),
+    ("bytes=90-", 100, (90, 99)),
+    ("bytes=50-500", 100, (50, 99)),
+    ("bytes=-10", 100, (90, 99)),
+    # A suffix longer than the file is the whole file, not an error
+    ("bytes=-500", 100, (0, 99)),
+    ("bytes=0-1,5-6", 100, None),
+])
+def test_parse_range(header, size, span):
+    assert parse_range(header, size) == span
+
+
+@pytest.mark.parametrize("header,size", [("bytes=100-", 100), ("bytes=20-10", 100), ("bytes=-0", 100), ("bytes=-5", 0)])
+def test_parse_range_rejects_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
@@ -0,0 +1,136 @@
+import asyncio
+import base64
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient, ASGITransport
+from pydantic import ValidationError
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.main import app
+from backend.models.validation import ImageGenerateRequest, VideoGenerateRequest
+from backend.services.media_store import MediaStore
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def _store(tmp_path, **kwargs):
+    options = {"max_bytes": 1 << 20, "files_api_min_bytes": 0}
+    options.update(kwargs)
+    return MediaStore(tmp_path / "media", **options)
+
+
+def _client(upload=None):
+    client = MagicMock()
+    client.aio.files.upload = upload or AsyncMock(return_value=SimpleNamespace(
+        uri="https://files/abc", expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+    ))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_put_dedupes_by_content_and_survives_reload(tmp_path):
+    store = _store(tmp_path)
+    first = await store.put(PNG, "image/png")
+    second = await store.put(PNG, "image/png")
+
+    assert first is second
+    assert first.handle == "sha256:" + hashlib.sha256(PNG).hexdigest()
+    assert store.stats()["entries"] == 1
+
+    reloaded = _store(tmp_path)
+    assert await reloaded.read(reloaded.get(first.handle)) == PNG
+    with pytest.raises(HTTPException) as exc_info:
+        reloaded.get("sha256:" + "0" * 64)
+    assert exc_info.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_over_budget(tmp_path):
+    store = _store(tmp_path, max_bytes=200)
+    old = await store.put(PNG + b"a", "image/png")
+    newer = await store.put(PNG + b"b", "image/png")
+    old.last_used, newer.last_used = time.time() - 10, time.time()
+    await store.put(PNG + b"c", "image/png")
+
+    assert store.stats()["entries"] == 2
+    with pytest.raises(HTTPException):
+        store.get(old.handle)
+
+
+@pytest.mark.asyncio
+async def test_files_api_uri_is_reused_until_expiry(tmp_path):
+    store = _store(tmp_path)
+    entry = await store.put(PNG, "image/png")
+    client = _client()
+
+    first = await store.part_for(client, entry.handle)
+    second = await store.part_for(client, entry.handle)
+
+    assert first.file_data.file_uri == second.file_data.file_uri == "https://files/abc"
+    client.aio.files.upload.assert_awaited_once()
+
+    entry.file_expires_at = time.time()
+    await store.part_for(client, entry.handle)
+    assert client.aio.files.upload.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_inline_data(tmp_path):
+    store = _store(tmp_path)
+    entry = await store.put(PNG, "image/png")
+    failing = _client(AsyncMock(side_effect=HTTPException(status_code=502)))
+
+    part = await store.part_for(failing, entry.handle)
+    assert part.inline_data.data == PNG and part.file_data is None
+
+    small = _store(tmp_path / "small", files_api_min_bytes=1 << 20)
+    entry = await small.put(PNG, "image/png")
+    client = _client()
+    assert (await small.part_for(client, entry.handle)).inline_data.data == PNG
+    client.aio.files.upload.assert_not_called()
+
+
+def test_request_models_accept_handles():
+    handle = "sha256:" + "a" * 64
+    ImageGenerateRequest(prompt="p", reference_images=[{"handle": handle}])
+    VideoGenerateRequest(prompt="p", image={"handle": handle}, last_frame={"data": "AA==", "mime_type": "image/png"})
+    with pytest.raises(ValidationError):
+        ImageGenerateRequest(prompt="p", reference_images=[{"handle": "sha256:nope"}])
+    with pytest.raises(ValidationError):
+        VideoGenerateRequest(prompt="p", image={"mime_type": "image/png"})
+
+
+@pytest.mark.asyncio
+async def test_upload_endpoint_returns_stable_handle(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    monkeypatch.setattr("backend.api.routes.gemini.media_store", store)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        raw = await ac.post("/api/gemini/media", content=PNG, headers={"Content-Type": "image/png"})
+        as_json = await ac.post("/api/gemini/media", json={"data": base64.b64encode(PNG).decode(), "mime_type": "image/png"})
+        bad = await ac.post("/api/gemini/media", content=b"GIF89a", headers={"Content-Type": "image/png"})
+        info = await ac.get(f"/api/gemini/media/{raw.json()['handle']}")
+
+    assert raw.status_code == 200
+    assert raw.json() == as_json.json() == info.json()
+    assert raw.json()["size"] == len(PNG)
+    assert bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_concurrent_puts_keep_blobs_and_index_intact(tmp_path):
+    store = _store(tmp_path)
+    blobs = [PNG + bytes([i]) * 4096 for i in range(8)]
+    entries = await asyncio.gather(*(store.put(blob, "image/png") for blob in blobs))
+
+    for entry, blob in zip(entries, blobs):
+        assert await store.read(entry) == blob
+    # No temporary files are left behind, and the index lists every blob
+    assert not list((tmp_path / "media").rglob("*.tmp"))
+    reloaded = _store(tmp_path)
+    assert reloaded.stats()["entries"] == 8
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient, ASGITransport
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.services.obs_sessions import OBSSessionStore, apply_source_updates, merge_patch
+
+STATE = {
+    "current_scene": "Main",
+    "available_scenes": ["Main", "BRB"],
+    "active_sources": [{"inputName": "Mic", "muted": False}, {"inputName": "Cam"}],
+}
+
+
+def test_merge_patch_and_source_updates():
+    assert merge_patch({"a": 1, "b": {"c": 2, "d": 3}}, {"b": {"c": None, "e": 4}, "f": [1]}) == {
+        "a": 1, "b": {"d": 3, "e": 4}, "f": [1]
+    }
+    updated = apply_source_updates(STATE["active_sources"], {"Mic": {"muted": True}, "Cam": None, "Music": {"volume": 0.5}})
+    assert updated == [{"inputName": "Mic", "muted": True}, {"inputName": "Music", "volume": 0.5}]
+    assert STATE["active_sources"][0]["muted"] is False
+
+
+def test_store_versions_memoizes_and_evicts_lru():
+    store = OBSSessionStore(max_sessions=2)
+    first = store.create(STATE)
+    built = []
+    assert first.memoized("x", lambda: built.append(1) or len(built)) == 1
+    assert first.memoized("x", lambda: built.append(1) or len(built)) == 1
+
+    store.patch(first.session_id, patch={"current_scene": "BRB"}, base_version=1)
+    assert first.version == 2 and first.context_state().current_scene == "BRB"
+    assert first.memoized("x", lambda: built.append(1) or len(built)) == 2
+    with pytest.raises(HTTPException) as conflict:
+        store.patch(first.session_id, patch={"current_scene": "Main"}, base_version=1)
+    assert conflict.value.status_code == 409
+
+    second = store.create(STATE)
+    store.get(first.session_id)
+    store.create(STATE)
+    with pytest.raises(HTTPException) as missing:
+        store.get(second.session_id)
+    assert missing.value.status_code == 404
+    assert store.stats()["sessions"] == 2 and store.stats()["evictions"] == 1
+
+    with pytest.raises(HTTPException) as too_large:
+        OBSSessionStore(max_bytes=16).create(STATE)
+    assert too_large.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_queries_read_state_from_the_session(monkeypatch):
+    monkeypatch.setattr("backend.api.routes.gemini.obs_session_store", OBSSessionStore())
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=SimpleNamespace(
+        text='{"actions": [], "reasoning": "nothing to do"}'
+    ))
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            created = (await ac.post("/api/gemini/obs-sessions", json={"obs_state": STATE})).json()
+            session_id = created["session_id"]
+            patched = await ac.patch(f"/api/gemini/obs-sessions/{session_id}", json={
+                "base_version": created["version"],
+                "patch": {"current_scene": "BRB"},
+                "source_updates": {"Overlay": {}},
+            })
+            query = await ac.post("/api/gemini/obs-aware-query", json={"prompt": "status?", "session_id": session_id})
+            stale = await ac.put(f"/api/gemini/obs-sessions/{session_id}", json={"obs_state": STATE, "base_version": 1})
+            both = await ac.post("/api/gemini/obs-aware-query", json={"prompt": "p", "session_id": session_id, "obs_state": STATE})
+            deleted = await ac.delete(f"/api/gemini/obs-sessions/{session_id}")
+            gone = await ac.post("/api/gemini/obs-aware-query", json={"prompt": "p", "session_id": session_id})
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    assert patched.json() == {"session_id": session_id, "version": 2}
+    assert query.status_code == 200
+    system = client.aio.models.generate_content.await_args.kwargs["config"].system_instruction
+    assert "Current Scene: BRB" in system and "Overlay" in system
+    assert stale.status_code == 409
+    assert both.status_code == 422
+    assert deleted.status_code == 204
+    assert gone.status_code == 404
@@ -0,0 +1,65 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.services.response_cache import ResponseCache, response_cache
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ResponseCache(routes=["r"], ttl_seconds=60, max_entries=2, max_bytes=1024)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("r", "a") == {"v": 1}  # touch "a" so "b" is least recent
+    cache.set("c", {"v": 3})
+    assert cache.get("r", "b") is None
+    assert cache.get("r", "c") == {"v": 3}
+
+    cache.set("big", "x" * 2048)
+    assert cache.get("r", "big") is None
+    assert cache.stats()["routes"]["r"] == {"hits": 2, "misses": 2}
+
+
+def test_entries_expire_and_routes_must_opt_in():
+    cache = ResponseCache(routes=["r"], ttl_seconds=0.0, max_entries=2, max_bytes=1024)
+    assert not cache.enabled_for("r")
+
+    cache = ResponseCache(routes=["r"], ttl_seconds=60, max_entries=2, max_bytes=1024)
+    assert cache.enabled_for("r") and not cache.enabled_for("other")
+    cache.set("a", 1)
+    cache._entries["a"] = (0.0, *cache._entries["a"][1:])
+    assert cache.get("r", "a") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_obs_aware_query_serves_repeats_from_cache():
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=MagicMock(
+        text='{"actions": [{"command": "ToggleInputMute", "args": {"inputName": "Mic"}}], "reasoning": "mute"}'
+    ))
+    payload = {
+        "prompt": "mute my mic",
+        "obs_state": {"current_scene": "Main", "available_scenes": ["Main", "BRB"]},
+        "use_response_cache": True,
+    }
+    response_cache.clear()
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.post("/api/gemini/obs-aware-query", json=payload)
+            second = await ac.post("/api/gemini/obs-aware-query", json=payload)
+            stats = (await ac.get("/api/gemini/cache/stats")).json()
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+        response_cache.clear()
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert client.aio.models.generate_content.await_count == 1
+    assert stats["routes"]["obs-aware-query"]["hits"] >= 1
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from backend.services.single_flight import SingleFlight, request_key
+
+
+class Config(BaseModel):
+    temperature: float = 0.5
+    stop: str = None
+
+
+def test_request_key_is_stable_and_ignores_unset_fields():
+    assert request_key(model="m", config=Config()) == request_key(config={"temperature": 0.5}, model="m")
+    assert request_key(model="m", contents=b"abc") != request_key(model="m", contents=b"abd")
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", factory) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "shared": 4}
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_with_every_waiter():
+    flight = SingleFlight()
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.do("k", factory), flight.do("k", factory), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_only_the_last_waiter_cancels_the_shared_call():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def factory():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.ensure_future(flight.do("k", factory))
+    second = asyncio.ensure_future(flight.do("k", factory))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.gather(first, second, return_exceptions=True)
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.utils.sse import SSEEncoder, coalesce_frames
+
+
+async def _frames(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def test_typed_frame_matches_json_envelope():
+    encoder = SSEEncoder()
+    frame = encoder.typed('chunk', 'héllo "world"\n')
+
+    assert frame.startswith(b'data: ') and frame.endswith(b'\n\n')
+    assert json.loads(frame[len(b'data: '):-2]) == {'type': 'chunk', 'data': 'héllo "world"\n'}
+    # The cached prefix is reused for subsequent frames of the same type
+    assert encoder.typed('chunk', 'x') == b'data: {"type":"chunk","data":"x"}\n\n'
+
+
+def test_encode_with_id_and_event():
+    frame = SSEEncoder().encode({'a': 1}, event='done', event_id='s1:3')
+    assert frame == b'id: s1:3\nevent: done\ndata: {"a":1}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_coalescing_merges_frames_within_window():
+    frames = [b'a\n\n', b'b\n\n', b'c\n\n']
+    out = [f async for f in coalesce_frames(_frames(frames), window_ms=50)]
+    assert out == [b'a\n\nb\n\nc\n\n']
+
+
+@pytest.mark.asyncio
+async def test_coalescing_flushes_on_size_and_passthrough_when_disabled():
+    frames = [b'x' * 10] * 4
+    out = [f async for f in coalesce_frames(_frames(frames), window_ms=1000, max_bytes=20)]
+    assert out == [b'x' * 20, b'x' * 20]
+
+    out = [f async for f in coalesce_frames(_frames(frames), window_ms=0)]
+    assert out == frames
+
+
+@pytest.mark.asyncio
+async def test_coalescing_flushes_when_window_elapses():
+    out = [f async for f in coalesce_frames(_frames([b'a', b'b'], delay=0.05), window_ms=10)]
+    assert out == [b'a', b'b']
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.services.stream_replay import ReplayStream, StreamReplayRegistry
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+async def _chunks(*texts):
+    for text in texts:
+        yield FakeChunk(text)
+
+
+def _event_ids(body: str):
+    return [line[len('id: '):] for line in body.splitlines() if line.startswith('id: ')]
+
+
+@pytest.mark.asyncio
+async def test_subscribe_replays_after_cursor_and_reports_gaps():
+    replay = ReplayStream('s1', max_events=3, max_bytes=1 << 20)
+    for i in range(5):
+        replay.publish('chunk', str(i))
+    replay.finish()
+
+    frames = [f async for f in replay.subscribe(after_seq=0)]
+    # Events 0-1 were evicted, so a gap frame precedes events 2-4
+    assert b'"type":"gap"' in frames[0]
+    assert [f.split(b'\n')[0] for f in frames[1:]] == [b'id: s1:2', b'id: s1:3', b'id: s1:4']
+
+
+@pytest.mark.asyncio
+async def test_live_subscriber_receives_frames_published_later():
+    replay = ReplayStream('s2', max_events=10, max_bytes=1 << 20)
+
+    async def produce():
+        await asyncio.sleep(0.01)
+        replay.publish('chunk', 'late')
+        replay.finish()
+
+    producer = asyncio.create_task(produce())
+    frames = [f async for f in replay.subscribe()]
+    await producer
+    assert frames == [b'id: s2:0\ndata: {"type":"chunk","data":"late"}\n\n']
+
+
+@pytest.mark.asyncio
+async def test_generation_is_cancelled_when_no_reader_returns():
+    replay = ReplayStream('s3', max_events=10, max_bytes=1 << 20, abandon_after=0.01)
+    upstream_closed = asyncio.Event()
+
+    async def events():
+        try:
+            yield 'chunk', 'first'
+            await asyncio.sleep(10)
+        finally:
+            upstream_closed.set()
+
+    replay.start(events())
+    reader = replay.subscribe()
+    assert b'first' in await reader.__anext__()
+    await reader.aclose()
+
+    await asyncio.wait_for(upstream_closed.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert replay.done
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_reader_keeps_generation_alive():
+    replay = ReplayStream('s4', max_events=10, max_bytes=1 << 20, abandon_after=0.05)
+    release = asyncio.Event()
+
+    async def events():
+        await release.wait()
+        yield 'chunk', 'done'
+
+    replay.start(events())
+    first = replay.subscribe()
+    pending = asyncio.ensure_future(first.__anext__())
+    await asyncio.sleep(0)
+    pending.cancel()
+    await asyncio.gather(pending, return_exceptions=True)
+
+    # Reconnect within the grace period, then let the generation finish
+    frames = asyncio.ensure_future(_collect(replay.subscribe()))
+    await asyncio.sleep(0.1)
+    release.set()
+    assert b'done' in b''.join(await frames)
+
+
+async def _collect(frames):
+    return [frame async for frame in frames]
+
+
+def test_registry_parses_event_ids_and_expires_finished_streams():
+    registry = StreamReplayRegistry(max_streams=2, ttl_seconds=0, max_events=10, max_bytes=1024)
+    assert registry.parse_event_id('abc:12') == ('abc', 12)
+    assert registry.parse_event_id('garbage') is None
+
+    stream = registry.create()
+    stream.finish()
+    stream.finished_at -= 1
+    assert registry.get(stream.id) is None
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_tags_frames_and_resumes_with_last_event_id():
+    client = MagicMock()
+    client.aio.models.generate_content_stream = AsyncMock(return_value=_chunks('Hel', 'lo'))
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/gemini/stream", json={"prompt": "Hello"})
+            assert response.status_code == 200
+            stream_id = response.headers["X-Stream-ID"]
+            ids = _event_ids(response.text)
+            assert ids == [f"{stream_id}:0", f"{stream_id}:1", f"{stream_id}:2"]
+
+            resumed = await ac.get(
+                f"/api/gemini/stream/{stream_id}",
+                headers={"Last-Event-ID": f"{stream_id}:0"},
+            )
+            assert resumed.status_code == 200
+            assert _event_ids(resumed.text) == ids[1:]
+
+            missing = await ac.get("/api/gemini/stream/does-not-exist")
+            assert missing.status_code == 404
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
@@ -0,0 +1,79 @@
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.services.telemetry import GeminiTelemetry, bind_route, current_route, telemetry
+
+
+def _usage(prompt, candidates, cached=None):
+    return MagicMock(prompt_token_count=prompt, candidates_token_count=candidates, cached_content_token_count=cached)
+
+
+def test_render_exposes_tokens_errors_and_histograms():
+    metrics = GeminiTelemetry()
+    metrics.record("flash", 1.5, usage=_usage(100, 50, 80), ttft=0.5, route="/stream")
+    metrics.record("flash", 0.2, error=HTTPException(status_code=503), route="/stream")
+
+    text = metrics.render()
+    assert 'gemini_requests_total{model="flash",route="/stream"} 2' in text
+    assert 'gemini_errors_total{model="flash",route="/stream",error="http_503"} 1' in text
+    assert 'gemini_tokens_total{model="flash",route="/stream",kind="cached"} 80' in text
+    assert 'gemini_time_to_first_token_seconds_bucket{model="flash",route="/stream",le="0.5"} 1' in text
+    # 50 candidate tokens over the 1s after the first token
+    assert 'gemini_output_tokens_per_second_sum{model="flash",route="/stream"} 50.0' in text
+    assert 'gemini_request_latency_seconds_count{model="flash",route="/stream"} 2' in text
+
+
+def test_label_sets_are_capped():
+    metrics = GeminiTelemetry(max_label_sets=1)
+    metrics.record("a", 0.1, route="/r")
+    metrics.record("b", 0.1, route="/r")
+    assert 'gemini_requests_total{model="other",route="/r"} 1' in metrics.render()
+
+
+@pytest.mark.asyncio
+async def test_calls_are_labelled_with_model_and_route():
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=MagicMock(candidates=[], usage_metadata=_usage(12, 3)))
+    telemetry.reset()
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/gemini/generate-content", json={"prompt": "hi", "model": "flash"})
+            assert response.status_code == 200
+            metrics = await ac.get("/api/health/metrics")
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'gemini_tokens_total{model="flash",route="/api/gemini/generate-content",kind="prompt"} 12' in metrics.text
+
+
+@pytest.mark.asyncio
+async def test_route_label_is_the_full_template_behind_prefixes_and_mounts():
+    router = APIRouter(prefix="/things", dependencies=[Depends(bind_route)])
+
+    @router.get("/{item_id}")
+    async def read_thing(item_id: str):
+        return {"route": current_route.get()}
+
+    api = FastAPI()
+    api.include_router(router, prefix="/api")
+    outer = FastAPI()
+    outer.mount("/v1", api)
+
+    async with AsyncClient(transport=ASGITransport(app=api), base_url="http://test") as ac:
+        direct = await ac.get("/api/things/42")
+    async with AsyncClient(transport=ASGITransport(app=outer), base_url="http://test") as ac:
+        mounted = await ac.get("/v1/api/things/42")
+
+    assert direct.json() == {"route": "/api/things/{item_id}"}
+    assert mounted.json() == {"route": "/v1/api/things/{item_id}"}
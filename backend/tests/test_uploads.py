@@ -0,0 +1,108 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.config import settings
+from backend.utils.uploads import sniff_audio_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+WAV = b"RIFF\x24\x00\x00\x00WAVEfmt " + b"\x00" * 64
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    yield client
+    if previous is None:
+        app.dependency_overrides.pop(get_gemini_client, None)
+    else:
+        app.dependency_overrides[get_gemini_client] = previous
+
+
+def _post(ac, path, payload, files):
+    return ac.post(path, data={"payload": json.dumps(payload)}, files=files)
+
+
+@pytest.mark.parametrize("head, expected", [
+    (WAV, "audio/wav"),
+    (b"ID3\x04" + b"\x00" * 8, "audio/mp3"),
+    (b"\xff\xfb\x90\x00", "audio/mp3"),
+    (b"OggS\x00", "audio/ogg"),
+    (b"\x00\x00\x00\x20ftypM4A ", "audio/mp4"),
+    (PNG, None),
+])
+def test_sniff_audio_type(head, expected):
+    assert sniff_audio_type(head) == expected
+
+
+@pytest.mark.asyncio
+async def test_image_upload_sends_raw_bytes(client):
+    image_part = SimpleNamespace(inline_data=SimpleNamespace(data=b"out", mime_type="image/png"))
+    response = SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[image_part]))])
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        ok = await _post(ac, "/api/gemini/generate-image-enhanced/upload", {"prompt": "p", "model": "gemini-x"}, [
+            ("image", ("in.png", PNG, "application/octet-stream")),
+            ("reference_images", ("ref.png", PNG, "image/png")),
+        ])
+        not_image = await _post(ac, "/api/gemini/generate-image-enhanced/upload", {"prompt": "p"}, [
+            ("image", ("in.png", b"plain text", "image/png")),
+        ])
+        bad_payload = await _post(ac, "/api/gemini/generate-image-enhanced/upload", {"prompt": ""}, [
+            ("image", ("in.png", PNG, "image/png")),
+        ])
+
+    assert ok.status_code == 200
+    contents = client.aio.models.generate_content.await_args.kwargs["contents"]
+    assert contents[0] == "p"
+    assert [(part.inline_data.data, part.inline_data.mime_type) for part in contents[1:]] == [(PNG, "image/png")] * 2
+    assert not_image.status_code == 400
+    assert bad_payload.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_large_audio_goes_through_the_files_api(client, monkeypatch):
+    response = SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text="ok")]))])
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    client.aio.files.upload = AsyncMock(return_value=SimpleNamespace(uri="https://files/audio"))
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        small = await _post(ac, "/api/gemini/generate-content/upload", {"prompt": "p"}, [("audio", ("a.wav", WAV, "audio/wav"))])
+        inline_part = client.aio.models.generate_content.await_args.kwargs["contents"][-1]
+        monkeypatch.setattr(settings, "AUDIO_UPLOAD_FILES_API_MIN_BYTES", 16)
+        large = await _post(ac, "/api/gemini/generate-content/upload", {"prompt": "p"}, [("audio", ("a.wav", WAV, "audio/x-wav"))])
+        uri_part = client.aio.models.generate_content.await_args.kwargs["contents"][-1]
+        not_audio = await _post(ac, "/api/gemini/generate-content/upload", {"prompt": "p"}, [("audio", ("a.wav", PNG, "audio/wav"))])
+
+    assert small.status_code == large.status_code == 200
+    assert inline_part.inline_data.data == WAV
+    assert uri_part.file_data.file_uri == "https://files/audio"
+    assert uri_part.file_data.mime_type == "audio/x-wav"
+    assert not_audio.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_video_upload_uses_file_frames(client, monkeypatch):
+    tracker = MagicMock()
+    monkeypatch.setattr("backend.api.routes.gemini.video_operation_tracker", tracker)
+    client.aio.models.generate_videos = AsyncMock(return_value=SimpleNamespace(name="op/1"))
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        ok = await _post(ac, "/api/gemini/generate-video/upload", {"prompt": "p"}, [
+            ("image", ("first.png", PNG, "image/png")),
+            ("last_frame", ("last.png", PNG, "image/png")),
+        ])
+
+    assert ok.json() == {"operation_name": "op/1"}
+    kwargs = client.aio.models.generate_videos.await_args.kwargs
+    assert kwargs["image"].image_bytes == PNG
+    assert kwargs["config"].last_frame.image_bytes == PNG
+    tracker.track.assert_called_once()
@@ -0,0 +1,165 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from backend.main import app
+from backend.api.routes.gemini import get_gemini_client
+from backend.services.video_cache import VideoCache
+from backend.services.video_operations import VideoOperationTracker
+
+
+def _op(name, done=False, error=None, uri=None):
+    result = SimpleNamespace(generated_videos=[SimpleNamespace(video=SimpleNamespace(uri=uri))]) if uri else None
+    return SimpleNamespace(name=name, done=done, error=error, result=result)
+
+
+def _client(*responses):
+    client = MagicMock()
+    client.aio.operations.get = AsyncMock(side_effect=list(responses))
+    return client
+
+
+def _tracker(**kwargs):
+    options = {"initial_interval": 0.01, "max_interval": 0.05, "backoff": 2.0}
+    options.update(kwargs)
+    return VideoOperationTracker(**options)
+
+
+@pytest.mark.asyncio
+async def test_polls_with_backoff_until_done():
+    tracker = _tracker()
+    client = _client(_op("op/1"), _op("op/1"), _op("op/1", done=True, uri="gs://video.mp4"))
+    try:
+        tracked = tracker.track(client, _op("op/1"))
+        await asyncio.wait_for(tracked.finished.wait(), timeout=2)
+
+        assert tracked.describe() == {"status": "completed", "result": {"video": {"uri": "gs://video.mp4"}}}
+        assert tracked.polls == 3
+        assert tracked.interval == pytest.approx(0.04)
+    finally:
+        await tracker.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_due_operations_are_polled_together_and_errors_reported():
+    tracker = _tracker(initial_interval=0.05)
+    client = MagicMock()
+    client.aio.operations.get = AsyncMock(side_effect=lambda op: _op(
+        op.name, done=True, error={"message": "blocked"} if op.name == "op/bad" else None, uri="gs://ok.mp4"
+    ))
+    try:
+        good = tracker.track(client, _op("op/good"))
+        bad = tracker.track(client, _op("op/bad"))
+        await asyncio.wait_for(asyncio.gather(good.finished.wait(), bad.finished.wait()), timeout=2)
+
+        assert tracker.stats()["upstream_polls"] == 2
+        assert bad.describe() == {"status": "failed", "error": "blocked"}
+        assert good.describe()["status"] == "completed"
+    finally:
+        await tracker.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_watch_survives_the_operation_being_pruned():
+    tracker = _tracker()
+    client = _client(_op("op/1", done=True, uri="gs://video.mp4"))
+    try:
+        tracked = tracker.track(client, _op("op/1"))
+        await asyncio.wait_for(tracked.finished.wait(), timeout=2)
+        tracker._operations.clear()
+
+        states = [state async for state in tracker.watch(tracked)]
+        assert states == [tracked.describe()]
+    finally:
+        await tracker.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_cancelled_completion_hooks():
+    tracker = _tracker()
+    started = asyncio.Event()
+    unwound = []
+
+    async def slow_download(tracked, result):
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            unwound.append(tracked.name)
+
+    tracker.add_completion_hook(slow_download)
+    tracker.track(_client(_op("op/1", done=True, uri="gs://video.mp4")), _op("op/1"))
+    await asyncio.wait_for(started.wait(), timeout=2)
+
+    await tracker.shutdown()
+    assert unwound == ["op/1"]
+    assert not tracker._completions
+
+
+@pytest.mark.asyncio
+async def test_status_endpoint_answers_from_local_state(monkeypatch):
+    tracker = _tracker(initial_interval=60)
+    monkeypatch.setattr("backend.api.routes.gemini.video_operation_tracker", tracker)
+    client = _client(_op("models/veo/operations/1", done=True, uri="gs://v.mp4"))
+
+    previous = app.dependency_overrides.get(get_gemini_client)
+    app.dependency_overrides[get_gemini_client] = lambda: client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.get("/api/gemini/operations/models/veo/operations/1")
+            second = await ac.get("/api/gemini/operations/models/veo/operations/1")
+            events = await ac.get("/api/gemini/operations/models/veo/operations/1/events")
+    finally:
+        await tracker.shutdown()
+        if previous is None:
+            app.dependency_overrides.pop(get_gemini_client, None)
+        else:
+            app.dependency_overrides[get_gemini_client] = previous
+
+    assert first.json() == second.json() == {"status": "completed", "result": {"video": {"uri": "gs://v.mp4"}}}
+    client.aio.operations.get.assert_awaited_once()
+    frames = [json.loads(line[len("data: "):]) for line in events.text.splitlines() if line.startswith("data: ")]
+    assert frames == [{"type": "status", "data": first.json()}]
+
+
+@pytest.mark.asyncio
+async def test_finished_videos_are_cached_and_served_with_ranges(tmp_path, monkeypatch):
+    cache = VideoCache(tmp_path, max_bytes=1 << 20)
+    monkeypatch.setattr("backend.api.routes.gemini.video_cache", cache)
+    tracker = _tracker()
+    tracker.add_completion_hook(cache.cache_operation)
+    payload = bytes(range(256)) * 8
+    done = _op("op/video", done=True, uri="gs://v.mp4")
+    done.result.generated_videos[0].video.video_bytes = payload
+    done.result.generated_videos[0].video.mime_type = "video/mp4"
+    try:
+        tracked = tracker.track(_client(done), _op("op/video"))
+        await asyncio.wait_for(tracked.finished.wait(), timeout=2)
+    finally:
+        await tracker.shutdown()
+
+    local_url = tracked.describe()["result"]["video"]["local_url"]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        full = await ac.get(local_url)
+        etag = full.headers["etag"]
+        partial = await ac.get(local_url, headers={"Range": "bytes=100-199"})
+        suffix = await ac.get(local_url, headers={"Range": "bytes=-10"})
+        stale = await ac.get(local_url, headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+        revalidated = await ac.get(local_url, headers={"If-None-Match": etag})
+        unsatisfiable = await ac.get(local_url, headers={"Range": "bytes=5000-"})
+        missing = await ac.get("/api/gemini/videos/unknown")
+
+    assert full.status_code == 200 and full.content == payload
+    assert full.headers["accept-ranges"] == "bytes"
+    assert partial.status_code == 206 and partial.content == payload[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(payload)}"
+    assert suffix.content == payload[-10:]
+    assert stale.status_code == 200 and stale.content == payload
+    assert revalidated.status_code == 304
+    assert unsatisfiable.status_code == 416
+    assert missing.status_code == 404
+    assert VideoCache(tmp_path, max_bytes=1 << 20).get(local_url.rsplit("/", 1)[1]) is not None
@@ -0,0 +1,69 @@
+"""Crash- and concurrency-safe file writes for the on-disk caches.
+
+`write_atomic` writes through a uniquely named temporary file in the target
+directory and renames it into place, so readers see either the old or the
+new content and concurrent writers never share a temporary file.
+
+`JSONIndex` is the `index.json` of a disk cache. Saves run in a worker
+thread so they don't block the event loop, and a save never overwrites the
+file with an older snapshot than the one already written.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace `path` with `data` in one rename, creating parent directories."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False)
+    try:
+        with tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+    except BaseException:
+        remove_files([Path(tmp.name)])
+        raise
+
+
+def remove_files(paths: Iterable[Path]) -> None:
+    """Delete `paths`, ignoring files that are already gone or can't be removed."""
+    for path in paths:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+class JSONIndex:
+    """A JSON document on disk, saved off the event loop in snapshot order."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = 0
+        self._written = 0
+
+    def load(self) -> Optional[Any]:
+        """The parsed document, or None if it doesn't exist yet."""
+        if not self.path.exists():
+            return None
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    async def save(self, document: Any) -> None:
+        """Serialize `document` now and write it in a worker thread."""
+        data = json.dumps(document).encode("utf-8")
+        self._version += 1
+        await asyncio.to_thread(self._write, self._version, data)
+
+    def _write(self, version: int, data: bytes) -> None:
+        with self._lock:
+            # A later snapshot already landed; writing this one would roll it back
+            if version <= self._written:
+                return
+            write_atomic(self.path, data)
+            self._written = version
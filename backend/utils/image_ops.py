@@ -0,0 +1,126 @@
+"""Image conditioning operations for vision requests.
+
+Each op takes a decoded BGR image plus numeric params and returns a BGR
+image. `apply_condition` is the single entry point; it decodes, runs the op
+and re-encodes to the input format. It only needs OpenCV and numpy, so it is
+safe to run in worker processes (it deliberately imports nothing from the
+app).
+
+New ops are added with `@condition_op(name, param=Param(...))`.
+"""
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+
+class Param(NamedTuple):
+    default: float
+    minimum: float
+    maximum: float
+
+
+class _Op(NamedTuple):
+    func: Callable[..., Any]
+    params: Dict[str, Param]
+
+
+CONDITION_OPS: Dict[str, _Op] = {}
+
+
+def condition_op(name: str, **params: Param) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Register a conditioning op under `name` with its tunable params."""
+    def register(func: Callable[..., Any]) -> Callable[..., Any]:
+        CONDITION_OPS[name] = _Op(func, params)
+        return func
+    return register
+
+
+def resolve_params(op: str, params: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Fill in defaults and validate `params` for `op`; raises ValueError."""
+    if op not in CONDITION_OPS:
+        raise ValueError(f"Unknown condition type: {op}")
+    spec = CONDITION_OPS[op].params
+    params = params or {}
+    unknown = set(params) - set(spec)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) for {op}: {', '.join(sorted(unknown))}")
+
+    resolved = {}
+    for name, param in spec.items():
+        value = params.get(name, param.default)
+        if not param.minimum <= value <= param.maximum:
+            raise ValueError(f"{op}.{name} must be between {param.minimum} and {param.maximum}")
+        # Integer-valued defaults mean the op expects an int (kernel sizes, pixels)
+        resolved[name] = int(value) if isinstance(param.default, int) else float(value)
+    return resolved
+
+
+def _odd(value: int) -> int:
+    return value if value % 2 else value + 1
+
+
+@condition_op("canny_edge", threshold1=Param(100, 0, 1000), threshold2=Param(200, 0, 1000))
+def _canny_edge(img, threshold1: int, threshold2: int):
+    import cv2
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, threshold1, threshold2)
+    # Convert single-channel edges back to 3-channel for encoding
+    return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+
+
+@condition_op("resize", max_side=Param(1024, 64, 4096))
+def _resize(img, max_side: int):
+    import cv2
+
+    height, width = img.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (max(int(width * scale), 1), max(int(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+
+@condition_op("grayscale")
+def _grayscale(img):
+    import cv2
+
+    return cv2.cvtColor(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
+
+
+@condition_op("depth_blur", strength=Param(31, 3, 151))
+def _depth_blur(img, strength: int):
+    """Depth-like map: heavily smoothed luminance, brighter areas read as nearer."""
+    import cv2
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    depth = cv2.GaussianBlur(gray, (_odd(strength), _odd(strength)), 0)
+    depth = cv2.normalize(depth, None, 0, 255, cv2.NORM_MINMAX)
+    return cv2.cvtColor(depth, cv2.COLOR_GRAY2BGR)
+
+
+@condition_op("sketch", blur=Param(21, 3, 101))
+def _sketch(img, blur: int):
+    """Pencil sketch via a colour-dodge blend of the image and its blurred negative."""
+    import cv2
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(255 - gray, (_odd(blur), _odd(blur)), 0)
+    sketch = cv2.divide(gray, 255 - blurred, scale=256)
+    return cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
+
+
+def apply_condition(image_bytes: bytes, mime_type: str, op: str, params: Optional[Dict[str, float]] = None) -> bytes:
+    """Decode `image_bytes`, apply `op` and re-encode to the same format."""
+    import cv2
+    import numpy as np
+
+    resolved = resolve_params(op, params)
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image for conditioning")
+
+    result = CONDITION_OPS[op].func(img, **resolved)
+
+    # Re-encode the image to its original format
+    is_success, buffer = cv2.imencode(f".{mime_type.split('/')[1]}", result)
+    if not is_success:
+        raise ValueError("Failed to re-encode processed image")
+    return buffer.tobytes()
@@ -0,0 +1,88 @@
+"""Validation for user-supplied input images.
+
+Images arrive as base64 strings of up to ~13 MB, often several per request,
+so validation is a single strict pass: the declared type is checked against
+the magic bytes of the first few bytes, the decoded size is bounded from
+the encoded length before anything is allocated, and the payload is then
+decoded once with `binascii.a2b_base64(strict_mode=True)`, which also
+rejects any character outside the base64 alphabet. Like `image_ops`, this
+module imports nothing from the app.
+
+The common formats are checked against the signatures below. Other declared
+`image/*` types (HEIC, BMP, TIFF, ...) fall back to python-magic on the same
+sniffed bytes and are accepted when it confirms the declared type.
+"""
+import binascii
+from typing import Callable, Dict, Optional
+
+try:
+    import magic  # type: ignore
+except ImportError:  # pragma: no cover - libmagic missing
+    magic = None
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# Enough base64 to cover every signature below (48 chars -> 36 bytes)
+_SNIFF_CHARS = 48
+
+IMAGE_SIGNATURES: Dict[str, Callable[[bytes], bool]] = {
+    'image/jpeg': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'image/png': lambda head: head.startswith(b'\x89PNG\r\n\x1a\n'),
+    'image/gif': lambda head: head[:6] in (b'GIF87a', b'GIF89a'),
+    'image/webp': lambda head: head[:4] == b'RIFF' and head[8:12] == b'WEBP',
+}
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """MIME type whose signature matches the leading bytes `head`, if any."""
+    for mime_type, matches in IMAGE_SIGNATURES.items():
+        if matches(head):
+            return mime_type
+    return None
+
+
+def _check_type(head: bytes, expected_mime: str) -> None:
+    if expected_mime not in IMAGE_SIGNATURES:
+        _check_other_type(head, expected_mime)
+        return
+    if not IMAGE_SIGNATURES[expected_mime](head):
+        actual = sniff_image_type(head)
+        if actual:
+            raise ValueError(f"MIME type mismatch: expected {expected_mime}, got {actual}")
+        raise ValueError(f"Invalid {expected_mime.split('/')[1].upper()} header")
+
+
+def _check_other_type(head: bytes, expected_mime: str) -> None:
+    if magic is None or not expected_mime.startswith('image/'):
+        raise ValueError("Unsupported image format")
+    actual = sniff_image_type(head) or magic.from_buffer(head, mime=True)
+    if actual != expected_mime:
+        raise ValueError(f"MIME type mismatch: expected {expected_mime}, got {actual}")
+
+
+def validate_image_bytes(image_bytes: bytes, expected_mime: str, max_bytes: int = MAX_IMAGE_BYTES) -> bytes:
+    """Check the size and declared MIME type of raw image bytes."""
+    if len(image_bytes) > max_bytes:
+        raise ValueError(f"Image exceeds {max_bytes // (1024 * 1024)}MB limit")
+    _check_type(image_bytes[:64], expected_mime)
+    return image_bytes
+
+
+def decode_base64_image(image_input: str, expected_mime: str, max_bytes: int = MAX_IMAGE_BYTES) -> bytes:
+    """
+    Validate and decode a base64 image in one pass; raises ValueError.
+
+    Rejects oversized payloads and type mismatches before decoding the body.
+    """
+    length = len(image_input)
+    if length % 4:
+        raise ValueError("Invalid base64 encoding: length is not a multiple of 4")
+    decoded_size = length // 4 * 3 - image_input.count('=', max(length - 2, 0))
+    if decoded_size > max_bytes:
+        raise ValueError(f"Decoded image exceeds {max_bytes // (1024 * 1024)}MB limit")
+
+    try:
+        _check_type(binascii.a2b_base64(image_input[:_SNIFF_CHARS], strict_mode=True), expected_mime)
+        return binascii.a2b_base64(image_input, strict_mode=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 encoding: {e}")
@@ -0,0 +1,216 @@
+"""Binary media responses negotiated from the Accept header.
+
+Media endpoints answer with JSON (base64 payloads) by default. A client that
+explicitly asks for the media type, for example `Accept: image/png` or
+`Accept: audio/wav`, gets the raw bytes with metadata in `X-*` headers.
+Several results are sent as `multipart/mixed`, one part per result.
+An Accept header with only wildcards (such as `*/*`) keeps the JSON default.
+
+Cached files are served by `ranged_file_response`, which adds ETag
+revalidation and single byte-range requests on top of `FileResponse`.
+"""
+import os
+import re
+import struct
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+MULTIPART_MIXED = "multipart/mixed"
+
+# Gemini TTS returns 16-bit mono PCM at 24 kHz unless the mime type says otherwise
+DEFAULT_PCM_RATE = 24000
+
+
+@dataclass
+class MediaPart:
+    """One binary result plus the per-part headers sent with it."""
+    data: bytes
+    media_type: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def _parse_accept(header: str) -> List[Tuple[str, float]]:
+    accepted = []
+    for item in header.split(','):
+        media_range, *params = [piece.strip() for piece in item.split(';')]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted.append((media_range.lower(), q))
+    return accepted
+
+
+def _explicit_quality(accepted: List[Tuple[str, float]], media_type: str) -> float:
+    """q-value of the most specific non-`*/*` range matching `media_type` (0 if none)."""
+    media_type = media_type.split(';')[0].strip().lower()
+    major = media_type.split('/')[0]
+    exact = [q for media_range, q in accepted if media_range == media_type]
+    if exact:
+        return max(exact)
+    partial = [q for media_range, q in accepted if media_range == f"{major}/*"]
+    return max(partial) if partial else 0.0
+
+
+def binary_media_type(request: Request, media_types: Sequence[str]) -> Optional[str]:
+    """
+    Returns the binary media type to answer with, or None to keep JSON.
+
+    `media_types` lists the type of each result. A single result may be sent
+    raw; any number may be sent as `multipart/mixed`. Binary wins only if the
+    client ranks it above JSON.
+    """
+    accepted = _parse_accept(request.headers.get('accept', ''))
+    if not accepted or not media_types:
+        return None
+    json_q = _explicit_quality(accepted, 'application/json')
+
+    candidates = [MULTIPART_MIXED]
+    if len(media_types) == 1:
+        candidates.insert(0, media_types[0])
+    best, best_q = None, json_q
+    for media_type in candidates:
+        q = _explicit_quality(accepted, media_type)
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def binary_response(media_type: str, parts: Sequence[MediaPart], headers: Optional[Dict[str, str]] = None) -> Response:
+    """Raw body for a single part, or a `multipart/mixed` body for several."""
+    headers = {"X-Media-Count": str(len(parts)), **(headers or {})}
+    if media_type != MULTIPART_MIXED:
+        part = parts[0]
+        return Response(content=part.data, media_type=part.media_type, headers={**headers, **part.headers})
+
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for part in parts:
+        part_headers = {"Content-Type": part.media_type, "Content-Length": str(len(part.data)), **part.headers}
+        chunks.append(f"--{boundary}\r\n".encode())
+        chunks.append("".join(f"{name}: {value}\r\n" for name, value in part_headers.items()).encode())
+        chunks.append(b"\r\n")
+        chunks.append(part.data)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return Response(content=b"".join(chunks), media_type=f'{MULTIPART_MIXED}; boundary="{boundary}"', headers=headers)
+
+
+def pcm_sample_rate(mime_type: Optional[str]) -> int:
+    """Sample rate from an `audio/L16;rate=24000` style mime type."""
+    match = re.search(r'rate=(\d+)', mime_type or '')
+    return int(match.group(1)) if match else DEFAULT_PCM_RATE
+
+
+# Size field value for WAV streams of unknown length; players read to EOF
+WAV_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def wav_header(
+    data_size: Optional[int], sample_rate: int = DEFAULT_PCM_RATE, channels: int = 1, sample_width: int = 2
+) -> bytes:
+    """44-byte RIFF/WAVE header for `data_size` bytes of PCM (None when streaming)."""
+    byte_rate = sample_rate * channels * sample_width
+    riff_size = WAV_UNKNOWN_SIZE if data_size is None else 36 + data_size
+    if data_size is None:
+        data_size = WAV_UNKNOWN_SIZE
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', riff_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b'data', data_size,
+    )
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int = DEFAULT_PCM_RATE, channels: int = 1) -> bytes:
+    """Wrap raw little-endian 16-bit PCM in a WAV container."""
+    return wav_header(len(pcm), sample_rate, channels) + pcm
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+RANGE_CHUNK_SIZE = 256 * 1024
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive `(start, end)` of a single `bytes=` range, or None to send the
+    whole file. Multi-range and malformed headers are ignored, which RFC 9110
+    allows. Raises ValueError if the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        # A suffix longer than the file selects the whole file
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def _read_span(path: Union[str, Path], start: int, end: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, mode='rb') as file:
+        await file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await file.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(
+    request: Request,
+    path: Union[str, Path],
+    media_type: str,
+    etag: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Serve `path` with conditional (`If-None-Match`) and `Range` support.
+
+    Full responses go through `FileResponse`, so servers offering the ASGI
+    `pathsend` extension send the file without copying it through Python.
+    Starlette's `FileResponse` has no Range support in the pinned version,
+    so 206 responses stream the span through Python in `RANGE_CHUNK_SIZE` reads.
+    """
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", **(headers or {})}
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+
+    size = os.stat(path).st_size
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if if_range and if_range.strip() != etag:
+        # The client's copy is stale: send the current file in full
+        range_header = None
+    try:
+        span = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if span is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    start, end = span
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(_read_span(path, start, end), status_code=206, media_type=media_type, headers=headers)
@@ -0,0 +1,134 @@
+"""Server-Sent Events framing helpers.
+
+`SSEEncoder` turns events into ready-to-send `bytes` frames. It uses orjson
+when it is installed and a compact stdlib encoder otherwise. Envelope prefixes
+such as `data: {"type":"chunk","data":` are built once per type.
+
+`coalesce_frames` optionally merges frames produced within a short window
+into one write. Slow clients and buffering proxies then see fewer, larger
+frames.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize `obj` to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _json_encoder.encode(obj).encode('utf-8')
+
+
+class SSEEncoder:
+    """Encodes SSE frames as bytes.
+
+    JSON payloads never contain raw newlines, so each event is a single
+    `data:` line.
+    """
+
+    def __init__(self):
+        self._typed_prefixes: Dict[str, bytes] = {}
+
+    @staticmethod
+    def _header(event: Optional[str], event_id: Optional[str]) -> bytes:
+        header = b''
+        if event_id is not None:
+            header += b'id: ' + event_id.encode('utf-8') + b'\n'
+        if event:
+            header += b'event: ' + event.encode('utf-8') + b'\n'
+        return header
+
+    def encode(self, data: Any, event: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+        """Encode an arbitrary JSON-serializable payload as one frame."""
+        return self._header(event, event_id) + b'data: ' + dumps(data) + b'\n\n'
+
+    def typed(self, kind: str, data: Any, event_id: Optional[str] = None) -> bytes:
+        """Encode `{"type": kind, "data": data}` using a cached envelope prefix."""
+        prefix = self._typed_prefixes.get(kind)
+        if prefix is None:
+            prefix = b'data: {"type":' + dumps(kind) + b',"data":'
+            self._typed_prefixes[kind] = prefix
+        return self._header(None, event_id) + prefix + dumps(data) + b'}\n\n'
+
+    @staticmethod
+    def comment(text: str = '') -> bytes:
+        """Encode an SSE comment line, used as a keepalive."""
+        return b':' + text.encode('utf-8') + b'\n\n'
+
+
+# Shared encoder; it only caches immutable prefixes, so it is safe to reuse
+sse_encoder = SSEEncoder()
+
+
+async def coalesce_frames(
+    frames: AsyncIterator[bytes], window_ms: int = 0, max_bytes: int = 16384
+) -> AsyncIterator[bytes]:
+    """
+    Merge frames that arrive within `window_ms` of the first buffered frame.
+
+    A buffer is flushed when the window elapses, when it reaches `max_bytes`,
+    or when the source ends. With `window_ms <= 0` frames pass through as-is.
+    """
+    iterator = frames.__aiter__()
+    if window_ms <= 0:
+        try:
+            async for frame in iterator:
+                yield frame
+        finally:
+            await _aclose(iterator)
+        return
+
+    loop = asyncio.get_running_loop()
+    buffer = bytearray()
+    deadline = 0.0
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(deadline - loop.time(), 0) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Window elapsed while waiting for the next frame
+                yield bytes(buffer)
+                buffer.clear()
+                continue
+
+            future, pending = pending, None
+            try:
+                frame = future.result()
+            except StopAsyncIteration:
+                break
+
+            if not buffer:
+                deadline = loop.time() + window_ms / 1000
+            buffer += frame
+            if len(buffer) >= max_bytes:
+                yield bytes(buffer)
+                buffer.clear()
+
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        await _aclose(iterator)
+
+
+async def _aclose(iterator: AsyncIterator[Any]) -> None:
+    """Close the source generator so its own cleanup runs promptly."""
+    aclose = getattr(iterator, 'aclose', None)
+    if aclose is not None:
+        await aclose()
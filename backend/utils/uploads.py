@@ -0,0 +1,77 @@
+"""Reading `multipart/form-data` media uploads.
+
+Starlette spools each file part to a `SpooledTemporaryFile` (in memory up
+to 1 MB, on disk beyond that), so upload endpoints receive raw bytes with
+no base64 round trip. The helpers here check the declared size and the
+magic bytes of the first chunk before reading a part, and work out its
+MIME type when the client sent a generic one.
+"""
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import UploadFile
+
+from .image_validation import IMAGE_SIGNATURES, MAX_IMAGE_BYTES, sniff_image_type, validate_image_bytes
+
+HEAD_BYTES = 64
+
+AUDIO_SIGNATURES: Dict[str, Callable[[bytes], bool]] = {
+    'audio/wav': lambda head: head[:4] == b'RIFF' and head[8:12] == b'WAVE',
+    'audio/mp3': lambda head: head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE6 == 0xE2),
+    'audio/aac': lambda head: len(head) > 1 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0,
+    'audio/ogg': lambda head: head[:4] == b'OggS',
+    'audio/flac': lambda head: head[:4] == b'fLaC',
+    'audio/aiff': lambda head: head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'),
+    'audio/webm': lambda head: head[:4] == b'\x1a\x45\xdf\xa3',
+    'audio/mp4': lambda head: head[4:8] == b'ftyp',
+}
+
+
+def sniff_audio_type(head: bytes) -> Optional[str]:
+    """MIME type whose signature matches the leading bytes `head`, if any."""
+    for mime_type, matches in AUDIO_SIGNATURES.items():
+        if matches(head):
+            return mime_type
+    return None
+
+
+def upload_size(upload: UploadFile) -> int:
+    if upload.size is not None:
+        return upload.size
+    # The spooled file is local, so seeking it directly is cheap
+    position = upload.file.tell()
+    upload.file.seek(0, 2)
+    size = upload.file.tell()
+    upload.file.seek(position)
+    return size
+
+
+async def _head(upload: UploadFile) -> bytes:
+    head = await upload.read(HEAD_BYTES)
+    await upload.seek(0)
+    return head
+
+
+async def read_image_upload(upload: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> Tuple[bytes, str]:
+    """`(bytes, mime_type)` of an image part; raises ValueError if it is too large or not an image."""
+    if upload_size(upload) > max_bytes:
+        raise ValueError(f"{upload.filename or 'Image'} exceeds {max_bytes // (1024 * 1024)}MB limit")
+    head = await _head(upload)
+    declared = (upload.content_type or '').split(';')[0].strip().lower()
+    mime_type = declared if declared in IMAGE_SIGNATURES else sniff_image_type(head)
+    if mime_type is None:
+        raise ValueError(f"{upload.filename or 'Upload'} is not a supported image")
+    validate_image_bytes(head, mime_type, max_bytes)
+    return await upload.read(), mime_type
+
+
+async def audio_upload_type(upload: UploadFile) -> str:
+    """
+    MIME type of an audio part, checked against its magic bytes; raises
+    ValueError. A declared `audio/*` type is kept (formats have several
+    aliases), otherwise the sniffed one is used.
+    """
+    sniffed = sniff_audio_type(await _head(upload))
+    if sniffed is None:
+        raise ValueError(f"{upload.filename or 'Upload'} is not a supported audio file")
+    declared = (upload.content_type or '').split(';')[0].strip().lower()
+    return declared if declared.startswith('audio/') else sniffed
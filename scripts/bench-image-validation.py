@@ -0,0 +1,56 @@
+# scripts/bench-image-validation.py
+"""
+Micro-benchmark: the previous regex + b64decode + python-magic image
+validator against the single-pass one in backend.utils.image_validation.
+
+    PYTHONPATH=. python scripts/bench-image-validation.py [repeats]
+"""
+import base64
+import re
+import sys
+import timeit
+
+from backend.utils.image_validation import decode_base64_image
+
+SIZES_MB = (1, 5, 10)
+
+
+def legacy_validate_and_decode_image(image_input: str, expected_mime: str) -> bytes:
+    """The validator as it was before the single-pass rewrite."""
+    import magic
+
+    if not re.match(r'^[A-Za-z0-9+/]*={0,2}$', image_input):
+        raise ValueError("Invalid base64 format")
+    image_bytes = base64.b64decode(image_input, validate=True)
+    if len(image_bytes) > 10 * 1024 * 1024:
+        raise ValueError("Decoded image exceeds 10MB limit")
+    try:
+        actual_mime = magic.from_buffer(image_bytes, mime=True)
+        if actual_mime != expected_mime:
+            raise ValueError(f"MIME type mismatch: expected {expected_mime}, got {actual_mime}")
+    except Exception:
+        if expected_mime not in ['image/jpeg', 'image/png', 'image/gif', 'image/webp']:
+            raise ValueError("Unsupported image format")
+    if expected_mime == 'image/png' and not image_bytes.startswith(b'\x89PNG\r\n\x1a\n'):
+        raise ValueError("Invalid PNG header")
+    return image_bytes
+
+
+def _payload(size_mb: int) -> str:
+    # Stay just under the limit so the 10 MB case is accepted by both
+    size = size_mb * 1024 * 1024 - 1024
+    return base64.b64encode(b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * (size // 256)).decode()
+
+
+def main(repeats: int = 20) -> None:
+    print(f"{'size':>6} {'legacy ms':>10} {'single-pass ms':>15} {'speedup':>8}")
+    for size_mb in SIZES_MB:
+        data = _payload(size_mb)
+        assert legacy_validate_and_decode_image(data, 'image/png') == decode_base64_image(data, 'image/png')
+        legacy = min(timeit.repeat(lambda: legacy_validate_and_decode_image(data, 'image/png'), number=1, repeat=repeats))
+        current = min(timeit.repeat(lambda: decode_base64_image(data, 'image/png'), number=1, repeat=repeats))
+        print(f"{size_mb:>4}MB {legacy * 1000:>10.2f} {current * 1000:>15.2f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)